@@ -0,0 +1,178 @@
+"""
+Read-only JSON API for opportunity listing and detail, used by the mobile
+and kiosk clients.
+
+Rows are serialized straight from values() dicts, never hydrated into
+models, and ?fields=title,location picks the fields returned. The listing
+takes the browse page's filters and cursors.
+
+Responses carry an ETag and Last-Modified taken from the latest updated_at
+of the result set and of its organisations (the whole filtered listing, with
+its size, so an opportunity leaving it changes the tag too). An opportunity
+deleted or closed leaves no updated_at in the result set, so the listing's
+Last-Modified also takes the time the facet catalog stamp last changed, which
+the signal handlers bump on every opportunity save or delete. A client sending
+If-None-Match or If-Modified-Since for an unchanged result gets a 304 without
+a body: the listing then costs one aggregate query plus one reading the
+stamp, and nothing is serialized.
+"""
+import hashlib
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from .facets import get_catalog_modified, get_facet_filters
+from .models import Opportunity
+from .pagination import get_keyset_page
+from .search import filter_matches, get_search_backend, get_search_page
+
+
+# Opportunities per page of the listing
+API_PAGE_SIZE = 50
+
+# Fields the API returns, mapped to the column each is read from
+API_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'organisation': 'organisation__name',
+    'location': 'location',
+    'is_remote': 'is_remote',
+    'category': 'category',
+    'required_skills': 'required_skills',
+    'min_hours_per_week': 'min_hours_per_week',
+    'volunteers_needed': 'volunteers_needed',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+    'status': 'status',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+
+def get_requested_fields(request):
+    """
+    Get the fields asked for with ?fields= (every field by default).
+    
+    Returns:
+        Tuple: (fields: list, unknown: list of names that aren't API fields)
+    """
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(API_FIELDS), []
+    fields = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    return fields, [name for name in fields if name not in API_FIELDS]
+
+
+def get_columns(fields, *required):
+    """Columns to read for some fields, plus any the view needs itself."""
+    return list(dict.fromkeys([*(API_FIELDS[name] for name in fields), *required]))
+
+
+def serialize_row(row, fields):
+    return {name: row[API_FIELDS[name]] for name in fields}
+
+
+def get_last_modified(*timestamps):
+    """Latest of some updated_at values, ignoring None (None if all are)."""
+    return max(filter(None, timestamps), default=None)
+
+
+def conditional_json(request, version, last_modified, build):
+    """
+    Answer a GET with a 304 when the client's copy is current, else with
+    the JSON payload from build(), which only runs for a 200.
+    
+    Args:
+        request: HttpRequest
+        version: JSON serializable value that changes whenever the payload would
+        last_modified: Latest change to the result set and its organisations,
+            or None if there is none
+        build: Callable returning the payload dict
+    """
+    etag = '"%s"' % hashlib.md5(
+        json.dumps([request.get_full_path(), version], cls=DjangoJSONEncoder).encode('utf-8')
+    ).hexdigest()
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = JsonResponse(build())
+    response.headers['ETag'] = etag
+    if timestamp is not None:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def unknown_fields_response(unknown):
+    return JsonResponse({'error': f'Unknown fields: {", ".join(unknown)}'}, status=400)
+
+
+@require_GET
+def list_opportunities(request):
+    """JSON page of open opportunities, with the browse page's filters and cursors."""
+    fields, unknown = get_requested_fields(request)
+    if unknown:
+        return unknown_fields_response(unknown)
+    
+    opportunities = Opportunity.objects.filter(status='OPEN')
+    location = request.GET.get('location')
+    search = request.GET.get('search')
+    if location:
+        opportunities = opportunities.filter(location__icontains=location)
+    for facet_filter in get_facet_filters(request.GET, timezone.localdate()).values():
+        opportunities = opportunities.filter(facet_filter)
+    
+    summary = filter_matches(opportunities, search).aggregate(
+        count=Count('id'), last_modified=Max('updated_at'),
+        organisations_modified=Max('organisation__updated_at')
+    )
+    
+    def build():
+        rows = opportunities.values(*get_columns(fields, 'id', 'created_at'))
+        cursor = request.GET.get('cursor')
+        if search and get_search_backend(rows.db):
+            rows, previous_cursor, next_cursor = get_search_page(rows, search, cursor, API_PAGE_SIZE)
+        else:
+            rows, previous_cursor, next_cursor = get_keyset_page(
+                filter_matches(rows, search), cursor, API_PAGE_SIZE
+            )
+        
+        query = request.GET.copy()
+        
+        def page_url(cursor):
+            query['cursor'] = cursor
+            return request.build_absolute_uri(f'?{query.urlencode()}')
+        
+        return {
+            'count': summary['count'],
+            'next': page_url(next_cursor) if next_cursor else None,
+            'previous': page_url(previous_cursor) if previous_cursor else None,
+            'results': [serialize_row(row, fields) for row in rows],
+        }
+    
+    version = [summary['count'], summary['last_modified'], summary['organisations_modified']]
+    last_modified = get_last_modified(
+        summary['last_modified'], summary['organisations_modified'], get_catalog_modified()
+    )
+    return conditional_json(request, version, last_modified, build)
+
+
+@require_GET
+def opportunity_detail(request, pk):
+    """JSON detail of one opportunity."""
+    fields, unknown = get_requested_fields(request)
+    if unknown:
+        return unknown_fields_response(unknown)
+    
+    row = Opportunity.objects.filter(pk=pk).values(
+        *get_columns(fields, 'updated_at', 'organisation__updated_at')
+    ).first()
+    if row is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    version = [row['updated_at'], row['organisation__updated_at']]
+    last_modified = get_last_modified(*version)
+    return conditional_json(request, version, last_modified, lambda: serialize_row(row, fields))
@@ -0,0 +1,177 @@
+"""
+Facet counts for the browse page.
+
+For the current filters, counts the open opportunities per category, remote
+or on-site and date window. As usual for facets, each facet's counts apply
+every active filter except its own, so they show what choosing another value
+would return. All counts come from one aggregate over the open opportunities,
+each a COUNT with its own filter.
+
+Counts are cached under a key made of the filter values, today's date (the
+date windows move with it) and a catalog version stamp. The signal handlers
+give the stamp a fresh value whenever an opportunity or organisation is
+saved or deleted; bulk writes bypass them and are picked up after
+FACET_CACHE_TIMEOUT seconds, or at once by invalidate_facets(). The stamp is
+a VersionStamp row (see volunteers.caching), so an edit handled by one worker
+process invalidates the counts cached by every worker; reading it costs one
+query.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from volunteers.caching import bump_versions, get_versions
+from volunteers.models import VersionStamp
+from .models import Opportunity
+
+
+CATALOG_VERSION_KEY = 'opportunities:version:catalog'
+
+# Date windows, relative to today
+WHEN_CHOICES = [
+    ('ongoing', 'Happening now'),
+    ('next_30_days', 'Starting within 30 days'),
+    ('later', 'Starting later'),
+]
+
+REMOTE_CHOICES = [
+    ('true', 'Remote'),
+    ('false', 'On-site'),
+]
+
+# Filters making up a facet key, besides the facets themselves
+KEY_FILTERS = ('location', 'search')
+
+
+def get_window_filter(window, today):
+    """Return the Q selecting opportunities in a date window."""
+    soon = today + timedelta(days=30)
+    if window == 'ongoing':
+        return Q(start_date__lte=today, end_date__gte=today)
+    if window == 'next_30_days':
+        return Q(start_date__gt=today, start_date__lte=soon)
+    return Q(start_date__gt=soon)
+
+
+def get_facet_choices():
+    """
+    Get the values of every facet.
+    
+    Returns:
+        Dict mapping facet name to a list of (value, label)
+    """
+    return {
+        'category': Opportunity.CATEGORY_CHOICES,
+        'is_remote': REMOTE_CHOICES,
+        'when': WHEN_CHOICES,
+    }
+
+
+def get_value_filter(facet, value, today):
+    """Return the Q selecting one value of a facet."""
+    if facet == 'category':
+        return Q(category=value)
+    if facet == 'is_remote':
+        return Q(is_remote=(value == 'true'))
+    return get_window_filter(value, today)
+
+
+def get_facet_filters(params, today):
+    """
+    Get the filters of the facets chosen in request parameters.
+    Unknown values are ignored, as if no value was chosen.
+    
+    Args:
+        params: Mapping of facet name to chosen value (e.g. request.GET)
+        today: Date the windows are relative to
+    
+    Returns:
+        Dict mapping each chosen facet to its Q
+    """
+    filters = {}
+    for facet, choices in get_facet_choices().items():
+        value = params.get(facet)
+        if value in dict(choices):
+            filters[facet] = get_value_filter(facet, value, today)
+    return filters
+
+
+def get_catalog_version():
+    """Return the catalog version stamp, creating it if missing."""
+    return get_versions([CATALOG_VERSION_KEY])[CATALOG_VERSION_KEY]
+
+
+def get_catalog_modified():
+    """When the catalog version stamp last changed (None if it never has)."""
+    return VersionStamp.objects.filter(key=CATALOG_VERSION_KEY).values_list('updated_at', flat=True).first()
+
+
+def invalidate_facets():
+    """Give the catalog a fresh version stamp, invalidating every cached count."""
+    bump_versions([CATALOG_VERSION_KEY])
+
+
+def facet_key(params, today):
+    state = {
+        name: params.get(name) or ''
+        for name in (*get_facet_choices(), *KEY_FILTERS)
+    }
+    state['today'] = today.isoformat()
+    digest = hashlib.md5(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'opportunities:facets:{get_catalog_version()}:{digest}'
+
+
+def count_facets(queryset, filters, today):
+    """
+    Count the opportunities of a queryset per facet value in one aggregate.
+    
+    Args:
+        queryset: Opportunity queryset with the non-facet filters applied
+        filters: Chosen facet filters, from get_facet_filters
+        today: Date the windows are relative to
+    
+    Returns:
+        Dict with total (count with every filter) and, per facet, a dict
+        mapping each value to its count
+    """
+    aggregates, values = {}, []
+    for facet, choices in get_facet_choices().items():
+        others = [q for name, q in filters.items() if name != facet]
+        for value, _ in choices:
+            alias = f'facet_{len(values)}'
+            aggregates[alias] = Count('pk', filter=Q(get_value_filter(facet, value, today), *others))
+            values.append((alias, facet, value))
+    chosen = list(filters.values())
+    aggregates['total'] = Count('pk', filter=Q(*chosen)) if chosen else Count('pk')
+    
+    row = queryset.aggregate(**aggregates)
+    counts = {'total': row['total']}
+    for alias, facet, value in values:
+        counts.setdefault(facet, {})[value] = row[alias]
+    return counts
+
+
+def get_facet_counts(queryset, params, today=None):
+    """
+    Get the facet counts for the filters in request parameters, from the
+    cache when the catalog hasn't changed since they were counted.
+    
+    Args:
+        queryset: Open opportunities with the location and search filters
+            of params applied (the same parameters always give the same queryset)
+        params: Request parameters (category, is_remote, when, location, search)
+        today: Date the windows are relative to (default: today)
+    
+    Returns:
+        Dict as from count_facets
+    """
+    today = today or timezone.localdate()
+    key = facet_key(params, today)
+    counts = cache.get(key)
+    if counts is None:
+        counts = count_facets(queryset, get_facet_filters(params, today), today)
+        cache.set(key, counts, timeout=getattr(settings, 'FACET_CACHE_TIMEOUT', 5 * 60))
+    return counts
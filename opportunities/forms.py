@@ -10,12 +10,13 @@ class OpportunityForm(forms.ModelForm):
         model = Opportunity
         fields = [
             'title', 'description', 'location', 'category',
-            'required_skills', 'min_hours_per_week',
-            'start_date', 'end_date', 'is_remote', 'status'
+            'required_skills', 'min_hours_per_week', 'volunteers_needed',
+            'start_date', 'end_date', 'is_remote', 'sessions', 'status'
         ]
         widgets = {
             'description': forms.Textarea(attrs={'rows': 5}),
             'required_skills': forms.Textarea(attrs={'rows': 3}),
+            'sessions': forms.Textarea(attrs={'rows': 2}),
             'start_date': forms.DateInput(attrs={'type': 'date'}),
             'end_date': forms.DateInput(attrs={'type': 'date'}),
         }
@@ -30,6 +31,12 @@ class OpportunityForm(forms.ModelForm):
                 required=True
             )
     
+    def clean_sessions(self):
+        sessions = self.cleaned_data.get('sessions') or {}
+        if not isinstance(sessions, dict):
+            raise forms.ValidationError('Enter sessions as days and times, e.g. {"monday": "18-20"}.')
+        return sessions
+    
     def clean(self):
         cleaned_data = super().clean()
         start_date = cleaned_data.get('start_date')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from opportunities.facets import invalidate_facets
+from opportunities.search import get_search_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the opportunity full-text search index and drop cached facet counts (e.g. after '
+        'bulk writes or raw SQL, which bypass the signal handlers keeping them in sync).'
+    )
+    
+    def handle(self, *args, **options):
+        invalidate_facets()
+        backend = get_search_backend()
+        if backend is None:
+            self.stdout.write('This database has no search index; search uses icontains filters.')
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the {backend} search index.'))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:38
+
+import opportunities.models
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+
+def normalize_skill_list(text):
+    # Frozen copy of opportunities.models.normalize_skill_list as of this migration
+    if not text:
+        return []
+    return [s.strip().lower() for s in text.split(',')]
+
+
+def backfill_skill_tokens(apps, schema_editor):
+    Opportunity = apps.get_model('opportunities', 'Opportunity')
+    
+    last_id = 0
+    while True:
+        batch = list(
+            Opportunity.objects.filter(id__gt=last_id).order_by('id').only('id', 'required_skills')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for opportunity in batch:
+            opportunity.skill_tokens = normalize_skill_list(opportunity.required_skills)
+        Opportunity.objects.bulk_update(batch, ['skill_tokens'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0001_initial'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='opportunity',
+            name='skill_tokens',
+            field=opportunities.models.NormalizedTokensField(blank=True, default=list, editable=False, help_text='Normalized required skill tokens (maintained on save)', source='required_skills'),
+        ),
+        migrations.RunPython(backfill_skill_tokens, migrations.RunPython.noop),
+    ]
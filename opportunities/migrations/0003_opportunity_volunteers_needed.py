@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:46
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0002_opportunity_skill_tokens'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='opportunity',
+            name='volunteers_needed',
+            field=models.PositiveIntegerField(default=1, help_text='Number of volunteers the opportunity can place', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
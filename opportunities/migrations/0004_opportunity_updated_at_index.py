@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0003_opportunity_volunteers_needed'),
+        ('organisations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(fields=['updated_at'], name='opportuniti_updated_153d75_idx'),
+        ),
+    ]
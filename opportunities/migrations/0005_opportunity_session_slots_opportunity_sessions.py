@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:50
+
+import opportunities.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0004_opportunity_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opportunity',
+            name='session_slots',
+            field=opportunities.models.WeeklySlotsField(blank=True, default=opportunities.models.empty_weekly_slots, editable=False, help_text='Weekly session hours bitmask (maintained on save)', source='sessions'),
+        ),
+        migrations.AddField(
+            model_name='opportunity',
+            name='sessions',
+            field=models.JSONField(blank=True, default=dict, help_text='Optional weekly session times (JSON format: days/times, e.g. {"monday": "18-20"})'),
+        ),
+    ]
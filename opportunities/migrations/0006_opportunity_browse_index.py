@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0005_opportunity_session_slots_opportunity_sessions'),
+        ('organisations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='opportunity',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='opportuniti_status_03e3d4_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+# Frozen copies of the table and row SQL in opportunities.search as of this
+# migration, so later changes to that module cannot alter it
+SEARCH_TABLE = 'opportunities_search'
+
+SQLITE_ROWS = """
+    SELECT o.id, o.title, o.description, o.required_skills, o.location, g.name
+    FROM opportunities_opportunity o
+    INNER JOIN organisations_organisation g ON g.id = o.organisation_id
+"""
+POSTGRESQL_ROWS = """
+    SELECT o.id,
+        setweight(to_tsvector('simple', o.title), 'A')
+        || setweight(to_tsvector('simple', o.required_skills), 'B')
+        || setweight(to_tsvector('simple', g.name || ' ' || o.location), 'C')
+        || setweight(to_tsvector('simple', o.description), 'D')
+    FROM opportunities_opportunity o
+    INNER JOIN organisations_organisation g ON g.id = o.organisation_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            "title, description, required_skills, location, organisation, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SEARCH_TABLE} '
+            f'(rowid, title, description, required_skills, location, organisation) {SQLITE_ROWS}'
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            "opportunity_id bigint PRIMARY KEY REFERENCES opportunities_opportunity (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)")
+        schema_editor.execute(f'INSERT INTO {SEARCH_TABLE} (opportunity_id, document) {POSTGRESQL_ROWS}')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0006_opportunity_browse_index'),
+        ('organisations', '0001_initial'),
+    ]
+    
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
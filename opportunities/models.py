@@ -1,9 +1,220 @@
-from django.db import models
+import re
+from django.db import models, transaction
+from django.db.models.base import DEFERRED
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from organisations.models import Organisation
 
 
+def remember_loaded_values(field_names, values):
+    """Map loaded field names to their database values, skipping deferred fields."""
+    return {
+        name: value
+        for name, value in zip(field_names, values)
+        if value is not DEFERRED
+    }
+
+
+def current_field_values(instance):
+    """Snapshot an instance's loaded (non-deferred) field values after a save."""
+    return {
+        field.attname: instance.__dict__[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__
+    }
+
+
+def get_loaded_value(instance, name, default=None):
+    """
+    Get a field's value as it was last loaded from or saved to the database.
+    Returns default for unsaved instances and deferred fields.
+    """
+    return getattr(instance, '_loaded_values', {}).get(name, default)
+
+
+def normalize_skill_list(text):
+    """
+    Split a comma-separated skills text into stripped, lowercased tokens.
+    Empty tokens are kept, as they count towards a required skills ratio.
+    Returns an empty list for empty text.
+    """
+    if not text:
+        return []
+    return [s.strip().lower() for s in text.split(',')]
+
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# A weekly schedule is encoded as one bitmask per day, bit h standing for h:00-h+1:00
+SLOTS_PER_DAY = 24
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+# Named parts of the day accepted in schedule text, as (start hour, end hour)
+DAY_PERIODS = {
+    'morning': (8, 12),
+    'afternoon': (12, 17),
+    'evening': (17, 21),
+    'night': (21, 24),
+}
+
+TIME_RANGE_PATTERN = re.compile(
+    r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\s*(?:-|–|to)\s*(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?'
+)
+
+
+def _to_hour(hour, minutes, meridiem, round_up):
+    hour = int(hour)
+    if meridiem == 'pm' and hour < 12:
+        hour += 12
+    elif meridiem == 'am' and hour == 12:
+        hour = 0
+    if round_up and minutes and int(minutes):
+        hour += 1
+    return min(hour, SLOTS_PER_DAY)
+
+
+def _range_hours(match):
+    """
+    Start and end hours of a TIME_RANGE_PATTERN match. A start without am/pm
+    takes the end's if that keeps it before the end ("1-5pm" is 13-17, "10-2pm"
+    is 10-14), and an end without am/pm before a start up to 12 is in the
+    afternoon ("9-5" is 9-17, while "22-2" runs overnight).
+    """
+    start_hour, start_minutes, start_meridiem, end_hour, end_minutes, end_meridiem = match.groups()
+    start = _to_hour(start_hour, start_minutes, start_meridiem, round_up=False)
+    end = _to_hour(end_hour, end_minutes, end_meridiem, round_up=True)
+    if end_meridiem and not start_meridiem:
+        shared = _to_hour(start_hour, start_minutes, end_meridiem, round_up=False)
+        if shared <= end:
+            start = shared
+    elif not end_meridiem and int(end_hour) < start <= 12:
+        end = _to_hour(end_hour, end_minutes, 'pm', round_up=True)
+    return start, end
+
+
+def get_hour_range_mask(start, end):
+    """
+    Day bitmask of the hours from start up to end. A range ending before it
+    starts ("22-2") covers the hours after start and before end.
+    """
+    if end < start:
+        return get_hour_range_mask(start, SLOTS_PER_DAY) | get_hour_range_mask(0, end)
+    return ((1 << end) - 1) & ~((1 << start) - 1)
+
+
+def parse_day_slots(text):
+    """
+    Encode a day's time text ("9-17", "09:30-12:00, 2pm-5pm", "evenings") as
+    an hour bitmask. Partly covered hours count as available. Empty or
+    unrecognised text means the whole day.
+    """
+    if isinstance(text, (list, tuple)):
+        text = ', '.join(map(str, text))
+    text = str(text or '').lower()
+    mask = 0
+    for period, (start, end) in DAY_PERIODS.items():
+        if period in text:
+            mask |= get_hour_range_mask(start, end)
+    for match in TIME_RANGE_PATTERN.finditer(text):
+        mask |= get_hour_range_mask(*_range_hours(match))
+    return mask or FULL_DAY
+
+
+def encode_weekly_slots(schedule):
+    """
+    Encode a schedule dict (day name to time text, as in
+    VolunteerProfile.availability) as a list of 7 day bitmasks, Monday first.
+    Day names may be abbreviated; unknown keys are ignored.
+    """
+    slots = [0] * len(WEEKDAYS)
+    if not isinstance(schedule, dict):
+        return slots
+    for day, text in schedule.items():
+        prefix = str(day).strip().lower()[:3]
+        for k, weekday in enumerate(WEEKDAYS):
+            if len(prefix) == 3 and weekday.startswith(prefix):
+                slots[k] |= parse_day_slots(text)
+    return slots
+
+
+def empty_weekly_slots():
+    """Default for WeeklySlotsField: no slots on any day."""
+    return [0] * len(WEEKDAYS)
+
+
+class NormalizedTokensField(models.JSONField):
+    """
+    JSON list of normalized skill tokens derived from a text field (source).
+    Like auto_now, the value is recomputed whenever the row is saved or bulk
+    created; bulk_update() and update() on the source leave it stale.
+    """
+    
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('default', list)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+    
+    def pre_save(self, model_instance, add):
+        value = normalize_skill_list(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class NormalizedTextField(models.TextField):
+    """
+    Lowercased copy of a text field (source), recomputed on save like
+    NormalizedTokensField.
+    """
+    
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('default', '')
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+    
+    def pre_save(self, model_instance, add):
+        value = (getattr(model_instance, self.source) or '').lower()
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class WeeklySlotsField(models.JSONField):
+    """
+    Weekly schedule bitmask (see encode_weekly_slots) derived from a schedule
+    dict field (source), recomputed on save like NormalizedTokensField.
+    """
+    
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('default', empty_weekly_slots)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+    
+    def pre_save(self, model_instance, add):
+        value = encode_weekly_slots(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Opportunity(models.Model):
     """Volunteering opportunity posted by organisations."""
     
@@ -36,16 +247,34 @@ class Opportunity(models.Model):
     required_skills = models.TextField(
         help_text='Required skills (comma-separated or free text)'
     )
+    skill_tokens = NormalizedTokensField(
+        source='required_skills',
+        help_text='Normalized required skill tokens (maintained on save)'
+    )
     min_hours_per_week = models.IntegerField(
         validators=[MinValueValidator(0)],
         help_text='Minimum hours per week required'
     )
+    volunteers_needed = models.PositiveIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text='Number of volunteers the opportunity can place'
+    )
     start_date = models.DateField(help_text='Start date of the opportunity')
     end_date = models.DateField(help_text='End date of the opportunity')
     is_remote = models.BooleanField(
         default=False,
         help_text='Whether this is a remote opportunity'
     )
+    sessions = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Optional weekly session times (JSON format: days/times, e.g. {"monday": "18-20"})'
+    )
+    session_slots = WeeklySlotsField(
+        source='sessions',
+        help_text='Weekly session hours bitmask (maintained on save)'
+    )
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
@@ -70,6 +299,9 @@ class Opportunity(models.Model):
             models.Index(fields=['location']),
             models.Index(fields=['organisation']),
             models.Index(fields=['start_date', 'end_date']),
+            models.Index(fields=['updated_at']),
+            # Keyset order of the browse page
+            models.Index(fields=['status', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -82,10 +314,22 @@ class Opportunity(models.Model):
             if self.end_date < self.start_date:
                 raise ValidationError({'end_date': 'End date must be after start date.'})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember loaded values so signal handlers can see what changed on save."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = remember_loaded_values(field_names, values)
+        return instance
+    
     def save(self, *args, **kwargs):
-        """Override save to call clean."""
+        """
+        Override save to call clean. The row and the signal handlers' updates
+        (such as committed hours counters) are written in one transaction.
+        """
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_values = current_field_values(self)
 
 
 class Application(models.Model):
@@ -131,4 +375,17 @@ class Application(models.Model):
     
     def __str__(self):
         return f"{self.volunteer.username} - {self.opportunity.title} ({self.status})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember loaded values so signal handlers can detect status transitions."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = remember_loaded_values(field_names, values)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Save the row and the signal handlers' counter updates in one transaction."""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_values = current_field_values(self)
 
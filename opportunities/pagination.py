@@ -0,0 +1,124 @@
+"""
+Keyset pagination of the opportunity browse page.
+
+Pages are ordered newest first by (created_at, id), or by relevance then id
+for a search, and a cursor carries the sort key of the row it continues
+from, so each page is one range query of page_size + 1 rows however deep the
+reader goes. Cursors are signed so they stay opaque; an invalid one starts
+again from the first page.
+"""
+from datetime import datetime
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'opportunities.browse.cursor'
+
+
+def get_row_value(row, name):
+    """Read a column from a model instance or a values() dict."""
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def make_cursor(key, direction):
+    """
+    Return a cursor for the page after or before a row.
+    
+    Args:
+        key: The row's sort key, a JSON serializable list
+        direction: 'after' for the next page, 'before' for the previous one
+    """
+    return signing.dumps({direction: key}, salt=CURSOR_SALT)
+
+
+def read_cursor(cursor):
+    """
+    Decode a browse cursor.
+    
+    Returns:
+        Tuple (direction, key), or None if the cursor is invalid
+    """
+    try:
+        position = signing.loads(cursor, salt=CURSOR_SALT)
+        (direction, key), = position.items()
+    except (signing.BadSignature, AttributeError, ValueError):
+        return None
+    if direction not in ('after', 'before') or not isinstance(key, list):
+        return None
+    return direction, key
+
+
+def get_page(fetch, sort_key, cursor, page_size):
+    """
+    Get one page of rows in a keyset order.
+    
+    Args:
+        fetch: Callable (direction, key, limit) returning up to limit rows
+            past key in that direction, nearest first ('after' from the top
+            when key is None), or None if key is malformed
+        sort_key: Callable returning a row's key for cursors
+        cursor: Cursor from a previous page's links (None for the first page)
+        page_size: Rows per page
+    
+    Returns:
+        Tuple: (rows: list, previous_cursor: str or None,
+        next_cursor: str or None)
+    """
+    position = read_cursor(cursor) if cursor else None
+    direction, rows = None, None
+    if position is not None:
+        direction, key = position
+        rows = fetch(direction, key, page_size + 1)
+    if not rows:
+        # First page, or everything past the cursor is gone (closed or filtered out)
+        direction = None
+        rows = fetch('after', None, page_size + 1)
+    
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'before':
+        # Walked backwards from the cursor; restore the page order
+        rows.reverse()
+        has_previous, has_next = more, True
+    else:
+        has_previous, has_next = direction == 'after', more
+    
+    previous_cursor = make_cursor(sort_key(rows[0]), 'before') if has_previous else None
+    next_cursor = make_cursor(sort_key(rows[-1]), 'after') if has_next else None
+    return rows, previous_cursor, next_cursor
+
+
+def get_keyset_page(queryset, cursor, page_size):
+    """
+    Get one page of a queryset, newest first.
+    
+    Args:
+        queryset: Opportunity queryset (filtered, not yet ordered); a
+            values() queryset must include id and created_at
+        cursor: Cursor from a previous page's links (None for the first page)
+        page_size: Opportunities per page
+    
+    Returns:
+        Tuple: (opportunities: list, previous_cursor: str or None,
+        next_cursor: str or None)
+    """
+    def fetch(direction, key, limit):
+        if key is None:
+            return list(queryset.order_by('-created_at', '-id')[:limit])
+        try:
+            created_at, opportunity_id = key
+            created_at, opportunity_id = datetime.fromisoformat(created_at), int(opportunity_id)
+        except (TypeError, ValueError):
+            return None
+        if direction == 'after':
+            return list(queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=opportunity_id)
+            ).order_by('-created_at', '-id')[:limit])
+        return list(queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=opportunity_id)
+        ).order_by('created_at', 'id')[:limit])
+    
+    def sort_key(row):
+        return [get_row_value(row, 'created_at').isoformat(), get_row_value(row, 'id')]
+    
+    return get_page(fetch, sort_key, cursor, page_size)
@@ -0,0 +1,281 @@
+"""
+Full-text search of opportunities.
+
+Each opportunity's title, description, required skills, location and
+organisation name are indexed in the opportunities_search table, created by
+a migration for the database in use:
+- SQLite: an FTS5 virtual table keyed by the opportunity id (rowid), with
+  prefix indexes for two and three character prefixes, ranked by bm25
+- PostgreSQL: a weighted tsvector per opportunity under a GIN index,
+  ranked by ts_rank_cd
+Other databases have no index, and search falls back to icontains filters
+(filter_matches).
+
+Every word of a query must match, as a prefix, so "gard" finds gardening.
+The index is kept in step by the signal handlers in signals.py; bulk writes
+bypass them, and rebuild_search_index repairs it.
+"""
+import re
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .pagination import get_keyset_page, get_page, get_row_value
+
+
+SEARCH_TABLE = 'opportunities_search'
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Words of a query used for matching; the rest are ignored
+MAX_QUERY_WORDS = 10
+
+# bm25 weights of the FTS5 columns: title, description, required_skills, location, organisation
+FTS5_WEIGHTS = (10.0, 1.0, 5.0, 2.0, 3.0)
+
+# Rows of the index as a SELECT over opportunities and their organisations
+SQLITE_ROWS = """
+    SELECT o.id, o.title, o.description, o.required_skills, o.location, g.name
+    FROM opportunities_opportunity o
+    INNER JOIN organisations_organisation g ON g.id = o.organisation_id
+"""
+POSTGRESQL_ROWS = """
+    SELECT o.id,
+        setweight(to_tsvector('simple', o.title), 'A')
+        || setweight(to_tsvector('simple', o.required_skills), 'B')
+        || setweight(to_tsvector('simple', g.name || ' ' || o.location), 'C')
+        || setweight(to_tsvector('simple', o.description), 'D')
+    FROM opportunities_opportunity o
+    INNER JOIN organisations_organisation g ON g.id = o.organisation_id
+"""
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    """Return 'sqlite' or 'postgresql' for a database with a search index, else None."""
+    vendor = connections[using].vendor
+    return vendor if vendor in ('sqlite', 'postgresql') else None
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS):
+    """Create the search table for the database's backend and fill it."""
+    backend = get_search_backend(using)
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "title, description, required_skills, location, organisation, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        elif backend == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE {SEARCH_TABLE} ("
+                "opportunity_id bigint PRIMARY KEY REFERENCES opportunities_opportunity (id) "
+                "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)")
+    rebuild_search_index(using)
+
+
+def drop_search_index(using=DEFAULT_DB_ALIAS):
+    """Drop the search table, if the database's backend has one."""
+    if get_search_backend(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def _write_rows(cursor, backend, where='', params=()):
+    """(Re)insert the index rows of the opportunities selected by a WHERE clause."""
+    if backend == 'sqlite':
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} '
+            '(rowid, title, description, required_skills, location, organisation) '
+            f'{SQLITE_ROWS} {where}',
+            params
+        )
+    else:
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (opportunity_id, document) {POSTGRESQL_ROWS} {where} '
+            'ON CONFLICT (opportunity_id) DO UPDATE SET document = EXCLUDED.document',
+            params
+        )
+
+
+def _delete_rows(cursor, backend, where='', params=()):
+    """Delete the index rows matching a WHERE clause on the opportunity id (id)."""
+    id_column = 'rowid' if backend == 'sqlite' else 'opportunity_id'
+    cursor.execute(f'DELETE FROM {SEARCH_TABLE} {where.format(id=id_column)}', params)
+
+
+def index_opportunities(opportunity_ids, using=DEFAULT_DB_ALIAS):
+    """Bring the index rows of some opportunities in line with the database."""
+    backend = get_search_backend(using)
+    if not backend or not opportunity_ids:
+        return
+    opportunity_ids = list(opportunity_ids)
+    placeholders = ', '.join(['%s'] * len(opportunity_ids))
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            _delete_rows(cursor, backend, f'WHERE {{id}} IN ({placeholders})', opportunity_ids)
+        _write_rows(cursor, backend, f'WHERE o.id IN ({placeholders})', opportunity_ids)
+
+
+def index_organisation(organisation_id, using=DEFAULT_DB_ALIAS):
+    """Reindex an organisation's opportunities, e.g. after it was renamed."""
+    backend = get_search_backend(using)
+    if not backend:
+        return
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            _delete_rows(
+                cursor, backend,
+                'WHERE {id} IN (SELECT id FROM opportunities_opportunity WHERE organisation_id = %s)',
+                [organisation_id]
+            )
+        _write_rows(cursor, backend, 'WHERE o.organisation_id = %s', [organisation_id])
+
+
+def remove_opportunities(opportunity_ids, using=DEFAULT_DB_ALIAS):
+    """Drop the index rows of deleted opportunities."""
+    backend = get_search_backend(using)
+    if not backend or not opportunity_ids:
+        return
+    opportunity_ids = list(opportunity_ids)
+    placeholders = ', '.join(['%s'] * len(opportunity_ids))
+    with connections[using].cursor() as cursor:
+        _delete_rows(cursor, backend, f'WHERE {{id}} IN ({placeholders})', opportunity_ids)
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    """Rebuild the whole index from the opportunities table."""
+    backend = get_search_backend(using)
+    if not backend:
+        return
+    with connections[using].cursor() as cursor:
+        _delete_rows(cursor, backend)
+        _write_rows(cursor, backend)
+        if backend == 'sqlite':
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+def get_query_words(text):
+    """Return the lowercased words of a search text used for matching."""
+    return WORD_PATTERN.findall((text or '').lower())[:MAX_QUERY_WORDS]
+
+
+def get_match_expression(words, backend):
+    """Return the full-text query requiring every word as a prefix, in a backend's syntax."""
+    if backend == 'sqlite':
+        return ' '.join(f'"{word}"*' for word in words)
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def filter_matches(queryset, text):
+    """
+    Restrict an Opportunity queryset to the opportunities matching a search
+    text, unranked. Without a search index this is the icontains fallback.
+    """
+    words = get_query_words(text)
+    if not words:
+        return queryset
+    backend = get_search_backend(queryset.db)
+    if backend is None:
+        return queryset.filter(Q(title__icontains=text) | Q(description__icontains=text))
+    if backend == 'sqlite':
+        sql = f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    else:
+        sql = f"SELECT opportunity_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)"
+    return queryset.filter(id__in=RawSQL(sql, [get_match_expression(words, backend)]))
+
+
+def get_ranked_ids(queryset, words, direction='after', key=None, limit=None):
+    """
+    Get the ids of the opportunities in a queryset matching all search words,
+    best match first, with their rank (lower is better, ties broken by id).
+    
+    Args:
+        queryset: Opportunity queryset restricting the results
+        words: Words from get_query_words (at least one)
+        direction: 'after' to walk down the ranking from key, 'before' to walk up
+        key: (rank, id) to continue from, or None to start at the top
+        limit: Maximum number of results
+    
+    Returns:
+        List of tuples (opportunity_id, rank), nearest to key first
+    """
+    using = queryset.db
+    backend = get_search_backend(using)
+    filtered_sql, filtered_params = queryset.order_by().values('id').query.sql_with_params()
+    if backend == 'sqlite':
+        # +rowid keeps the id filter out of the FTS5 lookup, which would otherwise run the
+        # match once per id instead of intersecting the ids with a single match
+        weights = ', '.join(map(str, FTS5_WEIGHTS))
+        ranked = (
+            f'SELECT rowid AS id, bm25({SEARCH_TABLE}, {weights}) AS score FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND +rowid IN ({filtered_sql})'
+        )
+    else:
+        ranked = (
+            f'SELECT opportunity_id AS id, -ts_rank_cd(document, query) AS score '
+            f"FROM {SEARCH_TABLE}, to_tsquery('simple', %s) query "
+            f'WHERE document @@ query AND opportunity_id IN ({filtered_sql})'
+        )
+    params = [get_match_expression(words, backend), *filtered_params]
+    
+    sql = f'SELECT id, score FROM ({ranked}) ranked'
+    if key is not None:
+        operator = '>' if direction == 'after' else '<'
+        sql += f' WHERE score {operator} %s OR (score = %s AND id {operator} %s)'
+        params += [key[0], key[0], key[1]]
+    order = 'ASC' if direction == 'after' else 'DESC'
+    sql += f' ORDER BY score {order}, id {order}'
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(opportunity_id, rank) for opportunity_id, rank in cursor.fetchall()]
+
+
+def get_search_page(queryset, text, cursor, page_size):
+    """
+    Get one page of the opportunities in a queryset matching a search text,
+    best match first.
+    
+    Args:
+        queryset: Opportunity queryset (filtered, not yet ordered); its
+            select_related and only(), or values() including id, apply to the page
+        text: Search text; one without words pages through the queryset newest first
+        cursor: Cursor from a previous page's links (None for the first page)
+        page_size: Opportunities per page
+    
+    Returns:
+        Tuple: (opportunities: list, previous_cursor: str or None,
+        next_cursor: str or None)
+    """
+    words = get_query_words(text)
+    if not words:
+        return get_keyset_page(queryset, cursor, page_size)
+    
+    def fetch(direction, key, limit):
+        if key is not None:
+            try:
+                rank, opportunity_id = key
+                key = (float(rank), int(opportunity_id))
+            except (TypeError, ValueError):
+                return None
+        return get_ranked_ids(queryset, words, direction, key, limit)
+    
+    ranked, previous_cursor, next_cursor = get_page(
+        fetch, lambda row: [row[1], row[0]], cursor, page_size
+    )
+    # Opportunities deleted since the ranking query are skipped
+    opportunities = {
+        get_row_value(row, 'id'): row
+        for row in queryset.filter(id__in=[opportunity_id for opportunity_id, _ in ranked])
+    }
+    return [
+        opportunities[opportunity_id]
+        for opportunity_id, _ in ranked
+        if opportunity_id in opportunities
+    ], previous_cursor, next_cursor
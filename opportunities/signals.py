@@ -0,0 +1,49 @@
+"""
+Signal handlers keeping the opportunity search index and facet counts in
+sync with the models they read.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from organisations.models import Organisation
+from .facets import invalidate_facets
+from .models import Opportunity, get_loaded_value
+from .search import index_opportunities, index_organisation, remove_opportunities
+
+
+# Opportunity fields indexed for search (with the organisation's name)
+SEARCH_FIELDS = ('title', 'description', 'required_skills', 'location', 'organisation_id')
+
+
+@receiver(post_save, sender=Opportunity)
+def update_search_index(sender, instance, created=False, raw=False, using=None, **kwargs):
+    """Reindex an opportunity when it is created or its searchable text changes."""
+    if raw:
+        return
+    if created or any(
+        get_loaded_value(instance, name) != getattr(instance, name) for name in SEARCH_FIELDS
+    ):
+        index_opportunities([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Opportunity)
+def remove_from_search_index(sender, instance, using=None, **kwargs):
+    """Drop a deleted opportunity's index row."""
+    remove_opportunities([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Organisation)
+def update_organisation_search_index(sender, instance, created=False, raw=False, using=None, **kwargs):
+    """Reindex an organisation's opportunities, which carry its name."""
+    if raw or created:
+        return
+    index_organisation(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Opportunity)
+@receiver(post_delete, sender=Opportunity)
+@receiver(post_save, sender=Organisation)
+@receiver(post_delete, sender=Organisation)
+def invalidate_facet_counts(sender, raw=False, **kwargs):
+    """Any opportunity (or organisation, whose name is searched) edit can change facet counts."""
+    if not raw:
+        invalidate_facets()
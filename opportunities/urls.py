@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'opportunities'
 
@@ -12,6 +12,10 @@ urlpatterns = [
     path('<int:pk>/edit/', views.edit_opportunity, name='edit'),
     path('<int:pk>/delete/', views.delete_opportunity, name='delete'),
     path('<int:pk>/applications/', views.view_applications, name='applications'),
+    path('<int:pk>/suggested-volunteers/', views.suggested_volunteers, name='suggested_volunteers'),
     path('applications/<int:application_id>/status/<str:new_status>/', views.update_application_status, name='update_status'),
+    path('applications/bulk-status/', views.bulk_update_application_status, name='bulk_update_status'),
+    path('api/', api.list_opportunities, name='api_list'),
+    path('api/<int:pk>/', api.opportunity_detail, name='api_detail'),
 ]
 
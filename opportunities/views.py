@@ -2,13 +2,59 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
-from django.db.models import Q
+from django.core.paginator import Paginator
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django import forms
 from .models import Opportunity, Application
 from .forms import OpportunityForm, ApplicationForm
+from .facets import get_facet_choices, get_facet_counts, get_facet_filters
+from .pagination import get_keyset_page
+from .search import filter_matches, get_search_backend, get_search_page
 from organisations.models import Organisation
 from notifications.models import Notification
-from volunteers.scheduling import check_hours_limit, get_volunteer_schedule
+from volunteers.models import ParticipationRecord, VolunteerProfile
+from volunteers.scheduling import (
+    check_hours_limit, get_volunteer_schedules, submit_application, triage_applications
+)
+from volunteers.batch_matching import get_suggested_volunteers
+
+
+# Applications listed per page on an opportunity's applications page
+APPLICATIONS_PAGE_SIZE = 50
+
+# Opportunities per page on an organisation admin's list
+MY_OPPORTUNITIES_PAGE_SIZE = 24
+
+# Orderings of an organisation admin's list, by ?sort= value (ties newest first)
+MY_OPPORTUNITIES_SORT_CHOICES = [
+    ('newest', 'Newest'),
+    ('applications', 'Most applications'),
+    ('pending', 'Most pending'),
+    ('accepted', 'Most accepted'),
+    ('hours', 'Most hours logged'),
+    ('title', 'Title'),
+]
+MY_OPPORTUNITIES_ORDERINGS = {
+    'newest': ('-created_at',),
+    'applications': ('-application_count', '-created_at'),
+    'pending': ('-pending_count', '-created_at'),
+    'accepted': ('-accepted_count', '-created_at'),
+    'hours': ('-hours_logged', '-created_at'),
+    'title': ('title', '-created_at'),
+}
+
+# Opportunities per page on the browse page
+BROWSE_PAGE_SIZE = 24
+
+# Columns shown on the browse page (plus the keyset and organisation join)
+BROWSE_FIELDS = (
+    'id', 'title', 'description', 'location', 'category', 'min_hours_per_week',
+    'is_remote', 'created_at', 'organisation__name',
+)
 
 
 def is_org_admin(user):
@@ -21,39 +67,66 @@ def is_volunteer(user):
     return user.is_authenticated and user.is_volunteer()
 
 
+def get_max_hours(user):
+    """A volunteer's weekly hours limit, or 0 without a profile."""
+    try:
+        return user.volunteer_profile.max_hours_per_week
+    except VolunteerProfile.DoesNotExist:
+        return 0
+
+
 def browse_opportunities(request):
-    """Browse all open opportunities with filters."""
+    """Browse open opportunities with filters and facet counts, a page at a time."""
     opportunities = Opportunity.objects.filter(status='OPEN')
     
-    # Filtering
-    category = request.GET.get('category')
+    # Filtering; location and search narrow the facet counts too
     location = request.GET.get('location')
-    is_remote = request.GET.get('is_remote')
     search = request.GET.get('search')
-    
-    if category:
-        opportunities = opportunities.filter(category=category)
     if location:
         opportunities = opportunities.filter(location__icontains=location)
-    if is_remote:
-        opportunities = opportunities.filter(is_remote=(is_remote == 'true'))
-    if search:
-        opportunities = opportunities.filter(
-            Q(title__icontains=search) | Q(description__icontains=search)
+    facets = get_facet_counts(filter_matches(opportunities, search), request.GET)
+    
+    for facet_filter in get_facet_filters(request.GET, timezone.localdate()).values():
+        opportunities = opportunities.filter(facet_filter)
+    opportunities = opportunities.select_related('organisation').only(*BROWSE_FIELDS)
+    
+    # Searches are ranked by relevance where the database has a search index
+    cursor = request.GET.get('cursor')
+    if search and get_search_backend(opportunities.db):
+        opportunities, previous_cursor, next_cursor = get_search_page(
+            opportunities, search, cursor, BROWSE_PAGE_SIZE
+        )
+    else:
+        opportunities, previous_cursor, next_cursor = get_keyset_page(
+            filter_matches(opportunities, search), cursor, BROWSE_PAGE_SIZE
         )
     
-    # Get user's applications if logged in
+    # Get user's applications to this page's opportunities if logged in
     user_applications = {}
     if request.user.is_authenticated:
-        user_applications = {
-            app.opportunity_id: app.status
-            for app in Application.objects.filter(volunteer=request.user)
-        }
+        user_applications = dict(Application.objects.filter(
+            volunteer=request.user,
+            opportunity_id__in=[opportunity.id for opportunity in opportunities]
+        ).values_list('opportunity_id', 'status'))
+    
+    # Page links keep the filters
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    
+    def page_url(cursor):
+        query['cursor'] = cursor
+        return f'?{query.urlencode()}'
     
     context = {
         'opportunities': opportunities,
         'user_applications': user_applications,
-        'categories': Opportunity.CATEGORY_CHOICES,
+        'facet_options': {
+            facet: [(value, label, facets[facet][value]) for value, label in choices]
+            for facet, choices in get_facet_choices().items()
+        },
+        'total': facets['total'],
+        'previous_url': page_url(previous_cursor) if previous_cursor else None,
+        'next_url': page_url(next_cursor) if next_cursor else None,
     }
     return render(request, 'opportunities/browse.html', context)
 
@@ -102,53 +175,31 @@ def opportunity_detail(request, pk):
 @user_passes_test(is_volunteer)
 def apply_to_opportunity(request, pk):
     """Volunteer applies to an opportunity."""
-    opportunity = get_object_or_404(Opportunity, pk=pk)
-    
-    # Check if already applied
-    if Application.objects.filter(volunteer=request.user, opportunity=opportunity).exists():
-        messages.warning(request, 'You have already applied to this opportunity.')
+    if request.method != 'POST':
         return redirect('opportunities:detail', pk=pk)
     
+    opportunity = get_object_or_404(Opportunity.objects.select_related('organisation'), pk=pk)
+    
     # Check if opportunity is open
     if opportunity.status != 'OPEN':
         messages.error(request, 'This opportunity is not currently open for applications.')
         return redirect('opportunities:detail', pk=pk)
     
-    # Check hours limit before allowing application
-    can_apply, current_hours, would_be_hours = check_hours_limit(request.user, opportunity)
-    if not can_apply:
-        try:
-            profile = request.user.volunteer_profile
-            max_hours = profile.max_hours_per_week
-        except:
-            max_hours = 0
-        
+    # Hours limit, application and admin notification in one transaction
+    outcome, hours = submit_application(request.user, opportunity)
+    if outcome == 'DUPLICATE':
+        messages.warning(request, 'You have already applied to this opportunity.')
+    elif outcome == 'OVER_LIMIT':
+        _, current_hours, would_be_hours = hours
         messages.error(
             request,
             f'Cannot apply: This opportunity would exceed your weekly hours limit. '
-            f'You currently have {current_hours} hours/week committed (max: {max_hours} hours/week). '
+            f'You currently have {current_hours} hours/week committed (max: {get_max_hours(request.user)} hours/week). '
             f'This opportunity requires {opportunity.min_hours_per_week} hours/week, '
             f'which would bring you to {would_be_hours} hours/week.'
         )
-        return redirect('opportunities:detail', pk=pk)
-    
-    if request.method == 'POST':
-        application = Application.objects.create(
-            volunteer=request.user,
-            opportunity=opportunity,
-            status='PENDING'
-        )
-        
-        # Create notification for organisation admin
-        Notification.objects.create(
-            user=opportunity.organisation.admin,
-            message=f'New application from {request.user.username} for "{opportunity.title}"',
-            type='OPPORTUNITY_UPDATE'
-        )
-        
+    else:
         messages.success(request, 'Application submitted successfully!')
-        return redirect('opportunities:detail', pk=pk)
-    
     return redirect('opportunities:detail', pk=pk)
 
 
@@ -163,11 +214,27 @@ def list_opportunities(request):
         messages.warning(request, 'You are not associated with any organisation.')
         return redirect('organisations:dashboard')
     
-    # Get opportunities for all organisations managed by this admin
-    opportunities = Opportunity.objects.filter(organisation__in=organisations)
+    # Get opportunities for all organisations managed by this admin, with
+    # their application counts and logged hours from one grouped query
+    sort = request.GET.get('sort')
+    if sort not in MY_OPPORTUNITIES_ORDERINGS:
+        sort = 'newest'
+    logged_hours = ParticipationRecord.objects.filter(
+        opportunity=OuterRef('pk')
+    ).order_by().values('opportunity').annotate(total=Sum('hours_logged')).values('total')
+    opportunities = Opportunity.objects.filter(organisation__in=organisations).annotate(
+        application_count=Count('applications'),
+        pending_count=Count('applications', filter=Q(applications__status='PENDING')),
+        accepted_count=Count('applications', filter=Q(applications__status='ACCEPTED')),
+        hours_logged=Coalesce(Subquery(logged_hours), Value(Decimal('0'))),
+    ).order_by(*MY_OPPORTUNITIES_ORDERINGS[sort], '-id')
+    page = Paginator(opportunities, MY_OPPORTUNITIES_PAGE_SIZE).get_page(request.GET.get('page'))
     
     context = {
-        'opportunities': opportunities,
+        'opportunities': page,
+        'page': page,
+        'sort': sort,
+        'sort_choices': MY_OPPORTUNITIES_SORT_CHOICES,
     }
     return render(request, 'opportunities/my_opportunities.html', context)
 
@@ -269,17 +336,20 @@ def view_applications(request, pk):
         messages.error(request, 'You do not have permission to view these applications.')
         return redirect('opportunities:list')
     
-    applications = Application.objects.filter(opportunity=opportunity).select_related('volunteer', 'volunteer__volunteer_profile').order_by('-created_at')
+    applications = Application.objects.filter(opportunity=opportunity).select_related('volunteer').order_by('-created_at', '-id')
+    page = Paginator(applications, APPLICATIONS_PAGE_SIZE).get_page(request.GET.get('page'))
     
-    # Calculate hours information for each application
+    # Hours information for the page's applicants, in a fixed number of
+    # queries; committed hours are those during this opportunity, as
+    # accepting checks them
+    schedules = get_volunteer_schedules((application.volunteer_id for application in page), opportunity)
     applications_with_hours = []
-    for application in applications:
-        volunteer = application.volunteer
-        schedule = get_volunteer_schedule(volunteer)
+    for application in page:
+        schedule = schedules[application.volunteer_id]
         
-        current_hours = schedule['total_hours']
+        current_hours = schedule['peak_hours']
         max_hours = schedule['max_hours']
-        remaining_hours = schedule.get('remaining_capacity', max_hours - current_hours)
+        remaining_hours = max_hours - current_hours
         
         # Calculate what hours would be if this application is accepted
         hours_for_this = opportunity.min_hours_per_week
@@ -306,10 +376,29 @@ def view_applications(request, pk):
     context = {
         'opportunity': opportunity,
         'applications_with_hours': applications_with_hours,
+        'page': page,
     }
     return render(request, 'opportunities/applications.html', context)
 
 
+@login_required
+@user_passes_test(is_org_admin)
+def suggested_volunteers(request, pk):
+    """Suggested volunteers with spare capacity for a specific opportunity."""
+    opportunity = get_object_or_404(Opportunity, pk=pk)
+    
+    # Check if user manages this opportunity's organisation
+    if opportunity.organisation.admin != request.user:
+        messages.error(request, 'You do not have permission to view suggested volunteers.')
+        return redirect('opportunities:list')
+    
+    context = {
+        'opportunity': opportunity,
+        'suggestions': get_suggested_volunteers(opportunity, limit=20),
+    }
+    return render(request, 'opportunities/suggested_volunteers.html', context)
+
+
 @login_required
 @user_passes_test(is_org_admin)
 def update_application_status(request, application_id, new_status):
@@ -326,16 +415,70 @@ def update_application_status(request, application_id, new_status):
         return redirect('opportunities:applications', pk=application.opportunity.pk)
     
     old_status = application.status
-    application.status = new_status
-    application.save()
-    
-    # Create notification for volunteer
-    Notification.objects.create(
-        user=application.volunteer,
-        message=f'Your application for "{application.opportunity.title}" has been {new_status.lower()}.',
-        type='OPPORTUNITY_UPDATE'
-    )
+    with transaction.atomic():
+        # Accepting commits the volunteer's hours; recheck the limit under their profile lock
+        if new_status == 'ACCEPTED' and old_status != 'ACCEPTED':
+            can_accept, current_hours, would_be_hours = check_hours_limit(
+                application.volunteer, application.opportunity, lock=True
+            )
+            if not can_accept:
+                messages.error(
+                    request,
+                    f'Cannot accept: {application.volunteer.username} already has {current_hours} '
+                    f'hours/week committed during this opportunity, which would bring them to '
+                    f'{would_be_hours} hours/week (max: {get_max_hours(application.volunteer)} hours/week).'
+                )
+                return redirect('opportunities:applications', pk=application.opportunity.pk)
+        
+        application.status = new_status
+        application.save()
+        
+        # Create notification for volunteer
+        Notification.objects.create(
+            user=application.volunteer,
+            message=f'Your application for "{application.opportunity.title}" has been {new_status.lower()}.',
+            type='OPPORTUNITY_UPDATE'
+        )
     
     messages.success(request, f'Application status updated to {new_status}.')
     return redirect('opportunities:applications', pk=application.opportunity.pk)
 
+
+@login_required
+@user_passes_test(is_org_admin)
+def bulk_update_application_status(request):
+    """Update the status of many applications at once."""
+    if request.method != 'POST':
+        return redirect('opportunities:list')
+    
+    new_status = request.POST.get('status')
+    if new_status not in dict(Application.STATUS_CHOICES):
+        messages.error(request, 'Invalid status.')
+        return redirect('opportunities:list')
+    application_ids = [value for value in request.POST.getlist('application_ids') if value.isdigit()]
+    if not application_ids:
+        messages.error(request, 'No applications selected.')
+        return redirect('opportunities:list')
+    
+    updated, refused, unknown_ids = triage_applications(
+        request.user, map(int, application_ids), new_status
+    )
+    
+    if updated:
+        messages.success(request, f'{len(updated)} application(s) updated to {new_status}.')
+    for application, (_, current_hours, would_be_hours) in refused:
+        messages.error(
+            request,
+            f'Cannot accept: {application.volunteer.username} already has {current_hours} '
+            f'hours/week committed during "{application.opportunity.title}", which would bring them to '
+            f'{would_be_hours} hours/week (max: {get_max_hours(application.volunteer)} hours/week).'
+        )
+    if unknown_ids:
+        messages.error(request, f'{len(unknown_ids)} application(s) were not found or are not yours to update.')
+    
+    # Back to the applications page when the selection came from one opportunity
+    opportunity_ids = {application.opportunity_id for application in updated}
+    opportunity_ids.update(application.opportunity_id for application, _ in refused)
+    if len(opportunity_ids) == 1:
+        return redirect('opportunities:applications', pk=opportunity_ids.pop())
+    return redirect('opportunities:list')
@@ -1,17 +1,45 @@
 """
 Unit tests for volunteer matching engine.
 """
-from django.test import TestCase
+import time
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from accounts.models import User
 from organisations.models import Organisation
-from opportunities.models import Opportunity
-from volunteers.models import VolunteerProfile
+from opportunities.models import Opportunity, Application, get_hour_range_mask, parse_day_slots
+from volunteers.models import VolunteerProfile, OpportunitySkillToken, VersionStamp
 from volunteers.matching import (
     calculate_skills_overlap,
     check_interests_match,
     check_availability_overlap,
+    check_location_preference,
     get_recommended_opportunities
 )
+from volunteers.assignment import solve_assignment, suggest_placements
+from volunteers.fuzzy import SkillTrigramIndex, canonical_skill, get_fuzzy_skill_matches, get_trigrams
+from volunteers.interests import InterestClassifier
+from volunteers.caching import (
+    get_cache,
+    get_cache_stats,
+    get_cached_recommendations,
+    volunteer_version_key,
+)
+from volunteers.snapshots import get_snapshot_recommendations, refresh_snapshots
+from volunteers.pagination import get_recommendation_page
+from volunteers.benchmarking import compare_reports, run_scale
+from volunteers.similarity import get_similar_opportunities, get_text_index, reset_text_index
+from volunteers.batch_matching import (
+    get_suggested_volunteers,
+    BatchMatcher,
+    get_recommended_opportunities_batch,
+    get_matching_volunteers_batch,
+)
 
 
 class MatchingEngineTests(TestCase):
@@ -113,4 +141,1244 @@ class MatchingEngineTests(TestCase):
         recommendations = get_recommended_opportunities(self.profile, limit=10)
         self.assertGreater(len(recommendations), 0)
         self.assertEqual(recommendations[0][0], opp)  # Should be first recommendation
+    
+    def test_recommendations_are_top_k_of_full_ranking(self):
+        """Test the streamed top-k equals the head of the full ranking."""
+        for i, skills in enumerate(['Python', 'Teaching', 'Python, Teaching', 'Welsh', 'JavaScript, Art']):
+            Opportunity.objects.create(
+                title=f'Opp {i}',
+                description='Test',
+                location='Test Location',
+                category='EDUCATION',
+                required_skills=skills,
+                min_hours_per_week=2,
+                start_date='2024-01-01',
+                end_date='2099-12-31',
+                is_remote=bool(i % 2),
+                organisation=self.organisation
+            )
+        
+        full = get_recommended_opportunities(self.profile, limit=100)
+        self.assertEqual(len(full), 5)
+        self.assertEqual([score for _, score in full], sorted((score for _, score in full), reverse=True))
+        
+        # Vocabulary, committed hours, candidate rows and one hydrate query
+        with self.assertNumQueries(4):
+            top = get_recommended_opportunities(self.profile, limit=2)
+            organisation_names = [opp.organisation.name for opp, _ in top]
+        self.assertEqual(top, full[:2])
+        self.assertEqual(organisation_names, ['Test Organisation'] * 2)
+
+
+
+class SkillIndexTests(TestCase):
+    """Test the opportunity skill inverted index and candidate selection."""
+    
+    def setUp(self):
+        """Set up test data."""
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python, JavaScript, Teaching',
+            interests='Technology',
+            max_hours_per_week=20,
+            availability={'monday': '9-17'}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+    
+    def create_opportunity(self, title, required_skills, category='OTHER', **kwargs):
+        """Create an open opportunity with sensible defaults."""
+        fields = {
+            'title': title,
+            'description': 'Test',
+            'location': 'Test Location',
+            'category': category,
+            'required_skills': required_skills,
+            'min_hours_per_week': 5,
+            'start_date': '2024-01-01',
+            'end_date': '2099-12-31',
+            'organisation': self.organisation,
+        }
+        fields.update(kwargs)
+        return Opportunity.objects.create(**fields)
+    
+    def index_tokens(self, opportunity):
+        return set(
+            OpportunitySkillToken.objects.filter(
+                opportunity=opportunity
+            ).values_list('token', flat=True)
+        )
+    
+    def test_index_follows_opportunity_lifecycle(self):
+        """Test index entries are added, edited, closed and deleted with the opportunity."""
+        opp = self.create_opportunity('Coding Club', 'Python, Mentoring ,')
+        self.assertEqual(self.index_tokens(opp), {'python', 'mentoring'})
+        
+        opp.required_skills = 'Python, Scratch'
+        opp.save()
+        self.assertEqual(self.index_tokens(opp), {'python', 'scratch'})
+        
+        opp.status = 'CLOSED'
+        opp.save()
+        self.assertEqual(self.index_tokens(opp), set())
+        
+        opp.status = 'OPEN'
+        opp.save()
+        opp_id = opp.id
+        opp.delete()
+        self.assertFalse(OpportunitySkillToken.objects.filter(opportunity_id=opp_id).exists())
+    
+    def test_recommendations_skip_unrelated_opportunities(self):
+        """Test opportunities sharing no token or category are not scored."""
+        skill_match = self.create_opportunity('Web Help', 'Java')  # substring of 'javascript'
+        category_match = self.create_opportunity('IT Support', 'Cooking', category='TECHNOLOGY')
+        unrelated = self.create_opportunity('Gardening', 'Gardening, Cooking')
+        
+        recommended = [opp for opp, score in get_recommended_opportunities(self.profile)]
+        self.assertIn(skill_match, recommended)
+        self.assertIn(category_match, recommended)
+        self.assertNotIn(unrelated, recommended)
+    
+    def test_candidate_scores_match_reference_functions(self):
+        """Test indexed scoring gives the same scores as the per-pair functions."""
+        opp = self.create_opportunity(
+            'Python Tutor', 'Python, Teaching, Welsh',
+            category='EDUCATION', is_remote=True
+        )
+        expected = (
+            calculate_skills_overlap(self.profile.skills, opp.required_skills) * 40
+            + check_interests_match(self.profile.interests, opp.category) * 20
+            + check_availability_overlap(self.profile.availability, opp) * 20
+            + check_location_preference(self.profile, opp) * 10
+            + 10.0
+        )
+        
+        recommendations = dict(get_recommended_opportunities(self.profile))
+        self.assertAlmostEqual(recommendations[opp], expected)
+
+
+class BatchMatchingTests(TestCase):
+    """Test the batch scoring engine agrees with the per-pair functions."""
+    
+    def setUp(self):
+        """Set up a small catalog and several volunteers."""
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        
+        catalog = [
+            ('Python Tutor', 'Python, Teaching', 'EDUCATION', 5, True, '2099-12-31'),
+            ('Web Help', 'Java, HTML, html', 'TECHNOLOGY', 8, False, '2099-12-31'),
+            ('Garden Day', 'Gardening', 'ENVIRONMENT', 2, False, '2099-12-31'),
+            ('Old Event', 'Python', 'COMMUNITY', 1, True, '2020-12-31'),
+            ('Care Shift', 'First Aid, ', 'HEALTHCARE', 12, False, '2099-12-31'),
+            ('Homework Club', 'Tutoring, JS', 'OTHER', 3, False, '2099-12-31'),
+        ]
+        sessions = {
+            'Python Tutor': {'monday': '16-18'},
+            'Garden Day': {'saturday': 'morning', 'sunday': '10-12'},
+            'Old Event': {'friday': '9-17'},
+        }
+        self.opportunities = [
+            Opportunity.objects.create(
+                title=title,
+                description='Test',
+                location='Test Location',
+                category=category,
+                required_skills=skills,
+                min_hours_per_week=hours,
+                start_date='2020-01-01',
+                end_date=end_date,
+                is_remote=is_remote,
+                sessions=sessions.get(title, {}),
+                organisation=self.organisation
+            )
+            for title, skills, category, hours, is_remote, end_date in catalog
+        ]
+        
+        volunteers = [
+            ('Python, JavaScript, Teaching', 'Education, Technology', 10, {'monday': '9-17'}),
+            ('first aid and gardening', 'wellness, green spaces', 15, {}),
+            ('', 'Arts', 4, {'friday': ''}),
+            ('HTML', 'community help', 20, {'sunday': ''}),
+            ('Tutor, Spreadsheets', 'Reading', 6, {}),
+            ('Gardening, Python', 'green', 12, {'monday': '17:00-19:00', 'sat': '9am-11am'}),
+        ]
+        self.profiles = []
+        for i, (skills, interests, max_hours, availability) in enumerate(volunteers):
+            user = User.objects.create_user(
+                username=f'volunteer{i}',
+                email=f'volunteer{i}@test.com',
+                password='testpass123',
+                role='VOLUNTEER'
+            )
+            self.profiles.append(VolunteerProfile.objects.create(
+                user=user,
+                skills=skills,
+                interests=interests,
+                max_hours_per_week=max_hours,
+                availability=availability
+            ))
+    
+    def reference_score(self, profile, opp):
+        """Score a pair with the per-pair reference functions (None if disqualified)."""
+        score = calculate_skills_overlap(profile.skills, opp.required_skills) * 40
+        score += check_interests_match(profile.interests, opp.category) * 20
+        score += check_availability_overlap(profile.availability, opp) * 20
+        score += check_location_preference(profile, opp) * 10
+        if opp.min_hours_per_week > profile.max_hours_per_week:
+            return None
+        return score + 10.0
+    
+    def test_score_matrix_matches_reference(self):
+        """Test every volunteer x opportunity score equals the per-pair score."""
+        matcher = BatchMatcher()
+        scores, shared = matcher.score_chunk(self.profiles)
+        
+        for i, profile in enumerate(self.profiles):
+            for j, opp in enumerate(matcher.opportunities):
+                expected = self.reference_score(profile, opp)
+                if expected is None:
+                    self.assertEqual(scores[i, j], float('-inf'))
+                else:
+                    self.assertEqual(scores[i, j], expected)
+    
+    def test_batch_recommendations_match_recommender(self):
+        """Test batch rankings equal get_recommended_opportunities for each volunteer."""
+        batch = get_recommended_opportunities_batch(self.profiles, limit=10)
+        
+        for profile in self.profiles:
+            self.assertEqual(
+                batch[profile.id],
+                get_recommended_opportunities(profile, limit=10)
+            )
+    
+    def test_matching_volunteers_for_opportunity(self):
+        """Test ranking volunteers for a single opportunity."""
+        opp = self.opportunities[0]
+        ranked = get_matching_volunteers_batch(opp, self.profiles, limit=10)
+        
+        expected = sorted(
+            (
+                (profile, self.reference_score(profile, opp))
+                for profile in self.profiles
+                if self.reference_score(profile, opp) is not None
+            ),
+            key=lambda pair: pair[1],
+            reverse=True
+        )
+        self.assertEqual(ranked, expected)
+
+
+class AvailabilitySlotsTests(TestCase):
+    """Test weekly availability bitmasks and session overlap scoring."""
+    
+    def setUp(self):
+        """Set up an opportunity with evening sessions."""
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.opportunity = Opportunity.objects.create(
+            title='Evening Tutoring',
+            description='Test',
+            location='Test Location',
+            category='EDUCATION',
+            required_skills='Tutoring',
+            min_hours_per_week=4,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            sessions={'monday': '18-20', 'wednesday': '18:00-20:00'},
+            organisation=self.organisation
+        )
+    
+    def create_profile(self, username, availability):
+        user = User.objects.create_user(username=username, password='testpass123', role='VOLUNTEER')
+        return VolunteerProfile.objects.create(
+            user=user,
+            skills='Tutoring',
+            interests='Education',
+            max_hours_per_week=10,
+            availability=availability
+        )
+    
+    def test_schedules_are_encoded_on_save(self):
+        """Test time text is parsed into per-day hour bitmasks."""
+        profile = self.create_profile('volunteer', {'Mon': '9-12, 2pm-3:30pm', 'friday': '', 'wed': 'evenings'})
+        
+        def hours(start, end):
+            return sum(1 << hour for hour in range(start, end))
+        
+        self.assertEqual(
+            profile.availability_slots,
+            [hours(9, 12) | hours(14, 16), 0, hours(17, 21), 0, hours(0, 24), 0, 0]
+        )
+        self.assertEqual(self.opportunity.session_slots[0], hours(18, 20))
+        self.assertEqual(
+            VolunteerProfile.objects.get(pk=profile.pk).availability_slots,
+            profile.availability_slots
+        )
+    
+    def test_ranges_share_meridiem_only_when_ordered(self):
+        """Test am/pm carries over to the other end of a range only where the range stays ordered."""
+        backfill = import_module('volunteers.migrations.0006_volunteerprofile_availability_slots')
+        
+        def hours(start, end):
+            return get_hour_range_mask(start, end)
+        
+        cases = {
+            '10-2pm': hours(10, 14),
+            '11-1pm': hours(11, 13),
+            '1-5pm': hours(13, 17),
+            '12-2pm': hours(12, 14),
+            '9-5': hours(9, 17),
+            '9am-5': hours(9, 17),
+            '22-2': hours(22, 24) | hours(0, 2),
+            '9pm-5': hours(21, 24) | hours(0, 5),
+        }
+        for text, expected in cases.items():
+            self.assertEqual(parse_day_slots(text), expected, text)
+            self.assertEqual(backfill.parse_day_slots(text), expected, text)
+    
+    def test_overlap_is_share_of_session_hours(self):
+        """Test the availability score is the share of session hours covered."""
+        cases = [
+            ({'monday': '18-20', 'wednesday': 'evening'}, 1.0),
+            ({'monday': '19-23'}, 0.25),
+            ({'tuesday': ''}, 0.0),
+            ({}, 0.5),
+        ]
+        for availability, expected in cases:
+            profile = self.create_profile(f'volunteer{len(availability)}{expected}', availability)
+            self.assertEqual(check_availability_overlap(profile.availability, self.opportunity), expected)
+            self.assertEqual(
+                check_availability_overlap(profile.availability, self.opportunity, profile.availability_slots),
+                expected
+            )
+        
+        self.opportunity.sessions = {}
+        self.opportunity.save()
+        self.assertEqual(check_availability_overlap({'tuesday': ''}, self.opportunity), 1.0)
+    
+    def test_suggested_volunteers_score_sessions(self):
+        """Test the reverse matcher scores session overlap like the reference."""
+        full = self.create_profile('full', {'monday': '17-21', 'wednesday': '17-21'})
+        half = self.create_profile('half', {'monday': '18-20'})
+        
+        suggestions = get_suggested_volunteers(self.opportunity)
+        self.assertEqual([profile for profile, _ in suggestions], [full, half])
+        self.assertEqual(suggestions[0][1] - suggestions[1][1], 10.0)
 
+
+class FuzzySkillMatchingTests(TestCase):
+    """Test trigram-based fuzzy skill matching."""
+    
+    def similarity(self, a, b):
+        """Reference trigram similarity from a full comparison of the pair."""
+        a, b = canonical_skill(a), canonical_skill(b)
+        return len(get_trigrams(a) & get_trigrams(b)) / len(get_trigrams(a) | get_trigrams(b))
+    
+    def test_similarity_and_aliases(self):
+        """Test trigram similarity thresholds and alias canonicalization."""
+        index = SkillTrigramIndex(['tutoring', 'javascript', 'cooking'])
+        self.assertEqual(index.matches('tutor', 0.5), {'tutoring'})
+        self.assertEqual(index.matches('tutor', 0.51), set())
+        self.assertEqual(index.matches('js', 1.0), {'javascript'})
+        self.assertEqual(index.matches('python', 0.01), set())
+    
+    def test_fuzzy_skills_overlap(self):
+        """Test near-miss skills count towards the overlap score."""
+        self.assertEqual(calculate_skills_overlap('Tutor', 'Tutoring'), 1.0)
+        self.assertEqual(calculate_skills_overlap('JavaScript, Python', 'JS, Cooking'), 0.5)
+        self.assertEqual(calculate_skills_overlap('Python', 'Cooking, Gardening'), 0.0)
+        
+        with override_settings(SKILL_FUZZY_MATCHING=False):
+            self.assertEqual(calculate_skills_overlap('Tutor', 'Tutoring'), 0.0)
+        with override_settings(SKILL_ALIASES={}):
+            self.assertEqual(calculate_skills_overlap('JavaScript', 'JS'), 0.0)
+    
+    def test_index_prefilter_is_lossless(self):
+        """Test the trigram index finds exactly the tokens a full scan finds."""
+        vocabulary = [
+            'tutoring', 'tutor', 'mentoring', 'first aid', 'gardening', 'garden design',
+            'javascript', 'java', 'python', 'photography', 'photo editing', 'js',
+        ]
+        index = SkillTrigramIndex(vocabulary)
+        for query in ['tutor', 'gardener', 'photographer', 'javascript', 'aid', 'pyton']:
+            for threshold in (0.3, 0.5, 0.7):
+                expected = {
+                    token for token in vocabulary
+                    if self.similarity(query, token) >= threshold
+                }
+                self.assertEqual(index.matches(query, threshold), expected)
+        
+        self.assertEqual(
+            get_fuzzy_skill_matches(['certified tutor'], vocabulary),
+            {'tutor', 'tutoring'}
+        )
+
+
+class InterestClassifierTests(TestCase):
+    """Test the compiled interest classifier."""
+    
+    def test_overlapping_keywords_all_match(self):
+        """Test keywords that overlap or prefix each other are all found."""
+        classifier = InterestClassifier({'A': {'car'}, 'B': {'carpet'}, 'C': {'pet'}, 'D': {'dog'}})
+        self.assertEqual(classifier.classify('carpets'), {'A', 'B', 'C'})
+        self.assertEqual(classifier.classify(''), set())
+    
+    def test_keywords_extend_from_settings(self):
+        """Test INTEREST_CATEGORY_KEYWORDS adds keywords and recompiles the matcher."""
+        self.assertEqual(check_interests_match('Mentoring', 'EDUCATION'), 0.0)
+        with override_settings(INTEREST_CATEGORY_KEYWORDS={'Education': ['Mentor']}):
+            self.assertEqual(check_interests_match('Mentoring', 'EDUCATION'), 1.0)
+            self.assertEqual(check_interests_match('Teaching', 'EDUCATION'), 1.0)
+        self.assertEqual(check_interests_match('Mentoring', 'EDUCATION'), 0.0)
+
+
+class AssignmentTests(TestCase):
+    """Test the capacity-constrained placement optimizer."""
+    
+    def setUp(self):
+        """Set up an organisation and a helper catalog."""
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+    
+    def create_opportunity(self, title, required_skills, hours, volunteers_needed):
+        return Opportunity.objects.create(
+            title=title,
+            description='Test',
+            location='Test Location',
+            category='OTHER',
+            required_skills=required_skills,
+            min_hours_per_week=hours,
+            volunteers_needed=volunteers_needed,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+    
+    def create_profile(self, username, skills, max_hours):
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        return VolunteerProfile.objects.create(
+            user=user,
+            skills=skills,
+            interests='',
+            max_hours_per_week=max_hours,
+            availability={'monday': '9-17'}
+        )
+    
+    def test_solver_beats_greedy(self):
+        """Test the auction finds the best total, not each volunteer's favourite."""
+        # Both prefer opportunity 0, but only volunteer 1 has no alternative
+        candidates = [[(0, 90.0), (1, 85.0)], [(0, 80.0)], []]
+        self.assertEqual(solve_assignment(candidates, [1, 1]), [1, 0, None])
+        
+        # Capacity 2 takes the two best of three
+        candidates = [[(0, 50.0)], [(0, 70.0)], [(0, 60.0)]]
+        self.assertEqual(solve_assignment(candidates, [2]), [None, 0, 0])
+    
+    def test_placements_respect_capacity_and_hours(self):
+        """Test suggested placements fit places, weekly hours and existing applications."""
+        coding = self.create_opportunity('Coding Club', 'Python', hours=5, volunteers_needed=2)
+        tutoring = self.create_opportunity('Homework Help', 'Python, Teaching', hours=4, volunteers_needed=1)
+        busy = self.create_profile('busy', 'Python, Teaching', max_hours=9)
+        keen = self.create_profile('keen', 'Python', max_hours=10)
+        applied = self.create_profile('applied', 'Python', max_hours=10)
+        Application.objects.create(volunteer=applied.user, opportunity=coding, status='ACCEPTED')
+        
+        placements = suggest_placements(max_placements=2)
+        pairs = {(p['profile'].id, p['opportunity'].id) for p in placements}
+        
+        # Coding has one place left after the accepted application; giving it to
+        # keen lets busy take the tutoring role, so round two has no free place
+        self.assertEqual(pairs, {(busy.id, tutoring.id), (keen.id, coding.id)})
+        self.assertTrue(all(p['round'] == 1 for p in placements))
+    
+    def test_placements_count_only_overlapping_commitments(self):
+        """Test hours are checked week by week, so past or later commitments don't block a placement."""
+        def create_term(title, start_date, end_date, status='OPEN'):
+            return Opportunity.objects.create(
+                title=title,
+                description='Test',
+                location='Test Location',
+                category='OTHER',
+                required_skills='Python',
+                min_hours_per_week=6,
+                volunteers_needed=1,
+                start_date=start_date,
+                end_date=end_date,
+                status=status,
+                organisation=self.organisation
+            )
+        
+        finished = create_term('Last Year', '2020-01-01', '2020-06-30', status='CLOSED')
+        spring = create_term('Spring Term', '2090-01-01', '2090-06-30')
+        autumn = create_term('Autumn Term', '2090-09-01', '2090-12-31')
+        profile = self.create_profile('student', 'Python', max_hours=10)
+        Application.objects.create(volunteer=profile.user, opportunity=finished, status='ACCEPTED')
+        
+        placements = suggest_placements(max_placements=3)
+        self.assertCountEqual([p['opportunity'] for p in placements], [spring, autumn])
+        self.assertEqual(sorted(p['round'] for p in placements), [1, 2])
+
+
+class RecommendationCacheTests(TestCase):
+    """Test the per-volunteer recommendation cache and its invalidation."""
+    
+    def setUp(self):
+        """Set up test data."""
+        get_cache().clear()
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python, Teaching',
+            interests='Education',
+            max_hours_per_week=10,
+            availability={'monday': '9-17'}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.python_opp = self.create_opportunity('Python Club', 'Python', 'TECHNOLOGY')
+        self.cooking_opp = self.create_opportunity('Soup Kitchen', 'Cooking', 'COMMUNITY')
+    
+    def create_opportunity(self, title, required_skills, category, min_hours=5):
+        return Opportunity.objects.create(
+            title=title,
+            description='Test',
+            location='Test Location',
+            category=category,
+            required_skills=required_skills,
+            min_hours_per_week=min_hours,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+    
+    def assert_cache_hit(self, expected_hit):
+        before = get_cache_stats()['hits']
+        recommendations = get_cached_recommendations(self.profile)
+        self.assertEqual(get_cache_stats()['hits'] - before, 1 if expected_hit else 0)
+        return recommendations
+    
+    def test_second_request_is_a_hit(self):
+        """Test cached results are served and match the recommender."""
+        first = self.assert_cache_hit(False)
+        second = self.assert_cache_hit(True)
+        self.assertEqual(first, second)
+        self.assertEqual(second, get_recommended_opportunities(self.profile))
+    
+    def test_unrelated_opportunity_change_keeps_entry(self):
+        """Test editing an opportunity the volunteer can't match keeps the entry."""
+        self.assert_cache_hit(False)
+        self.cooking_opp.min_hours_per_week = 3
+        self.cooking_opp.save()
+        self.assert_cache_hit(True)
+    
+    def test_related_opportunity_change_invalidates(self):
+        """Test editing or adding a matching opportunity invalidates the entry."""
+        self.assert_cache_hit(False)
+        self.python_opp.status = 'CLOSED'
+        self.python_opp.save()
+        recommendations = self.assert_cache_hit(False)
+        self.assertNotIn(self.python_opp, [opp for opp, score in recommendations])
+        
+        # A brand new token ('teach' is a substring of 'teaching') changes the vocabulary
+        new_opp = self.create_opportunity('Mentoring', 'Teach', 'OTHER')
+        recommendations = self.assert_cache_hit(False)
+        self.assertIn(new_opp, [opp for opp, score in recommendations])
+    
+    def test_profile_and_acceptance_changes_invalidate(self):
+        """Test profile edits and ACCEPTED applications invalidate the entry."""
+        self.assert_cache_hit(False)
+        self.profile.max_hours_per_week = 2
+        self.profile.save()
+        self.assertEqual(self.assert_cache_hit(False), [])
+        
+        self.profile.max_hours_per_week = 10
+        self.profile.save()
+        self.assert_cache_hit(False)
+        application = Application.objects.create(
+            volunteer=self.volunteer_user,
+            opportunity=self.cooking_opp,
+            status='PENDING'
+        )
+        self.assert_cache_hit(True)
+        application.status = 'ACCEPTED'
+        application.save()
+        self.assert_cache_hit(False)
+    
+    def test_stamps_are_shared_between_processes(self):
+        """Test a stamp bumped by another worker process invalidates this process's entry."""
+        self.assert_cache_hit(False)
+        self.assert_cache_hit(True)
+        # Another process bumps the stamp in the database, leaving this process's cache alone
+        VersionStamp.objects.filter(key=volunteer_version_key(self.volunteer_user.pk)).update(stamp='elsewhere')
+        self.assert_cache_hit(False)
+
+
+class RecommendationSnapshotTests(TestCase):
+    """Test precomputed recommendation snapshots and their incremental refresh."""
+    
+    def setUp(self):
+        """Set up a volunteer and two opportunities."""
+        get_cache().clear()
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python, Teaching',
+            interests='Education',
+            max_hours_per_week=10,
+            availability={'monday': '9-17'}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.opportunities = [
+            Opportunity.objects.create(
+                title=title,
+                description='Test',
+                location='Test Location',
+                category='EDUCATION',
+                required_skills=required_skills,
+                min_hours_per_week=5,
+                start_date='2024-01-01',
+                end_date='2099-12-31',
+                organisation=self.organisation
+            )
+            for title, required_skills in [('Python Club', 'Python'), ('Reading Club', 'Teaching')]
+        ]
+    
+    def test_refresh_is_incremental(self):
+        """Test only volunteers whose profile or commitments changed are recomputed."""
+        self.assertIsNone(get_snapshot_recommendations(self.profile))
+        self.assertEqual(refresh_snapshots(workers=0), 1)
+        self.assertEqual(
+            get_snapshot_recommendations(self.profile, limit=20),
+            get_recommended_opportunities(self.profile, limit=20)
+        )
+        self.assertEqual(refresh_snapshots(workers=0), 0)
+        
+        self.profile.max_hours_per_week = 2
+        self.profile.save()
+        self.assertIsNone(get_snapshot_recommendations(self.profile))
+        self.assertEqual(refresh_snapshots(workers=0), 1)
+        self.assertEqual(get_snapshot_recommendations(self.profile), [])
+        
+        self.profile.max_hours_per_week = 10
+        self.profile.save()
+        refresh_snapshots(workers=0)
+        Application.objects.create(
+            volunteer=self.volunteer_user,
+            opportunity=self.opportunities[0],
+            status='ACCEPTED'
+        )
+        self.assertEqual(refresh_snapshots(workers=0), 1)
+    
+    def test_recommended_page_reads_snapshot(self):
+        """Test the recommended page serves the snapshot without computing."""
+        refresh_snapshots(workers=0)
+        
+        misses = get_cache_stats()['misses']
+        self.client.force_login(self.volunteer_user)
+        response = self.client.get(reverse('volunteers:recommended'))
+        self.assertEqual(get_cache_stats()['misses'], misses)
+        self.assertCountEqual(
+            [opp for opp, score in response.context['recommendations']],
+            self.opportunities
+        )
+    
+    def test_catalog_changes_invalidate_snapshots(self):
+        """Test editing, adding or deleting a matching opportunity stops the stored snapshot being used."""
+        refresh_snapshots(workers=0)
+        self.opportunities[1].min_hours_per_week = 6
+        self.opportunities[1].save()
+        self.assertIsNone(get_snapshot_recommendations(self.profile))
+        
+        misses = get_cache_stats()['misses']
+        self.client.force_login(self.volunteer_user)
+        self.client.get(reverse('volunteers:recommended'))
+        self.assertEqual(get_cache_stats()['misses'], misses + 1)
+        
+        self.assertEqual(refresh_snapshots(workers=0), 1)
+        self.assertIsNotNone(get_snapshot_recommendations(self.profile))
+        new_opp = Opportunity.objects.create(
+            title='Python Workshop',
+            description='Test',
+            location='Test Location',
+            category='EDUCATION',
+            required_skills='Python',
+            min_hours_per_week=5,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+        self.assertIsNone(get_snapshot_recommendations(self.profile))
+        refresh_snapshots(workers=0)
+        self.assertIn(new_opp, [opp for opp, score in get_snapshot_recommendations(self.profile)])
+        
+        new_opp.delete()
+        self.assertIsNone(get_snapshot_recommendations(self.profile))
+    
+    def test_unrelated_changes_keep_snapshots(self):
+        """Test edits no ranking of the volunteer depends on leave the snapshot valid."""
+        gardening = Opportunity.objects.create(
+            title='Garden Care',
+            description='Test',
+            location='Test Location',
+            category='ENVIRONMENT',
+            required_skills='Gardening',
+            min_hours_per_week=5,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+        refresh_snapshots(workers=0)
+        snapshot = get_snapshot_recommendations(self.profile)
+        
+        gardening.min_hours_per_week = 3
+        gardening.save()
+        self.opportunities[0].title = 'Python Coding Club'
+        self.opportunities[0].save()
+        self.assertIsNotNone(get_snapshot_recommendations(self.profile))
+        self.assertEqual(refresh_snapshots(workers=0), 0)
+        self.assertEqual(
+            [opp.id for opp, _ in get_snapshot_recommendations(self.profile)],
+            [opp.id for opp, _ in snapshot]
+        )
+
+
+class TextSimilarityTests(TestCase):
+    """Test the TF-IDF text similarity recommender and its incremental index."""
+    
+    def setUp(self):
+        """Set up a volunteer and opportunities with descriptive text."""
+        get_cache().clear()
+        reset_text_index()
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Gardening, Composting',
+            interests='Urban wildlife',
+            max_hours_per_week=10,
+            availability={'monday': '9-17'}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.garden = self.create_opportunity(
+            'Community Garden', 'Weekly gardening and composting in the community garden.', 'Gardening'
+        )
+        self.park = self.create_opportunity(
+            'Park Survey', 'Count urban wildlife in the park.', 'Observation'
+        )
+        self.coding = self.create_opportunity(
+            'Code Club', 'Teach children to program games.', 'Python'
+        )
+    
+    def create_opportunity(self, title, description, required_skills, min_hours=5):
+        return Opportunity.objects.create(
+            title=title,
+            description=description,
+            location='Test Location',
+            category='ENVIRONMENT',
+            required_skills=required_skills,
+            min_hours_per_week=min_hours,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+    
+    def test_ranks_by_text_similarity(self):
+        """Test opportunities are ranked by cosine similarity of their text."""
+        recommendations = get_similar_opportunities(self.profile)
+        self.assertEqual([opp for opp, score in recommendations], [self.garden, self.park])
+        self.assertTrue(100 >= recommendations[0][1] > recommendations[1][1] > 0)
+        
+        with override_settings(RECOMMENDATION_MODE='tfidf'):
+            self.assertEqual(get_recommended_opportunities(self.profile), recommendations)
+            self.assertEqual(get_cached_recommendations(self.profile), recommendations)
+    
+    def test_index_follows_catalog_changes(self):
+        """Test edits, closures and new opportunities update the index without a rebuild."""
+        index = get_text_index()
+        scores = index.score('gardening composting')
+        self.coding.description = 'Build a website for the gardening club.'
+        self.coding.save()
+        self.garden.status = 'CLOSED'
+        self.garden.save()
+        new_opp = self.create_opportunity('Compost Drive', 'Collect composting waste.', 'Driving')
+        
+        synced = get_text_index()
+        self.assertIs(synced.posting_rows, index.posting_rows)
+        # The index handed out before the sync is left as it was for callers still using it
+        self.assertIsNot(synced, index)
+        self.assertEqual(sorted(index.row_of), sorted([self.garden.pk, self.park.pk, self.coding.pk]))
+        self.assertEqual(index.score('gardening composting').tolist(), scores.tolist())
+        ranked = [opp for opp, score in get_similar_opportunities(self.profile)]
+        self.assertCountEqual(ranked, [self.park, self.coding, new_opp])
+        
+        new_opp.delete()
+        ranked = [opp for opp, score in get_similar_opportunities(self.profile)]
+        self.assertCountEqual(ranked, [self.park, self.coding])
+    
+    def test_deletions_are_found_when_the_open_count_is_unchanged(self):
+        """Test a deleted opportunity leaves the index even if another reopened in bulk meanwhile."""
+        self.garden.status = 'CLOSED'
+        self.garden.save()
+        get_text_index()
+        
+        # A bulk restore bypasses signals and leaves an older updated_at; the delete bumps the stamp
+        Opportunity.objects.filter(pk=self.garden.pk).update(
+            status='OPEN', updated_at=self.garden.updated_at - timedelta(days=1)
+        )
+        self.park.delete()
+        index = get_text_index()
+        self.assertEqual(sorted(index.row_of), sorted([self.garden.pk, self.coding.pk]))
+        self.assertEqual([opp for opp, score in get_similar_opportunities(self.profile)], [self.garden])
+    
+    def test_hours_limit_is_respected(self):
+        """Test opportunities that would exceed the volunteer's hours are skipped."""
+        self.garden.min_hours_per_week = 11
+        self.garden.save()
+        self.assertEqual([opp for opp, score in get_similar_opportunities(self.profile)], [self.park])
+
+
+class RecommendationPaginationTests(TestCase):
+    """Test cursor pagination over a frozen recommendation ranking."""
+    
+    def setUp(self):
+        """Set up a volunteer matching 25 opportunities."""
+        get_cache().clear()
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python, Teaching',
+            interests='Education',
+            max_hours_per_week=40,
+            availability={'monday': '9-17'}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        for number in range(25):
+            Opportunity.objects.create(
+                title=f'Opportunity {number}',
+                description='Test',
+                location='Test Location',
+                category='EDUCATION' if number % 2 else 'OTHER',
+                required_skills='Python' if number % 3 else 'Python, Teaching',
+                min_hours_per_week=1 + number % 4,
+                start_date='2024-01-01',
+                end_date='2099-12-31',
+                organisation=self.organisation
+            )
+    
+    def test_pages_follow_frozen_ranking(self):
+        """Test pages walk the ranking from page 1 even after it changes."""
+        ranked = get_recommended_opportunities(self.profile, limit=25)
+        first, offset, cursor, expired = get_recommendation_page(self.profile, page_size=10)
+        self.assertEqual((len(first), offset, expired), (10, 0, False))
+        
+        # A profile edit changes the live ranking but not the frozen one, which
+        # travels in the cursor rather than in any process's cache
+        self.profile.interests = 'Sports'
+        self.profile.save()
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            second, offset, cursor, _ = get_recommendation_page(self.profile, cursor, page_size=10)
+        self.assertEqual((len(second), offset), (10, 10))
+        self.assertEqual(len(queries), 1)
+        third, offset, cursor, _ = get_recommendation_page(self.profile, cursor, page_size=10)
+        self.assertEqual((len(third), offset, cursor), (5, 20, None))
+        self.assertEqual(first + second + third, ranked)
+    
+    def test_expired_cursor_is_reported(self):
+        """Test an expired cursor gives the first page and says so."""
+        first, _, cursor, _ = get_recommendation_page(self.profile, page_size=10)
+        later = time.time() + settings.RECOMMENDATION_CURSOR_TIMEOUT + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            page, offset, _, expired = get_recommendation_page(self.profile, cursor, page_size=10)
+        self.assertEqual((page, offset, expired), (first, 0, True))
+        
+        self.client.force_login(self.volunteer_user)
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            response = self.client.get(reverse('volunteers:recommended'), {'cursor': cursor})
+        self.assertEqual(response.context['offset'], 0)
+        self.assertIn('refreshed', ' '.join(str(message) for message in response.context['messages']))
+    
+    def test_invalid_or_foreign_cursor_restarts(self):
+        """Test tampered cursors and other volunteers' cursors give the first page."""
+        first, _, cursor, _ = get_recommendation_page(self.profile, page_size=10)
+        self.assertEqual(get_recommendation_page(self.profile, cursor + 'x', page_size=10)[:2], (first, 0))
+        self.assertFalse(get_recommendation_page(self.profile, cursor + 'x', page_size=10)[3])
+        
+        other_user = User.objects.create_user(username='other', password='testpass123', role='VOLUNTEER')
+        other = VolunteerProfile.objects.create(user=other_user, skills='Python', interests='', max_hours_per_week=40)
+        self.assertEqual(get_recommendation_page(other, cursor, page_size=10)[1], 0)
+    
+    def test_recommended_page_links_next_page(self):
+        """Test the recommended page shows 20 and links to the rest."""
+        self.client.force_login(self.volunteer_user)
+        response = self.client.get(reverse('volunteers:recommended'))
+        self.assertEqual(len(response.context['recommendations']), 20)
+        response = self.client.get(reverse('volunteers:recommended'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(response.context['recommendations']), 5)
+        self.assertIsNone(response.context['next_cursor'])
+
+
+class RecommendedViewQueryTests(TestCase):
+    """Test the recommended page runs a constant number of queries."""
+    
+    def setUp(self):
+        """Set up a volunteer with accepted commitments and an organisation."""
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python, Teaching',
+            interests='Education',
+            max_hours_per_week=40,
+            availability={'monday': '9-17'}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.created = 0
+        for opp in self.add_opportunities(3):
+            Application.objects.create(volunteer=self.volunteer_user, opportunity=opp, status='ACCEPTED')
+        self.client.force_login(self.volunteer_user)
+    
+    def add_opportunities(self, count):
+        opportunities = []
+        for _ in range(count):
+            self.created += 1
+            opportunities.append(Opportunity.objects.create(
+                title=f'Opportunity {self.created}',
+                description='Test',
+                location='Test Location',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=1,
+                start_date='2024-01-01',
+                end_date='2099-12-31',
+                organisation=self.organisation
+            ))
+        return opportunities
+    
+    def count_page_queries(self):
+        get_cache().clear()
+        with CaptureQueriesContext(connection) as uncached:
+            response = self.client.get(reverse('volunteers:recommended'))
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(reverse('volunteers:recommended'))
+        return len(uncached), len(cached)
+    
+    def test_query_count_independent_of_catalog_size(self):
+        """Test page queries stay the same as the catalog and commitments grow."""
+        small = self.count_page_queries()
+        self.add_opportunities(15)
+        large = self.count_page_queries()
+        
+        self.assertEqual(small, large)
+        # Including the read of the entry's version stamps
+        self.assertLessEqual(large[0], 11)
+
+
+class SuggestedVolunteersTests(TestCase):
+    """Test reverse matching of volunteers to an opportunity."""
+    
+    def setUp(self):
+        """Set up an opportunity and a pool of volunteers."""
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.opportunity = Opportunity.objects.create(
+            title='First Aid Cover',
+            description='Test',
+            location='Test Location',
+            category='HEALTHCARE',
+            required_skills='First Aid, Driving',
+            min_hours_per_week=5,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+    
+    def create_profile(self, username, skills, interests, max_hours=10, availability=None):
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        return VolunteerProfile.objects.create(
+            user=user,
+            skills=skills,
+            interests=interests,
+            max_hours_per_week=max_hours,
+            availability={'monday': ''} if availability is None else availability
+        )
+    
+    def test_suggestions_use_index_and_capacity(self):
+        """Test candidates come from shared tokens or categories and must have capacity."""
+        exact = self.create_profile('exact', 'First Aid, Driving', 'Sports')
+        worded = self.create_profile('worded', 'certified first aid trainer', 'Music')
+        by_interest = self.create_profile('interest', 'Painting', 'health and wellness')
+        self.create_profile('unrelated', 'Painting', 'Music')
+        self.create_profile('busy', 'First Aid', 'Sports', max_hours=4)
+        applied = self.create_profile('applied', 'First Aid', 'Sports')
+        Application.objects.create(volunteer=applied.user, opportunity=self.opportunity)
+        
+        suggestions = get_suggested_volunteers(self.opportunity, limit=10)
+        
+        self.assertEqual([profile for profile, _ in suggestions], [exact, by_interest, worded])
+        self.assertEqual(get_suggested_volunteers(self.opportunity, shortlist_size=2), suggestions)
+        for profile, score in suggestions:
+            expected = (
+                calculate_skills_overlap(profile.skills, self.opportunity.required_skills) * 40
+                + check_interests_match(profile.interests, self.opportunity.category) * 20
+                + check_availability_overlap(profile.availability, self.opportunity) * 20
+                + check_location_preference(profile, self.opportunity) * 10
+                + 10.0
+            )
+            self.assertAlmostEqual(score, expected)
+    
+    def test_best_candidates_beyond_first_page_are_found(self):
+        """Test paging goes on while later shortlist pages could still hold better scores."""
+        # Equal estimates are shortlisted newest first; only the oldest profiles give availability
+        best = [self.create_profile(f'best{k}', 'Painting', 'health and wellness') for k in range(2)]
+        for k in range(5):
+            self.create_profile(f'tied{k}', 'Painting', 'health and wellness', availability={})
+        
+        suggestions = get_suggested_volunteers(self.opportunity, limit=2, shortlist_size=2)
+        self.assertEqual([profile for profile, _ in suggestions], best[::-1])
+        self.assertEqual(get_suggested_volunteers(self.opportunity, limit=2), suggestions)
+    
+    def test_queries_do_not_grow_with_lower_ranked_volunteers(self):
+        """Test the shortlist is ranked once and paging stops at the first page that settles the top."""
+        best = [self.create_profile(f'best{k}', 'First Aid, Driving', 'health and wellness') for k in range(2)]
+        for k in range(30):
+            self.create_profile(f'lower{k}', 'Driving', 'health and wellness')
+        get_suggested_volunteers(self.opportunity, limit=2)
+        
+        # Version stamp, two required tokens, interests, one page of profiles
+        # and commitments, then the returned profiles
+        with self.assertNumQueries(7):
+            suggestions = get_suggested_volunteers(self.opportunity, limit=2, shortlist_size=5)
+        self.assertEqual([profile for profile, _ in suggestions], best[::-1])
+    
+    def test_skills_containing_a_required_token_are_candidates(self):
+        """Test substring matches that are no whole word of the skills still shortlist a volunteer."""
+        profile = self.create_profile('aider', 'Qualified First Aider', 'Music')
+        
+        suggestions = get_suggested_volunteers(self.opportunity)
+        self.assertEqual([p for p, _ in suggestions], [profile])
+        self.assertAlmostEqual(
+            suggestions[0][1] - 20 - 10 * check_location_preference(profile, self.opportunity) - 10,
+            calculate_skills_overlap(profile.skills, self.opportunity.required_skills) * 40
+        )
+    
+    def test_committed_hours_reduce_capacity(self):
+        """Test accepted commitments elsewhere remove volunteers without spare hours."""
+        profile = self.create_profile('committed', 'First Aid', 'Sports', max_hours=8)
+        other = Opportunity.objects.create(
+            title='Other',
+            description='Test',
+            location='Test Location',
+            category='SPORTS',
+            required_skills='Coaching',
+            min_hours_per_week=4,
+            start_date='2024-01-01',
+            end_date='2099-12-31',
+            organisation=self.organisation
+        )
+        self.assertEqual(len(get_suggested_volunteers(self.opportunity)), 1)
+        Application.objects.create(volunteer=profile.user, opportunity=other, status='ACCEPTED')
+        self.assertEqual(get_suggested_volunteers(self.opportunity), [])
+    
+    def test_index_follows_profile_edits(self):
+        """Test the reverse index is updated when a profile changes."""
+        profile = self.create_profile('changer', 'Painting', 'Music')
+        self.assertEqual(get_suggested_volunteers(self.opportunity), [])
+        
+        profile.skills = 'Driving'
+        profile.save()
+        self.assertEqual([p for p, _ in get_suggested_volunteers(self.opportunity)], [profile])
+    
+    def test_suggested_volunteers_page(self):
+        """Test the org admin page lists suggested volunteers."""
+        self.create_profile('exact', 'First Aid, Driving', 'Sports')
+        self.client.force_login(self.org_admin)
+        response = self.client.get(
+            reverse('opportunities:suggested_volunteers', args=[self.opportunity.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'exact')
+
+
+class MatchingBenchmarkTests(TestCase):
+    """Test the matching benchmark suite on a tiny synthetic dataset."""
+    
+    def test_run_scale_reports_metrics_and_rolls_back(self):
+        """Test each benchmark is measured and the synthetic data is discarded."""
+        results = run_scale(50, pairs=20, volunteers=5)
+        for benchmark in ('calculate_skills_overlap', 'check_interests_match', 'get_recommended_opportunities'):
+            self.assertGreater(results[benchmark]['median_ms'], 0)
+            self.assertGreater(results[benchmark]['peak_memory_kib'], 0)
+        self.assertEqual(results['calculate_skills_overlap']['queries_per_call'], 0)
+        self.assertGreater(results['get_recommended_opportunities']['queries_per_call'], 0)
+        self.assertFalse(Opportunity.objects.exists())
+        self.assertFalse(VolunteerProfile.objects.exists())
+    
+    def test_compare_reports_flags_regressions(self):
+        """Test slower timings beyond the tolerance and any extra query are regressions."""
+        metrics = {'median_ms': 10.0, 'queries_per_call': 3.0, 'peak_memory_kib': 100.0}
+        baseline = {'scales': {'1k': {'setup_seconds': 1.0, 'recommend': metrics}}}
+        current = {'scales': {'1k': {'setup_seconds': 2.0, 'recommend': dict(
+            metrics, median_ms=11.0, queries_per_call=4.0
+        )}}}
+        
+        rows = compare_reports(baseline, current, tolerance=0.2)
+        self.assertEqual(
+            {row['metric']: row['regression'] for row in rows},
+            {'median_ms': False, 'queries_per_call': True, 'peak_memory_kib': False}
+        )
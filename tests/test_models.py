@@ -116,4 +116,42 @@ class ModelTests(TestCase):
         # Test mark as read
         notification.mark_as_read()
         self.assertIsNotNone(notification.read_at)
-
+    
+    def test_normalized_skill_columns(self):
+        """Test skills and interests are normalized on save and bulk create."""
+        opp = Opportunity.objects.create(
+            title='Test Opp',
+            description='Test',
+            location='Test',
+            category='EDUCATION',
+            required_skills=' Python, First Aid ,',
+            min_hours_per_week=5,
+            start_date='2024-01-01',
+            end_date='2024-12-31',
+            organisation=self.organisation
+        )
+        opp.refresh_from_db()
+        self.assertEqual(opp.skill_tokens, ['python', 'first aid', ''])
+        
+        opp.required_skills = 'Cooking'
+        opp.save()
+        opp.refresh_from_db()
+        self.assertEqual(opp.skill_tokens, ['cooking'])
+        
+        profile = VolunteerProfile.objects.create(
+            user=self.user,
+            skills='Python,  JavaScript',
+            interests='Education, Tech',
+            max_hours_per_week=10
+        )
+        profile.refresh_from_db()
+        self.assertEqual(profile.skill_tokens, ['python', 'javascript'])
+        self.assertEqual(profile.skills_normalized, 'python,  javascript')
+        self.assertEqual(profile.interests_normalized, 'education, tech')
+        
+        [bulk_profile] = VolunteerProfile.objects.bulk_create([
+            VolunteerProfile(user=self.org_admin, skills='Art', interests='Music')
+        ])
+        bulk_profile = VolunteerProfile.objects.get(pk=bulk_profile.pk)
+        self.assertEqual(bulk_profile.skill_tokens, ['art'])
+        self.assertEqual(bulk_profile.interests_normalized, 'music')
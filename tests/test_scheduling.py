@@ -1,12 +1,35 @@
 """
 Unit tests for scheduling and availability logic.
 """
+import random
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from django.core import serializers
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
 from accounts.models import User
+from notifications.models import Notification
 from organisations.models import Organisation
 from opportunities.models import Opportunity, Application
 from volunteers.models import VolunteerProfile
-from volunteers.scheduling import check_hours_limit, get_volunteer_schedule
+from volunteers.batch_matching import BatchMatcher
+from volunteers.matching import get_recommended_opportunities
+from volunteers.scheduling import (
+    CommitmentCalendar,
+    check_hours_limit,
+    check_hours_limit_bulk,
+    count_committed_hours,
+    get_volunteer_schedule,
+    get_volunteer_schedules,
+    get_week,
+    reconcile_committed_hours,
+    submit_application,
+    triage_applications,
+)
 
 
 class SchedulingTests(TestCase):
@@ -156,4 +179,522 @@ class SchedulingTests(TestCase):
         self.assertEqual(len(schedule['opportunities']), 1)
         self.assertEqual(schedule['total_hours'], 5)
         self.assertEqual(schedule['max_hours'], 10)
+    
+    
+    def test_hours_limit_bulk_matches_single_checks(self):
+        """Test the bulk hours check agrees with check_hours_limit without extra queries."""
+        accepted = Opportunity.objects.create(
+            title='Accepted Opp',
+            description='Test',
+            location='Test',
+            category='EDUCATION',
+            required_skills='Python',
+            min_hours_per_week=4,
+            start_date='2024-01-01',
+            end_date='2024-12-31',
+            organisation=self.organisation
+        )
+        Application.objects.create(
+            volunteer=self.volunteer_user,
+            opportunity=accepted,
+            status='ACCEPTED'
+        )
+        candidates = [
+            Opportunity.objects.create(
+                title=f'Opp {hours}',
+                description='Test',
+                location='Test',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=hours,
+                start_date='2024-01-01',
+                end_date='2024-12-31',
+                organisation=self.organisation
+            )
+            for hours in (2, 6, 7)
+        ]
+        
+        with self.assertNumQueries(1):
+            results = check_hours_limit_bulk(self.profile, candidates)
+        
+        for opp in candidates:
+            self.assertEqual(results[opp.id], check_hours_limit(self.volunteer_user, opp))
+        self.assertEqual(results[candidates[1].id], (True, 4, 10))
+        self.assertEqual(results[candidates[2].id], (False, 4, 11))
+
+
+class CommittedHoursCounterTests(TestCase):
+    """Test the denormalized committed hours counter on VolunteerProfile."""
+    
+    def setUp(self):
+        """Set up a volunteer and two opportunities."""
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python',
+            interests='Education',
+            max_hours_per_week=10,
+            availability={}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.opportunities = [
+            Opportunity.objects.create(
+                title=f'Opp {hours}',
+                description='Test',
+                location='Test',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=hours,
+                start_date='2024-01-01',
+                end_date='2024-12-31',
+                organisation=self.organisation
+            )
+            for hours in (3, 4)
+        ]
+    
+    def assertCounter(self, hours):
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.committed_hours_per_week, hours)
+        self.assertEqual(count_committed_hours(self.volunteer_user), hours)
+    
+    def test_counter_follows_application_lifecycle(self):
+        """Test acceptance, hours edits, withdrawal and deletion update the counter."""
+        first, second = self.opportunities
+        application = Application.objects.create(volunteer=self.volunteer_user, opportunity=first)
+        self.assertCounter(0)
+        
+        application.status = 'ACCEPTED'
+        application.save()
+        Application.objects.create(volunteer=self.volunteer_user, opportunity=second, status='ACCEPTED')
+        self.assertCounter(7)
+        
+        first.min_hours_per_week = 5
+        first.save()
+        self.assertCounter(9)
+        
+        application = Application.objects.get(pk=application.pk)
+        application.status = 'WITHDRAWN'
+        application.save()
+        self.assertCounter(4)
+        
+        second.delete()
+        self.assertCounter(0)
+    
+    def test_hours_limit_ignores_a_drifted_counter(self):
+        """Test check_hours_limit counts the accepted applications even when the counter reads 0."""
+        Application.objects.create(volunteer=self.volunteer_user, opportunity=self.opportunities[0], status='ACCEPTED')
+        Application.objects.create(volunteer=self.volunteer_user, opportunity=self.opportunities[1], status='ACCEPTED')
+        VolunteerProfile.objects.filter(pk=self.profile.pk).update(committed_hours_per_week=0)
+        
+        with self.assertNumQueries(2):
+            result = check_hours_limit(self.volunteer_user, self.opportunities[1])
+        self.assertEqual(result, (False, 7, 11))
+    
+    def test_raw_loads_recount_the_counter(self):
+        """Test rows loaded raw, as by loaddata, leave the counter matching the applications."""
+        def load(*instances):
+            for obj in serializers.deserialize('json', serializers.serialize('json', instances)):
+                obj.save()
+        
+        application = Application.objects.create(
+            volunteer=self.volunteer_user, opportunity=self.opportunities[0], status='ACCEPTED'
+        )
+        VolunteerProfile.objects.filter(pk=self.profile.pk).update(committed_hours_per_week=0)
+        self.profile.refresh_from_db()
+        load(self.profile)
+        self.assertCounter(3)
+        
+        application.status = 'WITHDRAWN'
+        load(application)
+        self.assertCounter(0)
+        
+        application.status = 'ACCEPTED'
+        Application.objects.filter(pk=application.pk).update(status='ACCEPTED')
+        self.opportunities[0].min_hours_per_week = 5
+        load(self.opportunities[0])
+        self.assertCounter(5)
+    
+    def test_new_profile_and_repair_command(self):
+        """Test new profiles start from existing commitments and the command repairs drift."""
+        late_user = User.objects.create_user(username='late', password='testpass123', role='VOLUNTEER')
+        Application.objects.create(volunteer=late_user, opportunity=self.opportunities[1], status='ACCEPTED')
+        late_profile = VolunteerProfile.objects.create(user=late_user, skills='Python', interests='')
+        self.assertEqual(late_profile.committed_hours_per_week, 4)
+        
+        # Bulk updates bypass the signals
+        Application.objects.create(volunteer=self.volunteer_user, opportunity=self.opportunities[0])
+        Application.objects.filter(volunteer=self.volunteer_user).update(status='ACCEPTED')
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.committed_hours_per_week, 0)
+        
+        out = StringIO()
+        call_command('repair_committed_hours', stdout=out)
+        self.assertIn('Repaired 1 committed hours counters.', out.getvalue())
+        self.assertCounter(3)
+
+
+class ApplicantSchedulesTests(TestCase):
+    """Test bulk schedule totals and the applications page built on them."""
+    
+    def setUp(self):
+        """Set up an opportunity and another one some applicants are committed to."""
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.opportunity, self.other = [
+            Opportunity.objects.create(
+                title=title,
+                description='Test',
+                location='Test',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=hours,
+                start_date='2024-01-01',
+                end_date='2024-12-31',
+                organisation=self.organisation
+            )
+            for title, hours in (('Applied', 4), ('Other', 3))
+        ]
+    
+    def add_applicants(self, count):
+        for k in range(count):
+            user = User.objects.create_user(
+                username=f'applicant{self.opportunity.applications.count()}',
+                password='testpass123',
+                role='VOLUNTEER'
+            )
+            if k % 3:
+                VolunteerProfile.objects.create(user=user, skills='Python', interests='', max_hours_per_week=6)
+            if k % 2:
+                Application.objects.create(volunteer=user, opportunity=self.other, status='ACCEPTED')
+            Application.objects.create(volunteer=user, opportunity=self.opportunity)
+    
+    def test_bulk_schedules_match_single_schedules(self):
+        """Test every bulk schedule has the totals of get_volunteer_schedule."""
+        self.add_applicants(6)
+        volunteers = [application.volunteer for application in self.opportunity.applications.all()]
+        
+        with self.assertNumQueries(2):
+            schedules = get_volunteer_schedules(volunteer.id for volunteer in volunteers)
+        for volunteer in volunteers:
+            schedule = get_volunteer_schedule(volunteer)
+            for key in ('total_hours', 'max_hours', 'remaining_capacity'):
+                self.assertEqual(schedules[volunteer.id][key], schedule[key])
+            self.assertEqual(schedules[volunteer.id]['accepted_count'], len(schedule['opportunities']))
+            self.assertNotIn('peak_hours', schedules[volunteer.id])
+    
+    def test_bulk_schedule_peaks_match_hours_limit_checks(self):
+        """Test every peak_hours is the committed load check_hours_limit would see."""
+        self.add_applicants(6)
+        volunteers = [application.volunteer for application in self.opportunity.applications.all()]
+        
+        with self.assertNumQueries(3):
+            schedules = get_volunteer_schedules((volunteer.id for volunteer in volunteers), self.opportunity)
+        for volunteer in volunteers:
+            schedule = schedules[volunteer.id]
+            can_apply, current_hours, would_be_hours = check_hours_limit(volunteer, self.opportunity)
+            self.assertEqual(schedule['peak_hours'], current_hours)
+            if schedule['max_hours']:
+                self.assertEqual(can_apply, would_be_hours <= schedule['max_hours'])
+    
+    def test_applications_page_warning_follows_overlapping_commitments(self):
+        """Test only commitments during the opportunity count towards the over-limit warning."""
+        self.add_applicants(2)
+        application = self.opportunity.applications.get(volunteer__username='applicant1')
+        # applicant1 is committed 3 hours/week to Other; 3 + 4 > 6 while the dates overlap
+        self.client.force_login(self.org_admin)
+        url = reverse('opportunities:applications', args=[self.opportunity.pk])
+        rows = {row['application'].pk: row for row in self.client.get(url).context['applications_with_hours']}
+        self.assertEqual((rows[application.pk]['current_hours'], rows[application.pk]['would_exceed']), (3, True))
+        
+        self.other.start_date, self.other.end_date = date(2023, 1, 1), date(2023, 6, 30)
+        self.other.save()
+        rows = {row['application'].pk: row for row in self.client.get(url).context['applications_with_hours']}
+        self.assertEqual((rows[application.pk]['current_hours'], rows[application.pk]['would_exceed']), (0, False))
+    
+    def test_applications_page_query_count_is_constant(self):
+        """Test the applications page costs the same queries for 3 or 12 applicants."""
+        self.client.force_login(self.org_admin)
+        url = reverse('opportunities:applications', args=[self.opportunity.pk])
+        
+        self.add_applicants(3)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_applicants(9)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(len(response.context['applications_with_hours']), 12)
+        
+        with mock.patch('opportunities.views.APPLICATIONS_PAGE_SIZE', 5):
+            response = self.client.get(url, {'page': 3})
+        self.assertEqual(len(response.context['applications_with_hours']), 2)
+        self.assertEqual(response.context['page'].paginator.num_pages, 3)
+
 
+class CommitmentCalendarTests(TestCase):
+    """Test date-aware hours limits built on the commitment calendar."""
+    
+    def setUp(self):
+        """Set up a volunteer committed to 8 hours/week in the first quarter of 2024."""
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        self.profile = VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python',
+            interests='Education',
+            max_hours_per_week=10,
+            availability={}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        committed = self.create_opportunity('Spring Term', 8, '2024-01-08', '2024-03-29')
+        Application.objects.create(volunteer=self.volunteer_user, opportunity=committed, status='ACCEPTED')
+    
+    def create_opportunity(self, title, hours, start_date, end_date):
+        return Opportunity.objects.create(
+            title=title,
+            description='Test',
+            location='Test',
+            category='EDUCATION',
+            required_skills='Python',
+            min_hours_per_week=hours,
+            start_date=start_date,
+            end_date=end_date,
+            organisation=self.organisation
+        )
+    
+    def test_peak_load_matches_week_by_week_sum(self):
+        """Test peak loads equal a brute-force weekly sum, scalar and vectorized."""
+        rng = random.Random(7)
+        origin = date(2024, 1, 1)
+        commitments = []
+        for _ in range(30):
+            start = origin + timedelta(days=rng.randint(0, 700))
+            commitments.append((start, start + timedelta(days=rng.randint(0, 200)), rng.randint(1, 6)))
+        calendar = CommitmentCalendar(commitments)
+        
+        def brute_force(first_week, last_week):
+            return max(
+                sum(hours for start, end, hours in commitments if get_week(start) <= week <= get_week(end))
+                for week in range(first_week, last_week + 1)
+            )
+        
+        ranges = []
+        for _ in range(200):
+            first_week = get_week(origin) + rng.randint(-20, 140)
+            ranges.append((first_week, first_week + rng.randint(0, 60)))
+        expected = [brute_force(first, last) for first, last in ranges]
+        self.assertEqual([calendar.peak_load_weeks(first, last) for first, last in ranges], expected)
+        first_weeks, last_weeks = zip(*ranges)
+        self.assertEqual(calendar.peak_loads(first_weeks, last_weeks).tolist(), expected)
+    
+    def test_hours_limit_ignores_commitments_at_other_times(self):
+        """Test only commitments overlapping the opportunity's weeks count."""
+        autumn = self.create_opportunity('Autumn Term', 5, '2024-09-02', '2024-12-13')
+        overlapping = self.create_opportunity('Easter Camp', 5, '2024-03-25', '2024-04-12')
+        # Shares the last week of the spring term, though not its days
+        next_week = self.create_opportunity('Weekend Fair', 5, '2024-03-30', '2024-03-31')
+        
+        self.assertEqual(check_hours_limit(self.volunteer_user, autumn), (True, 0, 5))
+        self.assertEqual(check_hours_limit(self.volunteer_user, overlapping), (False, 8, 13))
+        self.assertEqual(check_hours_limit(self.volunteer_user, next_week), (False, 8, 13))
+        
+        recommended = [opp for opp, _ in get_recommended_opportunities(self.profile)]
+        self.assertIn(autumn, recommended)
+        self.assertNotIn(overlapping, recommended)
+        
+        matcher = BatchMatcher()
+        scores, _ = matcher.score_chunk([self.profile])
+        fits = dict(zip(matcher.opportunities, scores[0] > float('-inf')))
+        self.assertTrue(fits[autumn])
+        self.assertFalse(fits[overlapping])
+
+
+class ApplyPipelineTests(TestCase):
+    """Test the single-transaction apply path and acceptance capacity checks."""
+    
+    def setUp(self):
+        """Set up a volunteer with room for 10 hours/week and two overlapping 6 hour opportunities."""
+        self.volunteer_user = User.objects.create_user(
+            username='testvolunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        VolunteerProfile.objects.create(
+            user=self.volunteer_user,
+            skills='Python',
+            interests='Education',
+            max_hours_per_week=10,
+            availability={}
+        )
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        self.first, self.second = [
+            Opportunity.objects.create(
+                title=title,
+                description='Test',
+                location='Test',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=6,
+                start_date=date(2024, 1, 1),
+                end_date=date(2024, 12, 31),
+                organisation=organisation
+            )
+            for title in ('Morning Club', 'Evening Club')
+        ]
+    
+    def test_apply_is_one_transaction_of_fixed_size(self):
+        """Test applying costs the same few queries and writes the admin notification."""
+        opportunity = Opportunity.objects.select_related('organisation').get(pk=self.first.pk)
+        # Lock, commitments, insert (in Application.save's savepoint) and notification, in a transaction
+        with self.assertNumQueries(8):
+            outcome, hours = submit_application(self.volunteer_user, opportunity)
+        self.assertEqual((outcome, hours), ('SUBMITTED', (True, 0, 6)))
+        self.assertEqual(Notification.objects.filter(user=self.org_admin).count(), 1)
+    
+    def test_double_submit_relies_on_unique_constraint(self):
+        """Test a repeated apply leaves one application and one notification."""
+        self.client.login(username='testvolunteer', password='testpass123')
+        url = reverse('opportunities:apply', args=[self.first.pk])
+        self.client.post(url)
+        response = self.client.post(url, follow=True)
+        
+        self.assertContains(response, 'You have already applied to this opportunity.')
+        self.assertEqual(Application.objects.filter(volunteer=self.volunteer_user).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.org_admin).count(), 1)
+    
+    def test_acceptance_cannot_overbook(self):
+        """Test accepting a second overlapping application past the limit is refused."""
+        applications = [
+            Application.objects.create(volunteer=self.volunteer_user, opportunity=opportunity)
+            for opportunity in (self.first, self.second)
+        ]
+        self.client.login(username='orgadmin', password='testpass123')
+        for application in applications:
+            self.client.get(reverse('opportunities:update_status', args=[application.pk, 'ACCEPTED']))
+        
+        statuses = [Application.objects.get(pk=application.pk).status for application in applications]
+        self.assertEqual(statuses, ['ACCEPTED', 'PENDING'])
+        self.assertEqual(VolunteerProfile.objects.get(user=self.volunteer_user).committed_hours_per_week, 6)
+        
+        # With the first commitment in place the volunteer can't apply again either
+        opportunity = Opportunity.objects.select_related('organisation').get(pk=self.second.pk)
+        Application.objects.filter(pk=applications[1].pk).delete()
+        self.assertEqual(submit_application(self.volunteer_user, opportunity), ('OVER_LIMIT', (False, 6, 12)))
+        self.assertFalse(Application.objects.filter(pk=applications[1].pk).exists())
+    
+    def add_volunteers(self, count):
+        """Create volunteers with room for 10 hours/week, each applying to the first opportunity."""
+        applications = []
+        for k in range(count):
+            user = User.objects.create_user(
+                username=f'bulkvolunteer{k}',
+                email=f'bulk{k}@test.com',
+                password='testpass123',
+                role='VOLUNTEER'
+            )
+            VolunteerProfile.objects.create(user=user, skills='Python', max_hours_per_week=10, availability={})
+            applications.append(Application.objects.create(volunteer=user, opportunity=self.first))
+        return applications
+    
+    def test_bulk_accept_checks_limits_across_the_batch(self):
+        """Test a bulk accept refuses what would overbook, counting the batch's own acceptances."""
+        applications = [
+            Application.objects.create(volunteer=self.volunteer_user, opportunity=opportunity)
+            for opportunity in (self.first, self.second)
+        ]
+        other_admin = User.objects.create_user(
+            username='otheradmin', email='other@org.com', password='testpass123', role='ORGANISATION_ADMIN'
+        )
+        self.client.login(username='orgadmin', password='testpass123')
+        response = self.client.post(reverse('opportunities:bulk_update_status'), {
+            'status': 'ACCEPTED',
+            'application_ids': [application.pk for application in applications] + [0],
+        }, follow=True)
+        
+        self.assertContains(response, '1 application(s) updated to ACCEPTED.')
+        self.assertContains(response, 'which would bring them to 12 hours/week')
+        self.assertContains(response, '1 application(s) were not found')
+        statuses = [Application.objects.get(pk=application.pk).status for application in applications]
+        self.assertEqual(statuses, ['ACCEPTED', 'PENDING'])
+        self.assertEqual(VolunteerProfile.objects.get(user=self.volunteer_user).committed_hours_per_week, 6)
+        self.assertEqual(Notification.objects.filter(user=self.volunteer_user).count(), 1)
+        
+        # Another admin's selection touches nothing
+        self.assertEqual(
+            triage_applications(other_admin, [applications[1].pk], 'REJECTED'),
+            ([], [], [applications[1].pk])
+        )
+        
+        # Withdrawing releases the hours, with the counter left as the signals would leave it
+        triage_applications(self.org_admin, [applications[0].pk], 'WITHDRAWN')
+        self.assertEqual(VolunteerProfile.objects.get(user=self.volunteer_user).committed_hours_per_week, 0)
+        self.assertEqual(reconcile_committed_hours(), [])
+    
+    def test_bulk_triage_queries_do_not_grow(self):
+        """Test triaging many applications costs the same queries as triaging two."""
+        applications = self.add_volunteers(6)
+        with CaptureQueriesContext(connection) as queries:
+            triage_applications(self.org_admin, [application.pk for application in applications[:2]], 'ACCEPTED')
+        with self.assertNumQueries(len(queries)):
+            updated, refused, _ = triage_applications(
+                self.org_admin, [application.pk for application in applications[2:]], 'ACCEPTED'
+            )
+        self.assertEqual((len(updated), refused), (4, []))
+        self.assertEqual(reconcile_committed_hours(), [])
@@ -1,12 +1,22 @@
 """
 Integration tests for application workflows.
 """
+import time
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from accounts.models import User
 from organisations.models import Organisation
+from opportunities.facets import CATALOG_VERSION_KEY, get_facet_counts
 from opportunities.models import Opportunity, Application
 from notifications.models import Notification
+from volunteers.models import ParticipationRecord, VersionStamp
 
 
 class WorkflowTests(TestCase):
@@ -111,3 +121,525 @@ class WorkflowTests(TestCase):
         response = self.client.get(reverse('volunteers:dashboard'))
         self.assertEqual(response.status_code, 302)  # Redirect to login
 
+
+class BrowsePaginationTests(TestCase):
+    """Test keyset pagination of the browse page."""
+    
+    def setUp(self):
+        """Set up 12 open opportunities, created in pairs sharing a timestamp, and 2 closed ones."""
+        self.volunteer = User.objects.create_user(
+            username='volunteer',
+            email='volunteer@test.com',
+            password='testpass123',
+            role='VOLUNTEER'
+        )
+        org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=org_admin,
+            verified=True
+        )
+        now = timezone.now()
+        for k in range(14):
+            opportunity = Opportunity.objects.create(
+                title=f'Opportunity {k}',
+                description='Test description',
+                location='Remote' if k % 3 == 0 else 'Campus',
+                is_remote=k % 3 == 0,
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=2,
+                start_date='2024-01-01',
+                end_date='2024-12-31',
+                status='CLOSED' if k in (4, 9) else 'OPEN',
+                organisation=organisation
+            )
+            Opportunity.objects.filter(pk=opportunity.pk).update(created_at=now - timedelta(minutes=k // 2))
+        self.expected = list(Opportunity.objects.filter(status='OPEN').order_by(
+            '-created_at', '-id'
+        ).values_list('id', flat=True))
+    
+    def walk(self, url, link):
+        """Follow a page link from url until it runs out, returning the ids of each page."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append([opportunity.id for opportunity in response.context['opportunities']])
+            url = response.context[link] and reverse('opportunities:browse') + response.context[link]
+        return pages
+    
+    @mock.patch('opportunities.views.BROWSE_PAGE_SIZE', 5)
+    def test_pages_cover_catalog_in_both_directions(self):
+        """Test next links walk every open opportunity once and previous links walk back."""
+        pages = self.walk(reverse('opportunities:browse'), 'next_url')
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+        
+        response = self.client.get(reverse('opportunities:browse'))
+        last = self.client.get(reverse('opportunities:browse') + response.context['next_url'])
+        last = self.client.get(reverse('opportunities:browse') + last.context['next_url'])
+        back = self.walk(reverse('opportunities:browse') + last.context['previous_url'], 'previous_url')
+        self.assertEqual(back, pages[-2::-1])
+    
+    @mock.patch('opportunities.views.BROWSE_PAGE_SIZE', 5)
+    def test_page_queries_do_not_grow(self):
+        """Test every page costs the same queries, the user's applications included."""
+        self.client.login(username='volunteer', password='testpass123')
+        Application.objects.create(volunteer=self.volunteer, opportunity_id=self.expected[7])
+        
+        # Facet counts are cached after the first visit
+        self.client.get(reverse('opportunities:browse'))
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(reverse('opportunities:browse'))
+        with CaptureQueriesContext(connection) as second_page:
+            response = self.client.get(reverse('opportunities:browse') + response.context['next_url'])
+        self.assertEqual(response.context['user_applications'], {self.expected[7]: 'PENDING'})
+        with CaptureQueriesContext(connection) as last_page:
+            self.client.get(reverse('opportunities:browse') + response.context['next_url'])
+        # Five rows, five rows and two rows, with no per-row queries
+        self.assertEqual(len(second_page), len(first_page))
+        self.assertEqual(len(last_page), len(first_page))
+        self.assertContains(response, 'Test Organisation')
+    
+    @mock.patch('opportunities.views.BROWSE_PAGE_SIZE', 5)
+    def test_links_keep_filters_and_bad_cursor_restarts(self):
+        """Test page links carry the filters and an invalid cursor shows the first page."""
+        url = reverse('opportunities:browse') + '?is_remote=false'
+        pages = self.walk(url, 'next_url')
+        on_site = Opportunity.objects.filter(status='OPEN', is_remote=False)
+        self.assertEqual(sum(pages, []), [pk for pk in self.expected if on_site.filter(pk=pk).exists()])
+        
+        response = self.client.get(url + '&cursor=not-a-cursor')
+        self.assertEqual([opportunity.id for opportunity in response.context['opportunities']], pages[0])
+
+
+class OpportunitySearchTests(TestCase):
+    """Test full-text search on the browse page."""
+    
+    def setUp(self):
+        """Set up opportunities mentioning gardening in different fields."""
+        org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Green Futures',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=org_admin,
+            verified=True
+        )
+        self.titled = self.create_opportunity('Community Gardening Day', 'Planting and weeding.', 'Leeds')
+        self.skilled = self.create_opportunity('Park Helper', 'Keep the park tidy.', 'York', skills='Gardening')
+        self.described = self.create_opportunity(
+            'Food Bank Shifts', 'Sorting donations, some gardening in summer.', 'Leeds'
+        )
+        self.unrelated = self.create_opportunity('Maths Tutor', 'Tutoring pupils.', 'Online')
+    
+    def create_opportunity(self, title, description, location, skills='Python', status='OPEN'):
+        return Opportunity.objects.create(
+            title=title,
+            description=description,
+            location=location,
+            category='ENVIRONMENT',
+            required_skills=skills,
+            min_hours_per_week=2,
+            start_date='2024-01-01',
+            end_date='2024-12-31',
+            status=status,
+            organisation=self.organisation
+        )
+    
+    def search(self, text, **params):
+        response = self.client.get(reverse('opportunities:browse'), {'search': text, **params})
+        return [opportunity.id for opportunity in response.context['opportunities']]
+    
+    def test_prefix_search_ranks_by_field_weight(self):
+        """Test word prefixes match, title hits outrank skills and skills outrank description."""
+        self.assertEqual(self.search('gard'), [self.titled.id, self.skilled.id, self.described.id])
+        self.assertEqual(self.search('gardening leeds'), [self.titled.id, self.described.id])
+        self.assertEqual(self.search('green futures tutor'), [self.unrelated.id])
+        self.assertEqual(self.search('gardening', is_remote='true'), [])
+        self.assertEqual(self.search('botany'), [])
+    
+    def test_index_follows_edits(self):
+        """Test edits, deletions, closures and organisation renames reach search."""
+        self.unrelated.title = 'Allotment Tutor'
+        self.unrelated.save()
+        self.assertEqual(self.search('allot'), [self.unrelated.id])
+        self.assertEqual(self.search('maths'), [])
+        
+        self.skilled.delete()
+        self.described.status = 'CLOSED'
+        self.described.save()
+        self.assertEqual(self.search('gardening'), [self.titled.id])
+        
+        self.organisation.name = 'Blue Horizons'
+        self.organisation.save()
+        self.assertEqual(self.search('horizons tutor'), [self.unrelated.id])
+        self.assertEqual(self.search('green futures'), [])
+    
+    @mock.patch('opportunities.views.BROWSE_PAGE_SIZE', 2)
+    def test_search_results_page_by_rank(self):
+        """Test search pages follow the ranking both ways."""
+        for k in range(3):
+            self.create_opportunity(f'Garden Club {k}', 'Gardening.', 'Leeds')
+        everything = self.search('gard')
+        self.assertEqual(len(everything), 2)
+        
+        pages = []
+        url = reverse('opportunities:browse') + '?search=gard'
+        while url:
+            response = self.client.get(url)
+            pages.append([opportunity.id for opportunity in response.context['opportunities']])
+            next_url = response.context['next_url']
+            url = next_url and reverse('opportunities:browse') + next_url
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+        self.assertEqual(pages[-1][-1], self.described.id)
+        self.assertEqual(len(set(sum(pages, []))), 6)
+        
+        back = self.client.get(reverse('opportunities:browse') + response.context['previous_url'])
+        self.assertEqual([opportunity.id for opportunity in back.context['opportunities']], pages[1])
+
+
+class FacetCountTests(TestCase):
+    """Test browse facet counts."""
+    
+    def setUp(self):
+        """Set up opportunities across categories, types and date windows."""
+        org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        self.organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=org_admin,
+            verified=True
+        )
+        self.today = timezone.localdate()
+        # (category, is_remote, days until start, title)
+        for category, is_remote, starts_in, title in [
+            ('EDUCATION', True, -10, 'Online Tutoring'),
+            ('EDUCATION', False, -10, 'Classroom Helper'),
+            ('EDUCATION', False, 10, 'Summer School'),
+            ('ENVIRONMENT', False, 10, 'Tree Planting'),
+            ('ENVIRONMENT', True, 60, 'Climate Research'),
+            ('HEALTHCARE', False, -10, 'Hospital Visits'),
+        ]:
+            self.create_opportunity(category, is_remote, starts_in, title)
+        self.create_opportunity('EDUCATION', True, -10, 'Closed Tutoring', status='CLOSED')
+    
+    def create_opportunity(self, category, is_remote, starts_in, title, status='OPEN'):
+        start_date = self.today + timedelta(days=starts_in)
+        return Opportunity.objects.create(
+            title=title,
+            description='Test description',
+            location='Remote' if is_remote else 'Campus',
+            is_remote=is_remote,
+            category=category,
+            required_skills='Python',
+            min_hours_per_week=2,
+            start_date=start_date,
+            end_date=start_date + timedelta(days=90),
+            status=status,
+            organisation=self.organisation
+        )
+    
+    def get_counts(self, query=''):
+        return get_facet_counts(Opportunity.objects.filter(status='OPEN'), QueryDict(query), self.today)
+    
+    def test_each_facet_ignores_its_own_filter(self):
+        """Test counts apply the other facets' filters, and the total applies all of them."""
+        counts = self.get_counts('category=EDUCATION&is_remote=false')
+        self.assertEqual(counts['total'], 2)
+        self.assertEqual(counts['category']['EDUCATION'], 2)
+        self.assertEqual(counts['category']['ENVIRONMENT'], 1)
+        self.assertEqual(counts['category']['HEALTHCARE'], 1)
+        self.assertEqual(counts['is_remote'], {'true': 1, 'false': 2})
+        self.assertEqual(counts['when'], {'ongoing': 1, 'next_30_days': 1, 'later': 0})
+        
+        counts = self.get_counts('when=later&is_remote=bogus')
+        self.assertEqual(counts['total'], 1)
+        self.assertEqual(counts['when'], {'ongoing': 3, 'next_30_days': 2, 'later': 1})
+    
+    def test_counts_are_one_query_and_cached_until_the_catalog_changes(self):
+        """Test a count is one aggregate query, reused until an opportunity is saved."""
+        # Plus the shared catalog stamp, read on every lookup
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_counts()['total'], 6)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_counts()['total'], 6)
+        
+        # A stamp bumped by another process invalidates this process's counts
+        VersionStamp.objects.filter(key=CATALOG_VERSION_KEY).update(stamp='bumped-elsewhere')
+        with self.assertNumQueries(2):
+            self.get_counts()
+        
+        self.create_opportunity('HEALTHCARE', True, 60, 'Telehealth Support')
+        counts = self.get_counts()
+        self.assertEqual(counts['total'], 7)
+        self.assertEqual(counts['category']['HEALTHCARE'], 2)
+    
+    def test_browse_page_shows_counts_for_search(self):
+        """Test the browse page counts only opportunities matching the search."""
+        response = self.client.get(reverse('opportunities:browse'), {'search': 'tutor'})
+        self.assertEqual(response.context['total'], 1)
+        self.assertContains(response, 'Education (1)')
+        self.assertContains(response, 'Remote (1)')
+        self.assertContains(response, 'Happening now (1)')
+
+
+class OpportunityApiTests(TestCase):
+    """Test the JSON listing and detail endpoints."""
+    
+    def setUp(self):
+        """Set up three open opportunities and a closed one."""
+        org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=org_admin,
+            verified=True
+        )
+        self.opportunities = [
+            Opportunity.objects.create(
+                title=f'Opportunity {k}',
+                description='Test description',
+                location='Leeds',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=2,
+                start_date='2024-01-01',
+                end_date='2024-12-31',
+                status='CLOSED' if k == 3 else 'OPEN',
+                organisation=organisation
+            )
+            for k in range(4)
+        ]
+    
+    def test_listing_selects_fields_and_pages(self):
+        """Test the listing returns the requested fields of open opportunities, a page at a time."""
+        with mock.patch('opportunities.api.API_PAGE_SIZE', 2):
+            response = self.client.get(reverse('opportunities:api_list'), {'fields': 'title,organisation'})
+            data = response.json()
+            self.assertEqual(data['count'], 3)
+            self.assertEqual(data['results'], [
+                {'title': 'Opportunity 2', 'organisation': 'Test Organisation'},
+                {'title': 'Opportunity 1', 'organisation': 'Test Organisation'},
+            ])
+            data = self.client.get(data['next']).json()
+        self.assertEqual([row['title'] for row in data['results']], ['Opportunity 0'])
+        self.assertIsNone(data['next'])
+        
+        response = self.client.get(reverse('opportunities:api_list'), {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_unchanged_listing_is_not_modified(self):
+        """Test a poll with the listing's ETag gets an empty 304 from two queries until an opportunity changes."""
+        url = reverse('opportunities:api_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        
+        with mock.patch('opportunities.api.serialize_row') as serialize_row, self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        serialize_row.assert_not_called()
+        
+        # Closing an opportunity drops it from the listing
+        self.opportunities[0].status = 'CLOSED'
+        self.opportunities[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        # Another selection of fields is another representation
+        response = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+    
+    def test_removed_opportunity_advances_last_modified(self):
+        """Test a client polling with only If-Modified-Since sees a deletion or a close."""
+        url = reverse('opportunities:api_list')
+        stale = http_date(time.time() - 60)
+        VersionStamp.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        Opportunity.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        Organisation.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=stale).status_code, 304)
+        
+        self.opportunities[2].delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=stale)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        # Closed rows drop out of the result set's own updated_at; wait out the second resolution
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=2)):
+            self.opportunities[1].status = 'CLOSED'
+            self.opportunities[1].save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+    
+    def test_detail_supports_conditional_get(self):
+        """Test the detail returns the row, then 304 for its ETag or Last-Modified until it changes."""
+        opportunity = self.opportunities[3]
+        url = reverse('opportunities:api_detail', args=[opportunity.pk])
+        response = self.client.get(url, {'fields': 'id,status,start_date'})
+        self.assertEqual(response.json(), {'id': opportunity.pk, 'status': 'CLOSED', 'start_date': '2024-01-01'})
+        
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        response = self.client.get(url, {'fields': 'id,status,start_date'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        
+        opportunity.title = 'Renamed'
+        opportunity.save()
+        response = self.client.get(url, {'fields': 'id,status,start_date'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('opportunities:api_detail', args=[0])).status_code, 404)
+    
+    def test_renaming_the_organisation_changes_the_etags(self):
+        """Test renaming an organisation serves a fresh listing and detail to clients with the old ETags."""
+        list_url = reverse('opportunities:api_list')
+        detail_url = reverse('opportunities:api_detail', args=[self.opportunities[0].pk])
+        list_etag, detail_etag = self.client.get(list_url)['ETag'], self.client.get(detail_url)['ETag']
+        
+        organisation = self.opportunities[0].organisation
+        organisation.name = 'Renamed Organisation'
+        organisation.save()
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['organisation'] for row in response.json()['results']}, {'Renamed Organisation'})
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['organisation'], 'Renamed Organisation')
+
+
+class MyOpportunitiesTests(TestCase):
+    """Test the annotated, paginated list of an organisation admin's opportunities."""
+    
+    def setUp(self):
+        """Set up 5 opportunities where opportunity k has k applications and 2 hours records of k hours."""
+        self.org_admin = User.objects.create_user(
+            username='orgadmin',
+            email='admin@org.com',
+            password='testpass123',
+            role='ORGANISATION_ADMIN'
+        )
+        organisation = Organisation.objects.create(
+            name='Test Organisation',
+            description='Test org',
+            contact_email='contact@org.com',
+            admin=self.org_admin,
+            verified=True
+        )
+        volunteers = [
+            User.objects.create_user(
+                username=f'volunteer{k}',
+                email=f'volunteer{k}@test.com',
+                password='testpass123',
+                role='VOLUNTEER'
+            )
+            for k in range(4)
+        ]
+        now = timezone.now()
+        self.opportunities = []
+        for k in range(5):
+            opportunity = Opportunity.objects.create(
+                title=f'Opportunity {k}',
+                description='Test description',
+                location='Campus',
+                category='EDUCATION',
+                required_skills='Python',
+                min_hours_per_week=2,
+                start_date='2024-01-01',
+                end_date='2024-12-31',
+                organisation=organisation
+            )
+            Opportunity.objects.filter(pk=opportunity.pk).update(created_at=now - timedelta(minutes=k))
+            for n in range(k):
+                Application.objects.create(
+                    volunteer=volunteers[n],
+                    opportunity=opportunity,
+                    status=['PENDING', 'ACCEPTED', 'REJECTED'][n % 3]
+                )
+            if k:
+                for day in ('2024-02-01', '2024-02-08'):
+                    ParticipationRecord.objects.create(
+                        volunteer=volunteers[0], opportunity=opportunity, hours_logged=k, date=day
+                    )
+            self.opportunities.append(opportunity)
+        self.client.login(username='orgadmin', password='testpass123')
+    
+    def test_rows_carry_counts_and_hours(self):
+        """Test each row's counts and hours, read in a fixed number of queries."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('opportunities:list'))
+            rows = {opportunity.pk: opportunity for opportunity in response.context['opportunities']}
+        for k, opportunity in enumerate(self.opportunities):
+            row = rows[opportunity.pk]
+            self.assertEqual(row.application_count, k)
+            self.assertEqual(row.pending_count, (k + 2) // 3)
+            self.assertEqual(row.accepted_count, (k + 1) // 3)
+            self.assertEqual(row.hours_logged, 2 * k)
+        self.assertContains(response, 'Hours logged:</span> 8')
+        
+        query_count = len(queries)
+        Opportunity.objects.create(
+            title='Another',
+            description='Test description',
+            location='Campus',
+            category='EDUCATION',
+            required_skills='Python',
+            min_hours_per_week=2,
+            start_date='2024-01-01',
+            end_date='2024-12-31',
+            organisation=self.opportunities[0].organisation
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('opportunities:list'))
+        self.assertEqual(len(queries), query_count)
+    
+    @mock.patch('opportunities.views.MY_OPPORTUNITIES_PAGE_SIZE', 2)
+    def test_sorts_by_metric_and_pages(self):
+        """Test sorting by each metric across pages, and that an unknown sort falls back to newest."""
+        ids = [opportunity.pk for opportunity in self.opportunities]
+        
+        def walk(sort):
+            pages = []
+            for number in (1, 2, 3):
+                response = self.client.get(reverse('opportunities:list'), {'sort': sort, 'page': number})
+                pages.extend(opportunity.pk for opportunity in response.context['opportunities'])
+            return pages
+        
+        self.assertEqual(walk('hours'), ids[::-1])
+        self.assertEqual(walk('applications'), ids[::-1])
+        self.assertEqual(walk('newest'), ids)
+        self.assertEqual(walk('bogus'), ids)
+        # 0, 0, 1, 1, 1 accepted: ties newest first
+        self.assertEqual(walk('accepted'), [ids[2], ids[3], ids[4], ids[0], ids[1]])
+        response = self.client.get(reverse('opportunities:list'), {'sort': 'hours', 'page': 2})
+        self.assertContains(response, '?sort=hours&page=3')
@@ -86,6 +86,58 @@ DATABASES = {
 }
 
 
+# Caches
+# The recommendations cache holds each volunteer's ranked top-N and is bounded
+# by MAX_ENTRIES; LocMemCache culls entries once the limit is reached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'volink-default',
+    },
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'volink-recommendations',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# Seconds browse facet counts stay cached; edits through the ORM invalidate
+# them at once, bulk writes only when this runs out
+FACET_CACHE_TIMEOUT = 5 * 60
+
+# Number of ranked recommendations stored per volunteer (and paged through)
+RECOMMENDATION_CACHE_SIZE = 50
+
+# Seconds a ranking frozen for cursor pagination stays valid
+RECOMMENDATION_CURSOR_TIMEOUT = 15 * 60
+
+# Recommender used by get_recommended_opportunities: 'keywords' (skill, interest,
+# availability and workload scoring) or 'tfidf' (text similarity between the
+# profile and opportunity titles, descriptions and skills; volunteers.similarity)
+RECOMMENDATION_MODE = 'keywords'
+
+# Fuzzy skill matching (volunteers.fuzzy): required skills also match volunteer
+# skills whose character trigram similarity reaches SKILL_FUZZY_THRESHOLD.
+# SKILL_ALIASES maps abbreviations to the skill they stand for.
+SKILL_FUZZY_MATCHING = True
+SKILL_FUZZY_THRESHOLD = 0.5
+SKILL_ALIASES = {
+    'js': 'javascript',
+    'ts': 'typescript',
+    'py': 'python',
+    'ml': 'machine learning',
+}
+
+# Interest matching (volunteers.interests): extra keywords per opportunity
+# category code, added to the built-in CATEGORY_KEYWORDS,
+# e.g. {'EDUCATION': ['mentoring', 'literacy']}. Run rebuild_skill_index
+# after changing it so the volunteer index picks up the new categories.
+INTEREST_CATEGORY_KEYWORDS = {}
+
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
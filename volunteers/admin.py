@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import VolunteerProfile, ParticipationRecord
+from .models import VolunteerProfile, ParticipationRecord, OpportunitySkillToken, VolunteerMatchToken
 
 
 @admin.register(VolunteerProfile)
@@ -17,3 +17,16 @@ class ParticipationRecordAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
     date_hierarchy = 'date'
 
+
+
+@admin.register(OpportunitySkillToken)
+class OpportunitySkillTokenAdmin(admin.ModelAdmin):
+    list_display = ('token', 'opportunity')
+    search_fields = ('token', 'opportunity__title')
+
+
+@admin.register(VolunteerMatchToken)
+class VolunteerMatchTokenAdmin(admin.ModelAdmin):
+    list_display = ('token', 'kind', 'profile')
+    list_filter = ('kind',)
+    search_fields = ('token', 'profile__user__username')
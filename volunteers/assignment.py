@@ -0,0 +1,355 @@
+"""
+Assignment optimizer - suggests placements for a whole intake at once.
+
+Per-volunteer recommendations ignore opportunity capacity, and check_hours_limit
+only looks at one volunteer-opportunity pair at a time. This module solves a
+capacity-constrained assignment instead:
+- Candidate graph: each volunteer's best opportunities by match score (from the
+  batch engine, which agrees with matching.py), pruned to the top N pairs that
+  share a skill or interest and fit the volunteer's spare weekly hours during
+  the opportunity (commitment calendars, as when applying or accepting)
+- Solver: epsilon-scaled forward/reverse auction over opportunity slots, the
+  dual of the min-cost flow formulation; each round's total score is within
+  epsilon x volunteers of the optimum
+- Rounds: when volunteers may take several placements, each further round is
+  re-solved with the hours and capacity left by the previous ones
+"""
+import heapq
+import math
+from collections import defaultdict, deque
+import numpy as np
+from django.db.models import Count
+from opportunities.models import Application, Opportunity
+from .batch_matching import DEFAULT_CHUNK_SIZE, BatchMatcher
+from .models import VolunteerProfile
+from .scheduling import get_commitment_calendars
+
+
+DEFAULT_CANDIDATES_PER_VOLUNTEER = 20
+
+DEFAULT_EPSILON = 0.01
+
+# Factor the auction's bid increment shrinks by between phases
+EPSILON_SCALING = 5
+
+
+def get_remaining_capacity(opportunities):
+    """
+    Get each opportunity's free places: volunteers_needed minus accepted applications.
+    
+    Returns:
+        Dict mapping opportunity id to remaining places (never negative)
+    """
+    accepted = dict(
+        Application.objects.filter(
+            opportunity__in=opportunities,
+            status='ACCEPTED'
+        ).values('opportunity_id').annotate(
+            total=Count('id')
+        ).values_list('opportunity_id', 'total')
+    )
+    return {
+        opp.id: max(opp.volunteers_needed - accepted.get(opp.id, 0), 0)
+        for opp in opportunities
+    }
+
+
+def build_candidate_graph(profiles, matcher, per_volunteer=DEFAULT_CANDIDATES_PER_VOLUNTEER,
+                          chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build the sparse candidate graph from batch match scores.
+    
+    Pairs are kept only if they share a skill token or interest category, fit
+    the volunteer's current weekly hours, and the volunteer hasn't already
+    applied to the opportunity.
+    
+    Args:
+        profiles: List of VolunteerProfile instances
+        matcher: BatchMatcher over the opportunities to place into
+        per_volunteer: Maximum candidates kept per volunteer
+    
+    Returns:
+        List (one per profile) of lists of (opportunity index, score), best first
+    """
+    column = {opp_id: j for j, opp_id in enumerate(matcher.opportunity_ids.tolist())}
+    applied = {}
+    for user_id, opp_id in Application.objects.filter(
+        opportunity_id__in=column
+    ).values_list('volunteer_id', 'opportunity_id').iterator():
+        applied.setdefault(user_id, []).append(column[opp_id])
+    
+    graph = []
+    for chunk, scores, shared in matcher.iter_scores(profiles, chunk_size):
+        scores = np.where(shared, scores, -np.inf)
+        for i, profile in enumerate(chunk):
+            scores[i, applied.get(profile.user_id, [])] = -np.inf
+        
+        keep = min(per_volunteer, scores.shape[1])
+        if keep:
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        else:
+            top = np.zeros((len(chunk), 0), dtype=np.int64)
+        for i in range(len(chunk)):
+            columns = top[i][np.isfinite(scores[i, top[i]])]
+            # Stable best-first order, ties broken by catalog position
+            columns = columns[np.lexsort((columns, -scores[i, columns]))]
+            graph.append([(int(j), float(scores[i, j])) for j in columns])
+    return graph
+
+
+class SlotAuction:
+    """
+    Auction over opportunity slots for the assignment problem: maximize the
+    total score, each volunteer taking at most one slot, each opportunity
+    offering its free places as identical slots.
+    
+    Prices are scaled down in phases (epsilon-scaling). Each phase runs a
+    forward auction, where unplaced volunteers bid for their best slot and
+    outbid ones bid again, then a reverse auction, where free slots still
+    priced from an earlier phase lower their price to attract a volunteer.
+    At the end every volunteer is within epsilon of their best option, free
+    slots are priced at zero, and the total score is within
+    epsilon x volunteers of the optimum.
+    """
+    
+    def __init__(self, candidates, capacity):
+        self.candidates = [
+            [(j, score) for j, score in edges if capacity[j] > 0]
+            for edges in candidates
+        ]
+        self.bidders = defaultdict(list)
+        for i, edges in enumerate(self.candidates):
+            for j, score in edges:
+                self.bidders[j].append((i, score))
+        
+        # Per opportunity: min-heap of free slot prices, and min-heap of
+        # (price, volunteer, ticket) held slots; stale tickets are skipped
+        self.free = {j: [0.0] * capacity[j] for j in self.bidders}
+        self.held = {j: [] for j in self.bidders}
+        self.assignment = [None] * len(self.candidates)
+        self.paid = [0.0] * len(self.candidates)
+        self.value = [0.0] * len(self.candidates)
+        self.tickets = [0] * len(self.candidates)
+    
+    def profit(self, i):
+        """Net value of volunteer i's current option (0 when unplaced)."""
+        if self.assignment[i] is None:
+            return 0.0
+        return self.value[i] - self.paid[i]
+    
+    def cheapest(self, j):
+        """Price of the cheapest slot of opportunity j, free or held."""
+        held = self.held[j]
+        while held and held[0][2] != self.tickets[held[0][1]]:
+            heapq.heappop(held)
+        price = held[0][0] if held else math.inf
+        if self.free[j]:
+            price = min(price, self.free[j][0])
+        return price
+    
+    def take(self, i, j, score, price):
+        """Give volunteer i a slot of opportunity j at price."""
+        self.tickets[i] += 1
+        heapq.heappush(self.held[j], (price, i, self.tickets[i]))
+        self.assignment[i] = j
+        self.paid[i] = price
+        self.value[i] = score
+    
+    def release(self, i):
+        """Free volunteer i's slot, keeping its price. Returns the opportunity."""
+        j = self.assignment[i]
+        self.tickets[i] += 1
+        heapq.heappush(self.free[j], self.paid[i])
+        self.assignment[i] = None
+        return j
+    
+    def best_value(self, i):
+        """Net value of volunteer i's best option at current prices (0 for none)."""
+        return max(
+            [score - self.cheapest(j) for j, score in self.candidates[i] if j != self.assignment[i]]
+            + [0.0]
+        )
+    
+    def release_unsatisfied(self, epsilon):
+        """
+        Free the slots of volunteers more than epsilon worse off than their
+        best option, so a new phase only re-bids those.
+        """
+        for i, j in enumerate(self.assignment):
+            if j is not None and self.profit(i) < self.best_value(i) - epsilon:
+                self.release(i)
+    
+    def pop_positive_free(self, j):
+        """Remove and return the price of a free slot of j priced above zero, if any."""
+        prices = self.free[j]
+        if not prices:
+            return None
+        k = max(range(len(prices)), key=prices.__getitem__)
+        if prices[k] <= 0:
+            return None
+        price = prices[k]
+        prices[k] = prices[-1]
+        prices.pop()
+        heapq.heapify(prices)
+        return price
+    
+    def forward(self, epsilon):
+        """Let unplaced volunteers bid until each holds a slot or prefers none."""
+        unassigned = deque(
+            i for i, edges in enumerate(self.candidates)
+            if edges and self.assignment[i] is None
+        )
+        while unassigned:
+            i = unassigned.popleft()
+            
+            # Best and second best net value; staying unplaced is worth 0
+            best_j, best_score, best_value, second_value = None, 0.0, 0.0, 0.0
+            for j, score in self.candidates[i]:
+                value = score - self.cheapest(j)
+                if value > best_value:
+                    second_value = best_value
+                    best_j, best_score, best_value = j, score, value
+                elif value > second_value:
+                    second_value = value
+            
+            # Prices only rise in this phase, so a volunteer who prefers no placement keeps it
+            if best_j is None:
+                continue
+            
+            price = self.cheapest(best_j) + best_value - second_value + epsilon
+            free, held = self.free[best_j], self.held[best_j]
+            if free and (not held or free[0] <= held[0][0]):
+                heapq.heappop(free)
+            else:
+                _, holder, _ = heapq.heappop(held)
+                self.assignment[holder] = None
+                unassigned.append(holder)
+            self.take(i, best_j, best_score, price)
+    
+    def reverse(self, epsilon):
+        """Let free slots priced above zero win a volunteer by lowering their price."""
+        pending = deque(self.free)
+        while pending:
+            j = pending.popleft()
+            while self.pop_positive_free(j) is not None:
+                # Best and second best gain a volunteer would get from this slot
+                best_i, best_score, best_gain, second_gain = None, 0.0, -math.inf, -math.inf
+                for i, score in self.bidders[j]:
+                    gain = score - self.profit(i)
+                    if gain > best_gain:
+                        second_gain = best_gain
+                        best_i, best_score, best_gain = i, score, gain
+                    elif gain > second_gain:
+                        second_gain = gain
+                
+                if best_gain < epsilon:
+                    # Nobody gains from it: the slot stays free at zero
+                    heapq.heappush(self.free[j], 0.0)
+                    continue
+                
+                # A volunteer moving here frees their old slot, at its old price
+                if self.assignment[best_i] is not None:
+                    released = self.release(best_i)
+                    if released != j:
+                        pending.append(released)
+                self.take(best_i, j, best_score, max(0.0, second_gain - epsilon))
+
+
+def solve_assignment(candidates, capacity, epsilon=DEFAULT_EPSILON, scaling=EPSILON_SCALING):
+    """
+    Maximize the total score of an assignment of volunteers to opportunity
+    slots (see SlotAuction).
+    
+    Args:
+        candidates: List (one per volunteer) of lists of (opportunity index, score)
+        capacity: Sequence of free places per opportunity index
+        epsilon: Final bid increment; the result is within
+            epsilon x len(candidates) of the optimal total score
+        scaling: Factor epsilon is divided by between phases
+    
+    Returns:
+        List with the assigned opportunity index (or None) per volunteer
+    """
+    auction = SlotAuction(candidates, capacity)
+    top_score = max((score for edges in auction.candidates for _, score in edges), default=0.0)
+    phase_epsilon = max(top_score / scaling, epsilon)
+    while True:
+        auction.forward(phase_epsilon)
+        auction.reverse(phase_epsilon)
+        if phase_epsilon <= epsilon:
+            break
+        phase_epsilon = max(phase_epsilon / scaling, epsilon)
+        auction.release_unsatisfied(phase_epsilon)
+    return list(auction.assignment)
+
+
+def suggest_placements(profiles=None, opportunities=None, max_placements=1,
+                       per_volunteer=DEFAULT_CANDIDATES_PER_VOLUNTEER,
+                       epsilon=DEFAULT_EPSILON, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Suggest placements for a whole intake, respecting opportunity capacity
+    and every volunteer's weekly hours limit.
+    
+    Args:
+        profiles: Iterable of VolunteerProfile instances (default: all)
+        opportunities: Iterable of Opportunity instances (default: open ones)
+        max_placements: Maximum new placements per volunteer
+        per_volunteer: Candidate opportunities kept per volunteer
+        epsilon: Auction bid increment (see solve_assignment)
+    
+    Returns:
+        List of dicts with profile, opportunity, score and round (1-based)
+    """
+    if profiles is None:
+        profiles = VolunteerProfile.objects.select_related('user')
+    if opportunities is None:
+        opportunities = Opportunity.objects.filter(status='OPEN')
+    profiles = list(profiles)
+    matcher = BatchMatcher(opportunities)
+    
+    capacity_by_id = get_remaining_capacity(matcher.opportunities)
+    capacity = [capacity_by_id[opp.id] for opp in matcher.opportunities]
+    # Commitments so far, placements of earlier rounds included
+    calendars_by_user = get_commitment_calendars([p.user_id for p in profiles])
+    calendars = [calendars_by_user[p.user_id] for p in profiles]
+    
+    def fits(i, opportunity):
+        peak = calendars[i].peak_load(opportunity.start_date, opportunity.end_date)
+        return peak + opportunity.min_hours_per_week <= profiles[i].max_hours_per_week
+    
+    graph = build_candidate_graph(profiles, matcher, per_volunteer, chunk_size)
+    
+    placements = []
+    placed = [set() for _ in profiles]
+    for round_number in range(1, max_placements + 1):
+        candidates = [
+            [
+                (j, score) for j, score in edges
+                if j not in placed[i]
+                and capacity[j] > 0
+                and fits(i, matcher.opportunities[j])
+            ]
+            for i, edges in enumerate(graph)
+        ]
+        assignment = solve_assignment(candidates, capacity, epsilon)
+        
+        new_placements = 0
+        for i, j in enumerate(assignment):
+            if j is None:
+                continue
+            opportunity = matcher.opportunities[j]
+            placed[i].add(j)
+            calendars[i] = calendars[i].add(
+                opportunity.start_date, opportunity.end_date, opportunity.min_hours_per_week
+            )
+            capacity[j] -= 1
+            new_placements += 1
+            placements.append({
+                'profile': profiles[i],
+                'opportunity': opportunity,
+                'score': dict(graph[i])[j],
+                'round': round_number,
+            })
+        if not new_placements:
+            break
+    return placements
@@ -0,0 +1,495 @@
+"""
+Batch matching engine - scores many volunteers against the open catalog at once.
+
+The per-pair functions in matching.py remain the reference implementation;
+this module encodes the same criteria as NumPy arrays so that a whole set of
+volunteers can be scored with array operations:
+- Skills overlap: volunteer x vocabulary match mask reduced over each
+  opportunity's token list (a CSR-style sparse product)
+- Interests match: volunteer x category mask gathered by opportunity category
+- Availability: popcount of the AND of volunteer and session weekly bitmasks,
+  for the opportunities with sessions
+- Location: broadcast of per-volunteer and per-opportunity flags
+- Workload: peak committed weekly hours during each opportunity (commitment
+  calendars from one query) against max hours
+"""
+import numpy as np
+from django.db.models import Q
+from django.utils import timezone
+from opportunities.models import Opportunity, Application
+from .fuzzy import get_fuzzy_skill_matches
+from .indexing import get_volunteer_vocabulary
+from .interests import classify_interests
+from .matching import SKILL_TOKEN_MAX_LENGTH
+from .models import VolunteerMatchToken, VolunteerProfile
+from .scheduling import get_commitment_calendars, get_week
+
+
+# Volunteers are scored in chunks so the intermediate match arrays stay small.
+DEFAULT_CHUNK_SIZE = 1024
+
+CATEGORY_CODES = [code for code, _ in Opportunity.CATEGORY_CHOICES]
+
+# Set bits per byte value, for NumPy versions without bitwise_count
+_BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(array):
+    """Number of set bits in each element of a uint32 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(array)
+    return _BYTE_POPCOUNT[array[..., None].view(np.uint8)].sum(axis=-1, dtype=np.uint8)
+
+
+def get_slot_array(slots):
+    """Encode a list of weekly slots (7 day bitmasks each) as an (n, 7) uint32 array."""
+    return np.array(slots, dtype=np.uint32).reshape(len(slots), 7)
+
+
+def get_schedule_overlap_matrix(volunteer_slots, session_slots, session_hours):
+    """
+    Volunteer x opportunity share of session hours covered, as in
+    get_schedule_overlap: per day, popcount of the AND of the bitmasks.
+    
+    Args:
+        volunteer_slots: (n, 7) uint32 array
+        session_slots: (m, 7) uint32 array, every row with sessions
+        session_hours: (m,) session hours of each opportunity
+    """
+    covered = np.zeros((len(volunteer_slots), len(session_slots)), dtype=np.int64)
+    for day in range(7):
+        covered += popcount(volunteer_slots[:, day, None] & session_slots[None, :, day])
+    return covered / session_hours
+
+
+class BatchMatcher:
+    """
+    Encoded open catalog that can score sets of volunteer profiles.
+    
+    Build it once per run and reuse it for every chunk of volunteers.
+    """
+    
+    def __init__(self, opportunities=None):
+        if opportunities is None:
+            opportunities = Opportunity.objects.filter(status='OPEN')
+        self.opportunities = list(opportunities)
+        self.opportunity_ids = np.array([opp.id for opp in self.opportunities], dtype=np.int64)
+        self._encode_catalog()
+    
+    def _encode_catalog(self):
+        """Encode opportunity tokens, categories, hours and flags as arrays."""
+        today = timezone.now().date()
+        category_index = {code: i for i, code in enumerate(CATEGORY_CODES)}
+        
+        vocabulary = {}
+        flat_tokens = []
+        offsets = []
+        for opp in self.opportunities:
+            offsets.append(len(flat_tokens))
+            # Keep empty tokens and duplicates: both count towards the reference ratio.
+            # Opportunities without skills get one placeholder (masked by has_skills).
+            for token in opp.skill_tokens or ['']:
+                flat_tokens.append(vocabulary.setdefault(token, len(vocabulary)))
+        
+        self.vocabulary = vocabulary
+        self.vocabulary_array = np.array(list(vocabulary), dtype=str) if vocabulary else np.array([], dtype=str)
+        self.flat_tokens = np.array(flat_tokens, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.token_counts = np.diff(np.append(self.offsets, len(flat_tokens))).astype(np.float64)
+        self.nonempty_tokens = np.array([bool(token) for token in vocabulary], dtype=bool)
+        
+        self.has_skills = np.array([bool(opp.skill_tokens) for opp in self.opportunities], dtype=bool)
+        self.categories = np.array(
+            [category_index.get(opp.category.upper(), -1) for opp in self.opportunities],
+            dtype=np.int64
+        )
+        self.hours = np.array([opp.min_hours_per_week for opp in self.opportunities], dtype=np.int64)
+        self.first_weeks = np.array([get_week(opp.start_date) for opp in self.opportunities], dtype=np.int64)
+        self.last_weeks = np.array([get_week(opp.end_date) for opp in self.opportunities], dtype=np.int64)
+        self.is_remote = np.array([opp.is_remote for opp in self.opportunities], dtype=bool)
+        self.is_active = np.array(
+            [opp.start_date > today or opp.end_date >= today for opp in self.opportunities],
+            dtype=bool
+        )
+        session_slots = get_slot_array([opp.session_slots for opp in self.opportunities])
+        session_hours = popcount(session_slots).sum(axis=1, dtype=np.int64)
+        self.with_sessions = np.flatnonzero(session_hours)
+        self.session_slots = session_slots[self.with_sessions]
+        self.session_hours = session_hours[self.with_sessions]
+    
+    def _skill_mask(self, profiles):
+        """Volunteer x vocabulary mask: does the volunteer match each token?"""
+        mask = np.zeros((len(profiles), len(self.vocabulary)), dtype=bool)
+        if not len(self.vocabulary):
+            return mask
+        
+        texts = np.array([p.skills_normalized for p in profiles], dtype=str)
+        has_skills = np.array([bool(p.skills_normalized) for p in profiles], dtype=bool)
+        
+        # Substring test, vectorized over volunteers for each vocabulary token
+        for j, token in enumerate(self.vocabulary_array):
+            mask[:, j] = np.char.find(texts, token) >= 0
+        
+        # Exact list membership and fuzzy matches, as in calculate_skills_overlap
+        for i, profile in enumerate(profiles):
+            for skill in profile.skill_tokens:
+                j = self.vocabulary.get(skill)
+                if j is not None:
+                    mask[i, j] = True
+            for token in get_fuzzy_skill_matches(profile.skill_tokens, self.vocabulary):
+                mask[i, self.vocabulary[token]] = True
+        
+        mask[~has_skills] = False
+        return mask
+    
+    def _interest_mask(self, profiles):
+        """Volunteer x category mask, as in check_normalized_interests_match."""
+        mask = np.zeros((len(profiles), len(CATEGORY_CODES)), dtype=bool)
+        for i, profile in enumerate(profiles):
+            categories = classify_interests(profile.interests_normalized)
+            mask[i] = [code in categories for code in CATEGORY_CODES]
+        return mask
+    
+    def score_chunk(self, profiles, calendars=None):
+        """
+        Score a list of profiles against the catalog.
+        
+        Args:
+            profiles: List of VolunteerProfile instances
+            calendars: Optional dict of user id to CommitmentCalendar
+        
+        Returns:
+            Tuple (scores, shared): float array of match scores with -inf where the
+            workload limit disqualifies the pair, and a bool array marking pairs that
+            share a skill token or interest category
+        """
+        n_volunteers = len(profiles)
+        n_opportunities = len(self.opportunities)
+        if calendars is None:
+            calendars = get_commitment_calendars([p.user_id for p in profiles])
+        
+        if not n_opportunities:
+            empty = np.zeros((n_volunteers, 0))
+            return empty, empty.astype(bool)
+        
+        # Skills: sum token matches per opportunity, then divide by token count
+        skill_mask = self._skill_mask(profiles)
+        token_hits = skill_mask[:, self.flat_tokens]
+        matches = np.add.reduceat(token_hits, self.offsets, axis=1)
+        skills = np.minimum(matches / self.token_counts, 1.0)
+        skills[:, ~self.has_skills] = 0.0
+        shared_tokens = np.add.reduceat(
+            token_hits & self.nonempty_tokens[self.flat_tokens], self.offsets, axis=1
+        ) > 0
+        shared_tokens[:, ~self.has_skills] = False
+        
+        # Interests: gather each opportunity's category column
+        interest_mask = np.zeros((n_volunteers, n_opportunities), dtype=bool)
+        known = self.categories >= 0
+        interest_mask[:, known] = self._interest_mask(profiles)[:, self.categories[known]]
+        interests = interest_mask.astype(np.float64)
+        
+        # Availability: active opportunities without sessions always fit, the
+        # others by the share of session hours covered
+        has_availability = np.array([bool(p.availability) for p in profiles], dtype=bool)[:, None]
+        availability = np.where(has_availability, self.is_active.astype(np.float64), 0.5)
+        if len(self.with_sessions):
+            overlap = get_schedule_overlap_matrix(
+                get_slot_array([p.availability_slots for p in profiles]),
+                self.session_slots,
+                self.session_hours
+            )
+            active = self.is_active[self.with_sessions]
+            availability[:, self.with_sessions] = np.where(
+                has_availability, np.where(active, overlap, 0.0), 0.5
+            )
+        location = np.where(has_availability & self.is_remote, 1.0, 0.5)
+        
+        # Same accumulation order as get_recommended_opportunities
+        scores = skills * 40
+        scores = scores + interests * 20
+        scores = scores + availability * 20
+        scores = scores + location * 10
+        scores = scores + 10.0
+        
+        # Workload: disqualify pairs that would exceed the weekly limit in any
+        # week of the opportunity, given the volunteer's commitments then
+        current = np.zeros((n_volunteers, n_opportunities), dtype=np.int64)
+        for i, profile in enumerate(profiles):
+            calendar = calendars.get(profile.user_id)
+            if calendar is not None and calendar.total_hours:
+                current[i] = calendar.peak_loads(self.first_weeks, self.last_weeks)
+        max_hours = np.array([p.max_hours_per_week for p in profiles], dtype=np.int64)
+        fits = (current + self.hours[None, :]) <= max_hours[:, None]
+        scores[~fits] = -np.inf
+        
+        return scores, shared_tokens | interest_mask
+    
+    def iter_scores(self, profiles, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield (profiles_chunk, scores, shared) for successive chunks of profiles."""
+        profiles = list(profiles)
+        for start in range(0, len(profiles), chunk_size):
+            chunk = profiles[start:start + chunk_size]
+            scores, shared = self.score_chunk(chunk)
+            yield chunk, scores, shared
+
+
+def _ranked(scores, eligible, limit):
+    """Stable descending ranking of eligible columns, like list.sort(reverse=True)."""
+    order = np.argsort(-scores, kind='stable')
+    order = order[eligible[order]]
+    return order[:limit]
+
+
+def get_recommended_opportunities_batch(volunteer_profiles, limit=10, candidates_only=True,
+                                        chunk_size=DEFAULT_CHUNK_SIZE, matcher=None):
+    """
+    Batch equivalent of get_recommended_opportunities for many volunteers.
+    
+    Args:
+        volunteer_profiles: Iterable of VolunteerProfile instances
+        limit: Maximum number of opportunities per volunteer
+        candidates_only: Only rank opportunities sharing a skill token or interest
+            category, as the indexed recommender does
+        matcher: Optional prebuilt BatchMatcher
+    
+    Returns:
+        Dict mapping profile id to a list of tuples (Opportunity, match_score)
+    """
+    matcher = matcher or BatchMatcher()
+    results = {}
+    for chunk, scores, shared in matcher.iter_scores(volunteer_profiles, chunk_size):
+        eligible = np.isfinite(scores)
+        if candidates_only:
+            eligible &= shared
+        for i, profile in enumerate(chunk):
+            results[profile.id] = [
+                (matcher.opportunities[j], float(scores[i, j]))
+                for j in _ranked(scores[i], eligible[i], limit)
+            ]
+    return results
+
+
+def get_matching_volunteers_batch(opportunity, volunteer_profiles, limit=10,
+                                  chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rank volunteer profiles for a single opportunity ("who fits this role").
+    
+    Returns:
+        List of tuples (VolunteerProfile, match_score), best first
+    """
+    matcher = BatchMatcher([opportunity])
+    ranked_profiles = []
+    ranked_scores = []
+    for chunk, scores, shared in matcher.iter_scores(volunteer_profiles, chunk_size):
+        ranked_profiles.extend(chunk)
+        ranked_scores.append(scores[:, 0])
+    if not ranked_profiles:
+        return []
+    
+    column = np.concatenate(ranked_scores)
+    return [
+        (ranked_profiles[i], float(column[i]))
+        for i in _ranked(column, np.isfinite(column), limit)
+    ]
+
+
+
+def _shortlist_volunteers(opportunity):
+    """
+    Rank the candidate volunteers for an opportunity by their skills and
+    interests points, from the volunteer reverse index.
+    
+    Candidates have a skill token containing or fuzzily matching a required
+    skill token (looked up in the volunteer vocabulary) or interests matching
+    the opportunity's category. skill_hits counts the required tokens (with
+    duplicates and empties) matched by one of a volunteer's tokens. A
+    volunteer's tokens hold everything the scoring compares, and a few word
+    sequences besides, so skill_hits is never below the matches it finds.
+    
+    Args:
+        opportunity: Opportunity instance
+    
+    Returns:
+        Tuple (profile_ids, skill_hits, interest_match) of arrays, best first
+        and then by descending profile id
+    """
+    required = opportunity.skill_tokens
+    token_count = max(len(required), 1)
+    vocabulary = get_volunteer_vocabulary()
+    
+    # One query per distinct required token for the profiles it hits
+    hit_ids = [np.empty(0, dtype=np.int64)]
+    hit_weights = [np.empty(0, dtype=np.int64)]
+    for token in set(required):
+        if not token:
+            continue
+        ids = np.fromiter(
+            VolunteerMatchToken.objects.filter(
+                kind='SKILL', token__in=vocabulary.matching_tokens(token)
+            ).values_list('profile_id', flat=True).distinct(),
+            dtype=np.int64
+        )
+        hit_ids.append(ids)
+        hit_weights.append(np.full(len(ids), required.count(token), dtype=np.int64))
+    interest_ids = np.fromiter(
+        VolunteerMatchToken.objects.filter(
+            kind='CATEGORY', token=opportunity.category
+        ).values_list('profile_id', flat=True),
+        dtype=np.int64
+    )
+    
+    profile_ids, inverse = np.unique(np.concatenate(hit_ids + [interest_ids]), return_inverse=True)
+    skill_hits = np.bincount(
+        inverse, weights=np.concatenate(hit_weights + [np.zeros(len(interest_ids), dtype=np.int64)]),
+        minlength=len(profile_ids)
+    ).astype(np.int64)
+    # An empty required token matches any skills text
+    skill_hits += required.count('')
+    interest_match = np.isin(profile_ids, interest_ids)
+    
+    # Skills and interests points times token_count, exact in integers
+    rank = skill_hits * 40 + interest_match * 20 * token_count
+    order = np.lexsort((-profile_ids, -rank))
+    return profile_ids[order], skill_hits[order], interest_match[order]
+
+
+def _best_possible_score(opportunity, skill_hits, interest_match):
+    """
+    Highest score a shortlisted volunteer could reach: the skills and
+    interests points of their shortlist row plus the most availability and
+    location points the opportunity allows. Accumulated as in
+    _score_for_opportunity, so the two compare exactly.
+    """
+    skills_match = min(skill_hits / max(len(opportunity.skill_tokens), 1), 1.0)
+    today = timezone.now().date()
+    is_active = opportunity.start_date > today or opportunity.end_date >= today
+    availability = 1.0 if is_active else 0.5
+    location = 1.0 if opportunity.is_remote else 0.5
+    return skills_match * 40 + float(interest_match) * 20 + availability * 20 + location * 10 + 10.0
+
+
+def _score_for_opportunity(opportunity, rows, interest_match):
+    """
+    Score profile rows (id, user_id, skills_normalized, skill_tokens,
+    max_hours, no_availability, availability_slots) against one opportunity,
+    as arrays. A listed
+    skill is always a substring of the lowercased skills text, so the
+    substring test plus fuzzy matches reproduces calculate_token_overlap.
+    """
+    profile_ids, user_ids, skills, skill_tokens, max_hours, no_availability, slots = zip(*rows)
+    
+    # Skills: count required tokens (with duplicates and empties) found in each text
+    texts = np.array(skills, dtype=str)
+    required = opportunity.skill_tokens
+    hits = np.zeros((len(rows), len(required)), dtype=bool)
+    for j, token in enumerate(required):
+        hits[:, j] = np.char.find(texts, token) >= 0
+    for i, tokens in enumerate(skill_tokens):
+        fuzzy_matches = get_fuzzy_skill_matches(tokens, required)
+        if fuzzy_matches:
+            hits[i] |= [token in fuzzy_matches for token in required]
+    matches = hits.sum(axis=1)
+    skills_match = np.minimum(matches / max(len(required), 1), 1.0)
+    skills_match[np.array([not text for text in skills], dtype=bool)] = 0.0
+    
+    # Availability: by the share of session hours covered, if there are sessions
+    today = timezone.now().date()
+    is_active = opportunity.start_date > today or opportunity.end_date >= today
+    has_availability = ~np.array(no_availability, dtype=bool)
+    fit = 1.0 if is_active else 0.0
+    session_slots = get_slot_array([opportunity.session_slots])
+    session_hours = popcount(session_slots).sum(dtype=np.int64)
+    if is_active and session_hours:
+        fit = get_schedule_overlap_matrix(get_slot_array(slots), session_slots, session_hours)[:, 0]
+    availability = np.where(has_availability, fit, 0.5)
+    location = np.where(has_availability & opportunity.is_remote, 1.0, 0.5)
+    
+    # Same accumulation order as get_recommended_opportunities
+    scores = skills_match * 40
+    scores = scores + np.array([interest_match[i] for i in profile_ids], dtype=np.float64) * 20
+    scores = scores + availability * 20
+    scores = scores + location * 10
+    scores = scores + 10.0
+    return scores
+
+
+def get_suggested_volunteers(opportunity, limit=10, shortlist_size=None):
+    """
+    Get the best-fitting volunteers with spare capacity for an opportunity,
+    scored with the same criteria as get_recommended_opportunities.
+    
+    Candidates are ranked once from the volunteer reverse index (one query
+    per distinct required skill token, plus one for interests), best first
+    by their skills and interests points, and scored exactly in pages of
+    shortlist_size (profiles and commitments loaded with one query each per
+    page); volunteers who applied, or who lack the weekly hours during the
+    opportunity, are dropped.
+    Paging stops once no volunteer left could beat the limit-th best score
+    so far (see _best_possible_score).
+    
+    Args:
+        opportunity: Opportunity instance
+        limit: Maximum number of volunteers to return
+        shortlist_size: Candidates scored per page (default: 5 x limit, at least 100)
+    
+    Returns:
+        List of tuples (VolunteerProfile, match_score)
+    """
+    if limit <= 0:
+        return []
+    shortlist_size = shortlist_size or max(limit * 5, 100)
+    profile_ids, skill_hits, interest_flags = _shortlist_volunteers(opportunity)
+    
+    top = []
+    for start in range(0, len(profile_ids), shortlist_size):
+        page = profile_ids[start:start + shortlist_size].tolist()
+        interest_match = dict(zip(page, interest_flags[start:start + shortlist_size].tolist()))
+        order = {profile_id: i for i, profile_id in enumerate(page)}
+        
+        rows = sorted(
+            VolunteerProfile.objects.filter(
+                id__in=interest_match,
+                max_hours_per_week__gte=opportunity.min_hours_per_week
+            ).exclude(
+                user_id__in=Application.objects.filter(opportunity=opportunity).values('volunteer_id')
+            ).annotate(
+                no_availability=Q(availability={})
+            ).values_list(
+                'id', 'user_id', 'skills_normalized', 'skill_tokens',
+                'max_hours_per_week', 'no_availability', 'availability_slots'
+            ),
+            key=lambda row: order[row[0]]
+        )
+        if rows:
+            calendars = get_commitment_calendars(
+                [row[1] for row in rows], opportunity.start_date, opportunity.end_date
+            )
+            scores = _score_for_opportunity(opportunity, rows, interest_match)
+            fits = [
+                calendars[user_id].peak_load(opportunity.start_date, opportunity.end_date)
+                + opportunity.min_hours_per_week <= max_hours
+                for _, user_id, _, _, max_hours, _, _ in rows
+            ]
+            # Stable by shortlist order for equal scores
+            top = sorted(
+                top + [(rows[i][0], float(scores[i])) for i in np.flatnonzero(fits)],
+                key=lambda pair: pair[1],
+                reverse=True
+            )[:limit]
+        
+        # Later candidates have no more skills and interests points, and lose ties
+        last = start + len(page) - 1
+        if len(top) == limit and top[-1][1] >= _best_possible_score(
+            opportunity, int(skill_hits[last]), bool(interest_flags[last])
+        ):
+            break
+    
+    profiles = VolunteerProfile.objects.select_related('user').in_bulk(
+        [profile_id for profile_id, _ in top]
+    )
+    return [
+        (profiles[profile_id], score)
+        for profile_id, score in top
+        if profile_id in profiles
+    ]
@@ -0,0 +1,341 @@
+"""
+Matching engine benchmarks - times matching.py on deterministic synthetic data.
+
+Each scale generates the same catalog for a given seed (N opportunities, N
+volunteer profiles and a share of ACCEPTED applications) inside a transaction
+that is rolled back afterwards, then measures:
+- calculate_skills_overlap and check_interests_match over sampled pairs
+- get_recommended_opportunities for a sample of volunteers
+Every benchmark records wall time, database queries and peak traced memory.
+Reports are JSON, so two runs (say, before and after a commit) can be compared
+metric by metric with compare_reports.
+"""
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, timedelta
+import django
+from django.conf import settings
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounts.models import User
+from opportunities.models import Application, Opportunity
+from opportunities.search import rebuild_search_index
+from organisations.models import Organisation
+from . import fuzzy, interests
+from .indexing import rebuild_skill_index, rebuild_volunteer_index
+from .interests import CATEGORY_KEYWORDS
+from .matching import (
+    calculate_skills_overlap,
+    check_interests_match,
+    get_recommended_opportunities,
+)
+from .models import VolunteerProfile
+from .scheduling import reconcile_committed_hours
+
+
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+REPORT_VERSION = 1
+
+DEFAULT_SEED = 42
+DEFAULT_PAIRS = 20000
+DEFAULT_VOLUNTEERS = 100
+
+# Metrics compared between reports; higher is worse for all of them. Query
+# counts are deterministic, so any increase in them is a regression.
+COMPARED_METRICS = ('median_ms', 'queries_per_call', 'peak_memory_kib')
+EXACT_METRICS = ('queries_per_call',)
+
+DEFAULT_TOLERANCE = 0.2
+
+SKILL_WORDS = [
+    'python', 'javascript', 'teaching', 'tutoring', 'first aid', 'cooking',
+    'gardening', 'driving', 'photography', 'writing', 'editing', 'design',
+    'fundraising', 'marketing', 'accounting', 'counselling', 'coaching',
+    'music', 'painting', 'carpentry', 'plumbing', 'nursing', 'translation',
+    'sign language', 'event planning', 'social media', 'data analysis',
+    'web development', 'public speaking', 'mentoring',
+]
+SKILL_QUALIFIERS = ['advanced', 'basic', 'community', 'youth', 'senior', 'remote']
+
+INTEREST_WORDS = sorted({
+    keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords
+}) + ['reading', 'travel', 'history', 'languages', 'cinema']
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+BATCH_SIZE = 2000
+
+
+def get_skill_vocabulary():
+    """Return the synthetic skill vocabulary: base skills plus qualified variants."""
+    return SKILL_WORDS + [
+        f'{qualifier} {skill}' for qualifier in SKILL_QUALIFIERS for skill in SKILL_WORDS
+    ]
+
+
+def generate_dataset(size, seed=DEFAULT_SEED):
+    """
+    Create a deterministic synthetic catalog and volunteer population.
+    
+    Rows are bulk created, so the matching and search indexes and committed
+    hours counters are rebuilt afterwards.
+    Call on an empty database, inside a transaction that is rolled back.
+    
+    Args:
+        size: Number of opportunities and of volunteer profiles
+        seed: Random seed; the same seed always produces the same data
+    
+    Returns:
+        List of the created VolunteerProfile instances
+    """
+    rng = random.Random(seed)
+    vocabulary = get_skill_vocabulary()
+    categories = [code for code, _ in Opportunity.CATEGORY_CHOICES]
+    today = date(2026, 1, 1)
+    
+    admins = []
+    for k in range(size // 100 + 1):
+        admin = User(username=f'bench-org-{k}', role='ORGANISATION_ADMIN')
+        admin.set_unusable_password()
+        admins.append(admin)
+    admins = User.objects.bulk_create(admins, batch_size=BATCH_SIZE)
+    organisations = Organisation.objects.bulk_create(
+        [
+            Organisation(
+                name=f'Organisation {k}',
+                description='Synthetic benchmark organisation',
+                contact_email=f'org{k}@example.com',
+                admin=admin,
+                verified=True
+            )
+            for k, admin in enumerate(admins)
+        ],
+        batch_size=BATCH_SIZE
+    )
+    
+    opportunities = []
+    for k in range(size):
+        start_date = today + timedelta(days=rng.randint(-180, 180))
+        opportunities.append(Opportunity(
+            title=f'Opportunity {k}',
+            description='Synthetic benchmark opportunity',
+            location='Remote' if k % 4 == 0 else f'Campus {k % 20}',
+            is_remote=k % 4 == 0,
+            category=rng.choice(categories),
+            required_skills=', '.join(rng.sample(vocabulary, rng.randint(1, 4))),
+            min_hours_per_week=rng.randint(1, 10),
+            volunteers_needed=rng.randint(1, 10),
+            start_date=start_date,
+            end_date=start_date + timedelta(days=rng.randint(30, 3650)),
+            status='OPEN' if rng.random() < 0.9 else 'CLOSED',
+            organisation=rng.choice(organisations)
+        ))
+    opportunities = Opportunity.objects.bulk_create(opportunities, batch_size=BATCH_SIZE)
+    
+    volunteers = []
+    for k in range(size):
+        volunteer = User(username=f'bench-volunteer-{k}', role='VOLUNTEER')
+        volunteer.set_unusable_password()
+        volunteers.append(volunteer)
+    volunteers = User.objects.bulk_create(volunteers, batch_size=BATCH_SIZE)
+    profiles = VolunteerProfile.objects.bulk_create(
+        [
+            VolunteerProfile(
+                user=volunteer,
+                skills=', '.join(rng.sample(vocabulary, rng.randint(1, 6))),
+                interests=', '.join(rng.sample(INTEREST_WORDS, rng.randint(1, 3))),
+                availability={day: '9-17' for day in rng.sample(WEEKDAYS, rng.randint(0, 4))},
+                max_hours_per_week=rng.randint(2, 20)
+            )
+            for volunteer in volunteers
+        ],
+        batch_size=BATCH_SIZE
+    )
+    
+    # One volunteer in ten already has an accepted commitment
+    Application.objects.bulk_create(
+        [
+            Application(volunteer=volunteer, opportunity=rng.choice(opportunities), status='ACCEPTED')
+            for volunteer in volunteers[::10]
+        ],
+        batch_size=BATCH_SIZE
+    )
+    
+    rebuild_skill_index()
+    rebuild_volunteer_index()
+    reconcile_committed_hours()
+    rebuild_search_index()
+    return profiles
+
+
+def measure(function, calls):
+    """
+    Run a benchmark once to count queries and trace memory, then again to time it.
+    The traced pass goes first so it sees cold caches.
+    
+    Args:
+        function: Callable taking the call number and doing one unit of work
+        calls: Number of units of work
+    
+    Returns:
+        Dict of metrics
+    """
+    # The query log is bounded, so empty it for the capture to see every query
+    reset_queries()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            for call in range(calls):
+                function(call)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    # Tracing slows allocation down, so timings come from a separate pass
+    durations = []
+    for call in range(calls):
+        started = time.perf_counter()
+        function(call)
+        durations.append(time.perf_counter() - started)
+    
+    durations.sort()
+    return {
+        'calls': calls,
+        'total_seconds': round(sum(durations), 6),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 6),
+        'median_ms': round(statistics.median(durations) * 1000, 6),
+        'p95_ms': round(durations[int(0.95 * (calls - 1))] * 1000, 6),
+        'queries_per_call': round(len(queries) / calls, 3),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def run_scale(size, seed=DEFAULT_SEED, pairs=DEFAULT_PAIRS, volunteers=DEFAULT_VOLUNTEERS):
+    """
+    Benchmark the matching functions on one synthetic dataset.
+    The data is rolled back when the run ends.
+    
+    Returns:
+        Dict mapping benchmark name to its metrics, plus setup_seconds
+    """
+    results = {}
+    with transaction.atomic():
+        started = time.perf_counter()
+        profiles = generate_dataset(size, seed)
+        results['setup_seconds'] = round(time.perf_counter() - started, 3)
+        fuzzy.clear_caches()
+        interests.clear_caches()
+        
+        rng = random.Random(seed)
+        opportunities = list(Opportunity.objects.values_list('required_skills', 'category'))
+        sampled = [
+            (rng.choice(profiles), rng.choice(opportunities))
+            for _ in range(pairs)
+        ]
+        results['calculate_skills_overlap'] = measure(
+            lambda k: calculate_skills_overlap(sampled[k][0].skills, sampled[k][1][0]),
+            pairs
+        )
+        results['check_interests_match'] = measure(
+            lambda k: check_interests_match(sampled[k][0].interests, sampled[k][1][1]),
+            pairs
+        )
+        
+        recommended_for = rng.sample(profiles, min(volunteers, len(profiles)))
+        results['get_recommended_opportunities'] = measure(
+            lambda k: get_recommended_opportunities(recommended_for[k]),
+            len(recommended_for)
+        )
+        transaction.set_rollback(True)
+    return results
+
+
+def get_git_commit():
+    """Return the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scales=tuple(SCALES), seed=DEFAULT_SEED, pairs=DEFAULT_PAIRS,
+                   volunteers=DEFAULT_VOLUNTEERS, progress=None):
+    """
+    Run the benchmark suite at the given scales.
+    
+    Args:
+        scales: Names of SCALES to run
+        seed: Random seed for the synthetic data
+        pairs: Pairs timed for each per-pair function
+        volunteers: Volunteers timed for get_recommended_opportunities
+        progress: Optional callable receiving each scale name before it runs
+    
+    Returns:
+        Report dict (JSON serializable)
+    """
+    report = {
+        'version': REPORT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'commit': get_git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'parameters': {'seed': seed, 'pairs': pairs, 'volunteers': volunteers},
+        'scales': {},
+    }
+    for scale in scales:
+        if progress:
+            progress(scale)
+        report['scales'][scale] = run_scale(SCALES[scale], seed, pairs, volunteers)
+    return report
+
+
+def compare_reports(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare two benchmark reports metric by metric.
+    
+    Args:
+        baseline: Earlier report dict
+        current: Later report dict
+        tolerance: Relative increase allowed before a timing or memory
+            metric counts as a regression
+    
+    Returns:
+        List of dicts with scale, benchmark, metric, baseline, current,
+        change (relative, None when the baseline is 0) and regression
+    """
+    rows = []
+    for scale, benchmarks in current['scales'].items():
+        baseline_benchmarks = baseline['scales'].get(scale, {})
+        for benchmark, metrics in benchmarks.items():
+            if not isinstance(metrics, dict) or benchmark not in baseline_benchmarks:
+                continue
+            for metric in COMPARED_METRICS:
+                before = baseline_benchmarks[benchmark][metric]
+                after = metrics[metric]
+                change = (after - before) / before if before else None
+                allowed = before if metric in EXACT_METRICS else before * (1 + tolerance)
+                rows.append({
+                    'scale': scale,
+                    'benchmark': benchmark,
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change': change,
+                    'regression': after > allowed,
+                })
+    return rows
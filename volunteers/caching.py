@@ -0,0 +1,243 @@
+"""
+Recommendation cache - stores each volunteer's ranked top-N.
+
+Each entry records the version stamps of everything it was computed from:
+- the volunteer (profile fields and ACCEPTED applications)
+- every skill token and interest category the volunteer matched
+- the skill vocabulary, since a new token can match a volunteer by substring
+Signal handlers give fresh stamps only to the keys an edit touches, so one
+changed opportunity invalidates just the volunteers that could have ranked it.
+In the text similarity mode any opportunity can rank for anyone, so entries
+depend on the volunteer and a single catalog text stamp instead.
+
+Entries live in each process's own cache, but the stamps are VersionStamp
+rows, so an edit handled by one worker process invalidates the entries held
+by every worker. Checking an entry costs one query.
+"""
+import hashlib
+import logging
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from opportunities.models import Opportunity
+from .matching import get_matching_terms, get_recommendation_mode, get_recommended_opportunities
+from .models import VersionStamp
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'recommendations'
+HITS_KEY = 'rec:stats:hits'
+MISSES_KEY = 'rec:stats:misses'
+VOCABULARY_VERSION_KEY = 'rec:version:vocabulary'
+TEXT_VERSION_KEY = 'rec:version:text'
+VOLUNTEER_VOCABULARY_VERSION_KEY = 'rec:version:volunteer-vocabulary'
+
+
+def get_cache():
+    """Return the cache backend holding recommendations."""
+    return caches[CACHE_ALIAS]
+
+
+def entry_key(user_id):
+    return f'rec:entry:{user_id}'
+
+
+def volunteer_version_key(user_id):
+    return f'rec:version:volunteer:{user_id}'
+
+
+def token_version_key(token):
+    # Tokens are free text, so hash them into a backend-safe key
+    digest = hashlib.md5(token.encode('utf-8')).hexdigest()
+    return f'rec:version:token:{digest}'
+
+
+def category_version_key(category):
+    return f'rec:version:category:{category}'
+
+
+def _new_stamp():
+    """
+    Return a unique version stamp. Stamps are never reused, so an evicted
+    version key can't make an old entry look fresh again.
+    """
+    return uuid.uuid4().hex
+
+
+def bump_versions(keys):
+    """Give each version key a fresh stamp, invalidating entries that depend on it."""
+    keys = set(keys)
+    if keys:
+        VersionStamp.objects.bulk_create(
+            [VersionStamp(key=key, stamp=_new_stamp()) for key in keys],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['stamp', 'updated_at']
+        )
+
+
+def read_versions(keys):
+    """Get the current stamps of the version keys that have one."""
+    return dict(VersionStamp.objects.filter(key__in=keys).values_list('key', 'stamp'))
+
+
+def get_versions(keys):
+    """Get the current stamps for version keys, creating any that are missing."""
+    versions = read_versions(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        VersionStamp.objects.bulk_create(
+            [VersionStamp(key=key, stamp=_new_stamp()) for key in missing],
+            ignore_conflicts=True
+        )
+        versions.update(read_versions(missing))
+    return versions
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_cache_stats():
+    """
+    Get recommendation cache hit/miss counters.
+    
+    Returns:
+        Dict with hits, misses and hit_rate (0-1)
+    """
+    counters = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def get_dependency_keys(volunteer_profile, mode):
+    """
+    Get the version keys a volunteer's ranking depends on in a recommendation mode.
+    
+    Returns:
+        Tuple: (keys: list of version keys, terms: the volunteer's matching
+        terms, or None in the text similarity mode)
+    """
+    user_id = volunteer_profile.user_id
+    if mode == 'tfidf':
+        return [volunteer_version_key(user_id), TEXT_VERSION_KEY], None
+    terms = get_matching_terms(volunteer_profile)
+    matched_tokens, categories = terms
+    keys = [volunteer_version_key(user_id), VOCABULARY_VERSION_KEY]
+    keys.extend(token_version_key(token) for token in matched_tokens)
+    keys.extend(category_version_key(category) for category in categories)
+    return keys, terms
+
+
+def _is_fresh(entry, limit, mode):
+    if entry['size'] < limit or entry.get('mode') != mode:
+        return False
+    versions = entry['versions']
+    return read_versions(list(versions)) == versions
+
+
+def hydrate_ranking(ranking):
+    """Turn stored (opportunity_id, score) pairs back into (Opportunity, score)."""
+    opportunities = Opportunity.objects.select_related('organisation').in_bulk(
+        [opportunity_id for opportunity_id, _ in ranking]
+    )
+    return [
+        (opportunities[opportunity_id], score)
+        for opportunity_id, score in ranking
+        if opportunity_id in opportunities
+    ]
+
+
+def _get_ranking(volunteer_profile, limit):
+    """
+    Look up (or compute and store) a volunteer's ranking.
+    
+    Returns:
+        Tuple: (ranking: list of (opportunity_id, score), recommendations:
+        list of (Opportunity, score) when just computed, else None)
+    """
+    cache = get_cache()
+    user_id = volunteer_profile.user_id
+    mode = get_recommendation_mode()
+    
+    entry = cache.get(entry_key(user_id))
+    if entry is not None and _is_fresh(entry, limit, mode):
+        _count(HITS_KEY)
+        return entry['ranking'][:limit], None
+    
+    _count(MISSES_KEY)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Recommendation cache miss for user %s: %s", user_id, get_cache_stats())
+    
+    # Read the stamps before computing so a concurrent edit invalidates the entry
+    keys, terms = get_dependency_keys(volunteer_profile, mode)
+    versions = get_versions(keys)
+    size = max(limit, settings.RECOMMENDATION_CACHE_SIZE)
+    recommendations = get_recommended_opportunities(volunteer_profile, limit=size, terms=terms, mode=mode)
+    ranking = [(opp.id, score) for opp, score in recommendations]
+    
+    cache.set(entry_key(user_id), {
+        'mode': mode,
+        'versions': versions,
+        'size': size,
+        'ranking': ranking,
+    })
+    return ranking[:limit], recommendations[:limit]
+
+
+def get_cached_ranking(volunteer_profile, limit=10):
+    """
+    Cached ranking of a volunteer's recommendations, without loading the
+    opportunities.
+    
+    Returns:
+        List of tuples (opportunity_id, match_score)
+    """
+    return _get_ranking(volunteer_profile, limit)[0]
+
+
+def get_cached_recommendations(volunteer_profile, limit=10):
+    """
+    Cached wrapper around get_recommended_opportunities.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        limit: Maximum number of opportunities to return
+    
+    Returns:
+        List of tuples (Opportunity, match_score)
+    """
+    ranking, recommendations = _get_ranking(volunteer_profile, limit)
+    if recommendations is None:
+        recommendations = hydrate_ranking(ranking)
+    return recommendations
+
+
+def invalidate_volunteer(user_id):
+    """Invalidate a volunteer's cached recommendations."""
+    bump_versions([volunteer_version_key(user_id)])
+
+
+def invalidate_opportunity_terms(tokens, categories, vocabulary_changed=False):
+    """Invalidate volunteers who matched any of the given skill tokens or categories."""
+    keys = [token_version_key(token) for token in tokens]
+    keys.extend(category_version_key(category) for category in categories)
+    if vocabulary_changed:
+        keys.append(VOCABULARY_VERSION_KEY)
+    bump_versions(keys)
+
+
+def invalidate_opportunity_text():
+    """Invalidate the text similarity index and the rankings computed from it."""
+    bump_versions([TEXT_VERSION_KEY])
+
@@ -0,0 +1,131 @@
+"""
+Fuzzy skill matching - character trigram similarity between skill tokens.
+
+Tokens are compared on their padded character trigrams, as PostgreSQL's
+pg_trgm does: similarity is the Jaccard index of the two trigram sets, so
+"tutor" and "tutoring" score 0.5. Abbreviations that share no trigrams with
+what they stand for ("js" and "javascript") are mapped to a canonical token
+through SKILL_ALIASES before comparing.
+
+A trigram index over the known skill vocabulary finds candidates: only tokens
+sharing a trigram with the query are looked at, and their shared trigram count
+(and so their similarity) comes straight from the postings, so token pairs are
+never compared directly. Trigram sets are cached per token, and index lookups
+per query token.
+"""
+from collections import Counter, defaultdict
+from functools import lru_cache
+from django.conf import settings
+
+
+# Settings read by this module; changing one clears the caches below
+FUZZY_SETTINGS = ('SKILL_FUZZY_MATCHING', 'SKILL_FUZZY_THRESHOLD', 'SKILL_ALIASES')
+
+
+def fuzzy_matching_enabled():
+    return getattr(settings, 'SKILL_FUZZY_MATCHING', False)
+
+
+def get_threshold():
+    return getattr(settings, 'SKILL_FUZZY_THRESHOLD', 0.5)
+
+
+@lru_cache(maxsize=1)
+def get_aliases():
+    """Return SKILL_ALIASES with normalized (stripped, lowercased) keys and values."""
+    return {
+        alias.strip().lower(): canonical.strip().lower()
+        for alias, canonical in getattr(settings, 'SKILL_ALIASES', {}).items()
+    }
+
+
+def canonical_skill(token):
+    """Map a normalized skill token to its canonical form."""
+    return get_aliases().get(token, token)
+
+
+@lru_cache(maxsize=65536)
+def get_trigrams(token):
+    """Return the set of padded character trigrams of a token."""
+    padded = f'  {token} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class SkillTrigramIndex:
+    """
+    Inverted index from character trigram to the vocabulary tokens containing it.
+    Counting a query's trigram hits gives the exact shared trigram count, so
+    similarity follows without comparing the token pair again. Matches are
+    memoized per query token.
+    """
+    
+    def __init__(self, vocabulary):
+        self.postings = defaultdict(list)
+        self.sizes = {}
+        self._matches = {}
+        for token in vocabulary:
+            if token:
+                trigrams = get_trigrams(canonical_skill(token))
+                self.sizes[token] = len(trigrams)
+                for trigram in trigrams:
+                    self.postings[trigram].append(token)
+    
+    def matches(self, token, threshold):
+        """Vocabulary tokens whose similarity to token is at least threshold."""
+        key = (token, threshold)
+        if key not in self._matches:
+            trigrams = get_trigrams(canonical_skill(token))
+            # shared / (a + b - shared) >= t  <=>  shared >= t * (a + b) / (1 + t)
+            shared = Counter()
+            for trigram in trigrams:
+                shared.update(self.postings.get(trigram, ()))
+            size = len(trigrams)
+            self._matches[key] = {
+                candidate for candidate, count in shared.items()
+                if count >= threshold * (size + self.sizes[candidate]) / (1 + threshold) - 1e-9
+            }
+        return self._matches[key]
+
+
+@lru_cache(maxsize=8)
+def get_trigram_index(vocabulary):
+    """Return a (cached) SkillTrigramIndex for a frozenset vocabulary."""
+    return SkillTrigramIndex(vocabulary)
+
+
+def get_query_tokens(volunteer_tokens):
+    """A volunteer's non-empty skill tokens plus each of their words."""
+    query = set()
+    for token in volunteer_tokens:
+        if token:
+            query.add(token)
+            query.update(token.split())
+    return query
+
+
+def get_fuzzy_skill_matches(volunteer_tokens, vocabulary):
+    """
+    Return the vocabulary tokens fuzzily matched by a volunteer's skills.
+    
+    Args:
+        volunteer_tokens: Normalized volunteer skill tokens
+        vocabulary: Iterable of normalized skill tokens to match against
+    
+    Returns:
+        Set of matched vocabulary tokens (empty when fuzzy matching is off)
+    """
+    if not fuzzy_matching_enabled():
+        return set()
+    
+    index = get_trigram_index(frozenset(vocabulary))
+    threshold = get_threshold()
+    matches = set()
+    for token in get_query_tokens(volunteer_tokens):
+        matches |= index.matches(token, threshold)
+    return matches
+
+
+def clear_caches():
+    """Drop cached aliases, trigrams and indexes."""
+    for cached in (get_aliases, get_trigrams, get_trigram_index):
+        cached.cache_clear()
@@ -0,0 +1,220 @@
+"""
+Maintenance of the matching indexes:
+- OpportunitySkillToken: skill token -> open opportunity
+- VolunteerMatchToken: skill token/word or interest category -> volunteer profile
+
+Each process also keeps the skill tokens of the volunteer index (the
+volunteer vocabulary), so the volunteers whose skills contain or fuzzily
+match a required skill can be looked up by token. It is reloaded when the
+volunteer vocabulary stamp changes, which happens whenever a profile brings
+a token no other profile has.
+"""
+import threading
+from .caching import VOLUNTEER_VOCABULARY_VERSION_KEY, bump_versions, get_versions
+from .fuzzy import SkillTrigramIndex, fuzzy_matching_enabled, get_threshold
+from .matching import (
+    SKILL_TOKEN_MAX_LENGTH,
+    get_interest_categories,
+    get_volunteer_skill_tokens,
+)
+from opportunities.models import NormalizedTextField, NormalizedTokensField, Opportunity, WeeklySlotsField
+from .models import OpportunitySkillToken, VolunteerMatchToken, VolunteerProfile
+
+
+def get_skill_tokens(skill_tokens):
+    """Return the set of index tokens for normalized required skill tokens."""
+    return {
+        token[:SKILL_TOKEN_MAX_LENGTH]
+        for token in skill_tokens
+        if token
+    }
+
+
+def get_index_tokens(opportunity):
+    """Return the set of index tokens for an opportunity (empty unless open)."""
+    if opportunity.status != 'OPEN':
+        return set()
+    return get_skill_tokens(opportunity.skill_tokens)
+
+
+def index_opportunity(opportunity):
+    """
+    Bring an opportunity's index entries up to date.
+    Only the tokens that were added or removed are written.
+    
+    Returns:
+        Set of tokens added to the opportunity's entries
+    """
+    wanted = get_index_tokens(opportunity)
+    existing = set(
+        OpportunitySkillToken.objects.filter(
+            opportunity=opportunity
+        ).values_list('token', flat=True)
+    )
+    
+    stale = existing - wanted
+    if stale:
+        OpportunitySkillToken.objects.filter(
+            opportunity=opportunity,
+            token__in=stale
+        ).delete()
+    
+    missing = wanted - existing
+    if missing:
+        OpportunitySkillToken.objects.bulk_create(
+            [OpportunitySkillToken(token=token, opportunity=opportunity) for token in missing],
+            ignore_conflicts=True
+        )
+    return missing
+
+
+def get_volunteer_index_entries(profile):
+    """Return the set of (kind, token) reverse index entries for a volunteer profile."""
+    entries = {('SKILL', token) for token in get_volunteer_skill_tokens(profile.skills)}
+    entries.update(
+        ('CATEGORY', category)
+        for category in get_interest_categories(profile.interests_normalized)
+    )
+    return entries
+
+
+def index_volunteer(profile):
+    """Bring a volunteer profile's reverse index entries up to date."""
+    wanted = get_volunteer_index_entries(profile)
+    existing = set(
+        VolunteerMatchToken.objects.filter(
+            profile=profile
+        ).values_list('kind', 'token')
+    )
+    
+    stale = existing - wanted
+    for stale_kind in {kind for kind, _ in stale}:
+        VolunteerMatchToken.objects.filter(
+            profile=profile,
+            kind=stale_kind,
+            token__in=[token for kind, token in stale if kind == stale_kind]
+        ).delete()
+    
+    missing = wanted - existing
+    if missing:
+        new_tokens = {token for kind, token in missing if kind == 'SKILL'}
+        if new_tokens and new_tokens - set(
+            VolunteerMatchToken.objects.filter(
+                kind='SKILL',
+                token__in=new_tokens
+            ).values_list('token', flat=True).distinct()
+        ):
+            bump_versions([VOLUNTEER_VOCABULARY_VERSION_KEY])
+        VolunteerMatchToken.objects.bulk_create(
+            [VolunteerMatchToken(profile=profile, kind=kind, token=token) for kind, token in missing],
+            ignore_conflicts=True
+        )
+
+
+def rebuild_volunteer_index():
+    """Rebuild the whole volunteer reverse index from the profiles."""
+    VolunteerMatchToken.objects.all().delete()
+    entries = []
+    for profile in VolunteerProfile.objects.only('id', 'skills', 'interests_normalized').iterator():
+        entries.extend(
+            VolunteerMatchToken(profile=profile, kind=kind, token=token)
+            for kind, token in get_volunteer_index_entries(profile)
+        )
+        if len(entries) >= 5000:
+            VolunteerMatchToken.objects.bulk_create(entries)
+            entries = []
+    VolunteerMatchToken.objects.bulk_create(entries)
+    bump_versions([VOLUNTEER_VOCABULARY_VERSION_KEY])
+
+
+def rebuild_skill_index():
+    """Rebuild the whole index from the open opportunities."""
+    OpportunitySkillToken.objects.all().delete()
+    entries = []
+    for opportunity in Opportunity.objects.filter(status='OPEN').only('id', 'status', 'skill_tokens'):
+        entries.extend(
+            OpportunitySkillToken(token=token, opportunity=opportunity)
+            for token in get_index_tokens(opportunity)
+        )
+    OpportunitySkillToken.objects.bulk_create(entries, batch_size=1000)
+
+
+def refresh_normalized_fields(batch_size=1000):
+    """
+    Recompute the normalized skill and interest columns and the weekly slot
+    bitmasks of every opportunity and volunteer profile. They are maintained
+    on save, but raw saves (such as loaddata) and bulk_update() bypass that.
+    """
+    for model in (Opportunity, VolunteerProfile):
+        fields = [
+            field for field in model._meta.concrete_fields
+            if isinstance(field, (NormalizedTextField, NormalizedTokensField, WeeklySlotsField))
+        ]
+        sources = {field.source for field in fields}
+        
+        last_id = 0
+        while True:
+            batch = list(
+                model.objects.filter(id__gt=last_id).order_by('id').only('id', *sources)[:batch_size]
+            )
+            if not batch:
+                break
+            for instance in batch:
+                for field in fields:
+                    field.pre_save(instance, False)
+            model.objects.bulk_update(batch, [field.name for field in fields])
+            last_id = batch[-1].id
+
+
+class VolunteerVocabulary:
+    """
+    The skill tokens of the volunteer reverse index, with memoized lookups
+    of the tokens a required skill token matches.
+    """
+    
+    def __init__(self, tokens, version=None):
+        self.tokens = list(tokens)
+        self.version = version
+        self._trigram_index = None
+        self._matching = {}
+    
+    def matching_tokens(self, token):
+        """
+        Vocabulary tokens a required skill token matches as the scoring does:
+        those containing it and, with fuzzy matching on, those fuzzily
+        matching it. A volunteer's skills text contains the token exactly
+        when one of their comma-separated tokens does.
+        """
+        key = (token, fuzzy_matching_enabled() and get_threshold())
+        if key not in self._matching:
+            matching = {candidate for candidate in self.tokens if token in candidate}
+            if fuzzy_matching_enabled():
+                if self._trigram_index is None:
+                    self._trigram_index = SkillTrigramIndex(self.tokens)
+                matching |= self._trigram_index.matches(token, get_threshold())
+            self._matching[key] = matching
+        return self._matching[key]
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_volunteer_vocabulary():
+    """Return this process's VolunteerVocabulary, reloaded if the stamp changed since."""
+    global _vocabulary
+    version = get_versions([VOLUNTEER_VOCABULARY_VERSION_KEY])[VOLUNTEER_VOCABULARY_VERSION_KEY]
+    with _vocabulary_lock:
+        if _vocabulary is None or _vocabulary.version != version:
+            _vocabulary = VolunteerVocabulary(
+                VolunteerMatchToken.objects.filter(kind='SKILL').values_list('token', flat=True).distinct(),
+                version
+            )
+        return _vocabulary
+
+
+def reset_volunteer_vocabulary():
+    """Drop this process's volunteer vocabulary; the next lookup reloads it."""
+    global _vocabulary
+    with _vocabulary_lock:
+        _vocabulary = None
@@ -0,0 +1,116 @@
+"""
+Interest matching - maps a volunteer's interests text to opportunity categories.
+
+A category matches when its name or one of its keywords appears anywhere in
+the lowercased interests. Rather than scanning each category's keywords per
+opportunity, all keywords are compiled into one regex that finds every
+keyword occurrence (overlapping ones included) in a single pass; each match
+maps to its category set. Results are cached per interests text, so a
+profile is classified once however many opportunities it is scored against.
+
+Keywords come from CATEGORY_KEYWORDS plus the INTEREST_CATEGORY_KEYWORDS
+setting; changing the setting rebuilds the compiled pattern.
+"""
+import re
+from functools import lru_cache
+from django.conf import settings
+from opportunities.models import Opportunity
+
+
+# Settings read by this module; changing one clears the caches below
+INTEREST_SETTINGS = ('INTEREST_CATEGORY_KEYWORDS',)
+
+# Keywords for common categories, matched against lowercased interests
+CATEGORY_KEYWORDS = {
+    'education': ['education', 'teaching', 'learning', 'tutoring'],
+    'healthcare': ['health', 'medical', 'care', 'wellness'],
+    'environment': ['environment', 'green', 'sustainability', 'climate'],
+    'community': ['community', 'social', 'service', 'help'],
+    'animals': ['animal', 'pet', 'wildlife', 'veterinary'],
+    'arts': ['art', 'culture', 'creative', 'music', 'theater'],
+    'sports': ['sport', 'fitness', 'exercise', 'athletic'],
+    'technology': ['tech', 'computer', 'programming', 'digital'],
+}
+
+
+def get_category_keywords():
+    """
+    Get the keywords of every opportunity category: the category name, the
+    built-in CATEGORY_KEYWORDS and any added by INTEREST_CATEGORY_KEYWORDS
+    (keyed by category code, case-insensitively).
+    
+    Returns:
+        Dict mapping category code to a set of lowercased keywords
+    """
+    extra = {
+        code.lower(): keywords
+        for code, keywords in getattr(settings, 'INTEREST_CATEGORY_KEYWORDS', {}).items()
+    }
+    keywords = {}
+    for code, _ in Opportunity.CATEGORY_CHOICES:
+        category = code.lower()
+        words = [category, *CATEGORY_KEYWORDS.get(category, []), *extra.get(category, [])]
+        keywords[code] = {word.strip().lower() for word in words if word.strip()}
+    return keywords
+
+
+class InterestClassifier:
+    """
+    Compiled matcher from interests text to the set of matching category codes.
+    
+    The pattern is a lookahead alternation of all keywords, longest first, so
+    finditer reports the longest keyword starting at each position. Any other
+    keyword starting there is a prefix of it, so each keyword maps to the
+    categories of all its prefix keywords as well as its own.
+    """
+    
+    def __init__(self, keywords_by_category):
+        own_categories = {}
+        for code, keywords in keywords_by_category.items():
+            for keyword in keywords:
+                own_categories.setdefault(keyword, set()).add(code)
+        
+        self.categories = {
+            keyword: frozenset().union(*(
+                codes for other, codes in own_categories.items()
+                if keyword.startswith(other)
+            ))
+            for keyword in own_categories
+        }
+        alternatives = sorted(self.categories, key=lambda keyword: (-len(keyword), keyword))
+        self.pattern = re.compile(
+            '(?=(' + '|'.join(map(re.escape, alternatives)) + '))'
+        ) if alternatives else None
+    
+    def classify(self, interests_lower):
+        """Return the frozenset of category codes matched by lowercased interests."""
+        if not interests_lower or self.pattern is None:
+            return frozenset()
+        matched = set()
+        for match in self.pattern.finditer(interests_lower):
+            matched |= self.categories[match.group(1)]
+        return frozenset(matched)
+
+
+@lru_cache(maxsize=1)
+def get_interest_classifier():
+    """Return the (cached) InterestClassifier for the current keywords."""
+    return InterestClassifier(get_category_keywords())
+
+
+@lru_cache(maxsize=65536)
+def classify_interests(interests_lower):
+    """
+    Get the category codes matched by lowercased interests text.
+    Cached per text.
+    
+    Returns:
+        Frozenset of Opportunity category codes
+    """
+    return get_interest_classifier().classify(interests_lower)
+
+
+def clear_caches():
+    """Drop the compiled classifier and cached classifications."""
+    for cached in (get_interest_classifier, classify_interests):
+        cached.cache_clear()
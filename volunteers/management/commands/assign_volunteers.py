@@ -0,0 +1,102 @@
+import csv
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from volunteers.assignment import (
+    DEFAULT_CANDIDATES_PER_VOLUNTEER,
+    DEFAULT_EPSILON,
+    suggest_placements,
+)
+from volunteers.batch_matching import DEFAULT_CHUNK_SIZE
+
+
+FIELDNAMES = [
+    'volunteer_id', 'volunteer', 'opportunity_id', 'opportunity',
+    'hours_per_week', 'score', 'round',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Suggest volunteer placements for the open opportunities, respecting '
+        'each opportunity\'s volunteers_needed and each volunteer\'s weekly hours.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-placements', type=int, default=1,
+            help='Maximum new placements per volunteer (default: 1)'
+        )
+        parser.add_argument(
+            '--candidates', type=int, default=DEFAULT_CANDIDATES_PER_VOLUNTEER,
+            help=f'Candidate opportunities kept per volunteer (default: {DEFAULT_CANDIDATES_PER_VOLUNTEER})'
+        )
+        parser.add_argument(
+            '--epsilon', type=float, default=DEFAULT_EPSILON,
+            help=f'Auction bid increment; smaller is closer to optimal but slower (default: {DEFAULT_EPSILON})'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'Volunteers scored per batch (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--format', choices=['csv', 'json'], default='csv',
+            help='Output format (default: csv)'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write placements to (default: standard output)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['max_placements'] < 1 or options['candidates'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--max-placements, --candidates and --chunk-size must be at least 1.')
+        if options['epsilon'] <= 0:
+            raise CommandError('--epsilon must be positive.')
+        
+        started = time.perf_counter()
+        placements = suggest_placements(
+            max_placements=options['max_placements'],
+            per_volunteer=options['candidates'],
+            epsilon=options['epsilon'],
+            chunk_size=options['chunk_size'],
+        )
+        elapsed = time.perf_counter() - started
+        
+        rows = [
+            {
+                'volunteer_id': placement['profile'].user_id,
+                'volunteer': placement['profile'].user.username,
+                'opportunity_id': placement['opportunity'].id,
+                'opportunity': placement['opportunity'].title,
+                'hours_per_week': placement['opportunity'].min_hours_per_week,
+                'score': round(placement['score'], 2),
+                'round': placement['round'],
+            }
+            for placement in placements
+        ]
+        
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                self.write_rows(rows, output, options['format'])
+            summary = self.stdout
+        else:
+            self.write_rows(rows, self.stdout, options['format'])
+            # Keep standard output parseable
+            summary = self.stderr
+        
+        summary.write(
+            f'Suggested {len(rows)} placements for '
+            f'{len({row["volunteer_id"] for row in rows})} volunteers, total score '
+            f'{sum(placement["score"] for placement in placements):.2f}, in {elapsed:.1f}s.',
+            style_func=self.style.SUCCESS
+        )
+    
+    def write_rows(self, rows, output, output_format):
+        """Write placement rows as CSV or a JSON array."""
+        if output_format == 'json':
+            output.write(json.dumps(rows, indent=2) + '\n')
+            return
+        writer = csv.DictWriter(output, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
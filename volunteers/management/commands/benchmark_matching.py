@@ -0,0 +1,98 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from volunteers.benchmarking import (
+    DEFAULT_PAIRS,
+    DEFAULT_SEED,
+    DEFAULT_TOLERANCE,
+    DEFAULT_VOLUNTEERS,
+    SCALES,
+    compare_reports,
+    run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the matching engine on deterministic synthetic data and write '
+        'a JSON report, optionally comparing it with an earlier report.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', nargs='+', choices=list(SCALES), default=list(SCALES),
+            help='Dataset sizes to run (default: all)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=DEFAULT_SEED,
+            help=f'Random seed for the synthetic data (default: {DEFAULT_SEED})'
+        )
+        parser.add_argument(
+            '--pairs', type=int, default=DEFAULT_PAIRS,
+            help=f'Pairs timed for each per-pair function (default: {DEFAULT_PAIRS})'
+        )
+        parser.add_argument(
+            '--volunteers', type=int, default=DEFAULT_VOLUNTEERS,
+            help=f'Volunteers timed for get_recommended_opportunities (default: {DEFAULT_VOLUNTEERS})'
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write the JSON report to (default: standard output)'
+        )
+        parser.add_argument(
+            '--compare', metavar='BASELINE',
+            help='Earlier JSON report to compare against; regressions fail the command'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help=f'Relative increase allowed before a metric is a regression (default: {DEFAULT_TOLERANCE})'
+        )
+    
+    def handle(self, *args, **options):
+        if options['pairs'] < 1 or options['volunteers'] < 1:
+            raise CommandError('--pairs and --volunteers must be at least 1.')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline report: {e}')
+        
+        # Benchmark on a throwaway database so real rows never skew the numbers
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = run_benchmarks(
+                scales=options['scales'],
+                seed=options['seed'],
+                pairs=options['pairs'],
+                volunteers=options['volunteers'],
+                progress=lambda scale: self.stderr.write(f'Running {scale} scale...'),
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        
+        output = json.dumps(report, indent=2) + '\n'
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        else:
+            self.stdout.write(output, ending='')
+        
+        if baseline is not None:
+            self.report_comparison(compare_reports(baseline, report, options['tolerance']))
+    
+    def report_comparison(self, rows):
+        """Print the comparison table and fail on regressions."""
+        for row in rows:
+            change = 'n/a' if row['change'] is None else f'{row["change"]:+.1%}'
+            line = (
+                f'{row["scale"]:>5} {row["benchmark"]:<30} {row["metric"]:<17} '
+                f'{row["baseline"]:>12} -> {row["current"]:>12} ({change})'
+            )
+            self.stderr.write(line, style_func=self.style.ERROR if row['regression'] else None)
+        
+        regressions = [row for row in rows if row['regression']]
+        if regressions:
+            raise CommandError(f'{len(regressions)} metrics regressed beyond the tolerance.')
+        self.stderr.write('No regressions.', style_func=self.style.SUCCESS)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from volunteers.indexing import (
+    rebuild_skill_index,
+    rebuild_volunteer_index,
+    refresh_normalized_fields,
+)
+from volunteers.models import OpportunitySkillToken, VolunteerMatchToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh normalized skill/interest columns and availability bitmasks, rebuild the opportunity skill '
+        'index and the volunteer reverse index used by the matching engine.'
+    )
+    
+    def handle(self, *args, **options):
+        refresh_normalized_fields()
+        rebuild_skill_index()
+        rebuild_volunteer_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {OpportunitySkillToken.objects.count()} opportunity skill tokens '
+            f'and {VolunteerMatchToken.objects.count()} volunteer tokens.'
+        ))
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from volunteers.snapshots import DEFAULT_CHUNK_SIZE, refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the recommendation snapshots read by the recommended page, '
+        'for active volunteers whose profile or commitments changed since the last run.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes; 0 ranks in this process (default: one per CPU)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'Volunteers ranked per worker task (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Recommendations kept per volunteer (default: RECOMMENDATION_CACHE_SIZE)'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every active volunteer, not only changed ones'
+        )
+    
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 0:
+            raise CommandError('--workers must not be negative.')
+        if options['chunk_size'] < 1 or (options['limit'] is not None and options['limit'] < 1):
+            raise CommandError('--chunk-size and --limit must be at least 1.')
+        
+        started = time.perf_counter()
+        refreshed = refresh_snapshots(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            limit=options['limit'],
+            full=options['full'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed recommendation snapshots for {refreshed} volunteers '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
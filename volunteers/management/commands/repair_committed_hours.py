@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from volunteers.scheduling import reconcile_committed_hours
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute volunteers\' committed weekly hours counters from their accepted '
+        'applications and repair any that drifted (e.g. after bulk updates or raw SQL).'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Profiles locked and checked per transaction (default: 1000)'
+        )
+    
+    def handle(self, *args, **options):
+        repaired = reconcile_committed_hours(batch_size=options['batch_size'])
+        for user_id, stored, actual in repaired:
+            self.stdout.write(f'User {user_id}: {stored}h -> {actual}h')
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {len(repaired)} committed hours counters.'
+        ))
@@ -2,40 +2,109 @@
 Volunteer matching engine - matches volunteers to opportunities based on:
 - Skills overlap
 - Interests match
-- Availability compatibility
+- Availability compatibility (weekly hours, see check_availability_overlap)
 - Location/remote preference
 - Current workload
 """
-from opportunities.models import Opportunity
-from .scheduling import check_hours_limit
+import heapq
+import re
+from operator import itemgetter
+from django.conf import settings
+from django.db.models import Q
+from opportunities.models import Opportunity, encode_weekly_slots, normalize_skill_list
+from .fuzzy import get_fuzzy_skill_matches
+from .interests import classify_interests
+from .models import OpportunitySkillToken
+from .scheduling import check_hours_limit_committed, get_commitment_calendar
+
+
+# Index tokens are truncated to the column width. A truncated token is a prefix
+# of the real one, so substring checks against it can only widen the candidates.
+SKILL_TOKEN_MAX_LENGTH = 255
+
+# Columns needed to score an opportunity; full objects are only loaded for the winners
+SCORING_FIELDS = (
+    'id', 'skill_tokens', 'category', 'min_hours_per_week',
+    'start_date', 'end_date', 'is_remote', 'session_slots',
+)
+
+# Rows fetched per database round trip while streaming candidates
+STREAM_CHUNK_SIZE = 2000
+
+WORD_PATTERN = re.compile(r'\w+')
+
+RECOMMENDATION_MODES = ('keywords', 'tfidf')
+
+
+def tokenize_skills(skills_text):
+    """
+    Split a skills field into normalized tokens, the same way
+    calculate_skills_overlap does. Empty tokens are dropped.
+    """
+    return [token for token in normalize_skill_list(skills_text) if token]
+
+
+def get_volunteer_skill_tokens(skills_text, max_words=3):
+    """
+    Return the reverse index tokens for a volunteer's skills: each normalized
+    comma-separated token plus every run of up to max_words consecutive words
+    in it, so a required skill like "first aid" is found inside free text such
+    as "certified first aid trainer", and its whitespace-separated words (the
+    tokens fuzzy matching compares, see fuzzy.get_query_tokens). Tokens are
+    truncated to the column width.
+    """
+    tokens = set()
+    for token in tokenize_skills(skills_text):
+        tokens.add(token)
+        tokens.update(token.split())
+        words = WORD_PATTERN.findall(token)
+        for size in range(1, max_words + 1):
+            for start in range(len(words) - size + 1):
+                tokens.add(' '.join(words[start:start + size]))
+    return {token[:SKILL_TOKEN_MAX_LENGTH] for token in tokens}
 
 
 def calculate_skills_overlap(volunteer_skills, required_skills):
     """
     Calculate skills overlap score (0-1).
-    Simple keyword matching approach.
+    Keyword matching, plus fuzzy matching when SKILL_FUZZY_MATCHING is on.
     """
     if not volunteer_skills or not required_skills:
         return 0.0
     
-    # Normalize to lowercase and split
-    volunteer_skill_list = [s.strip().lower() for s in volunteer_skills.split(',')]
-    required_skill_list = [s.strip().lower() for s in required_skills.split(',')]
+    volunteer_tokens = normalize_skill_list(volunteer_skills)
+    required_tokens = normalize_skill_list(required_skills)
+    return calculate_token_overlap(
+        volunteer_tokens,
+        volunteer_skills.lower(),
+        required_tokens,
+        get_fuzzy_skill_matches(volunteer_tokens, required_tokens)
+    )
+
+
+def calculate_token_overlap(volunteer_tokens, volunteer_text, required_tokens, fuzzy_matches=()):
+    """
+    Skills overlap score (0-1) from pre-normalized data, as stored in the
+    skill_tokens and skills_normalized columns.
     
-    # Also check for skills in free text format
-    volunteer_skills_text = volunteer_skills.lower()
-    required_skills_text = required_skills.lower()
+    Args:
+        volunteer_tokens: Normalized volunteer skill tokens
+        volunteer_text: Lowercased volunteer skills text
+        required_tokens: Normalized required skill tokens
+        fuzzy_matches: Required tokens the volunteer matches fuzzily
+            (see volunteers.fuzzy), computed once per volunteer
+    """
+    if not volunteer_text or not required_tokens:
+        return 0.0
     
-    # Count matches
+    # A required skill matches a listed skill, appears in the free text,
+    # or is similar enough to one of the volunteer's skills
     matches = 0
-    total_required = len(required_skill_list) if required_skill_list else 1
-    
-    for req_skill in required_skill_list:
-        if req_skill in volunteer_skill_list or req_skill in volunteer_skills_text:
+    for req_skill in required_tokens:
+        if req_skill in volunteer_tokens or req_skill in volunteer_text or req_skill in fuzzy_matches:
             matches += 1
     
-    # Return ratio (0-1)
-    return min(matches / total_required, 1.0) if total_required > 0 else 0.0
+    return min(matches / len(required_tokens), 1.0)
 
 
 def check_interests_match(volunteer_interests, opportunity_category):
@@ -46,38 +115,55 @@ def check_interests_match(volunteer_interests, opportunity_category):
     if not volunteer_interests:
         return 0.0
     
-    interests_lower = volunteer_interests.lower()
-    category_lower = opportunity_category.lower()
-    
-    # Direct category match
-    if category_lower in interests_lower:
-        return 1.0
+    return 1.0 if opportunity_category in classify_interests(volunteer_interests.lower()) else 0.0
+
+
+def check_normalized_interests_match(interests_lower, opportunity_category):
+    """
+    check_interests_match for lowercased interests, as stored in the
+    interests_normalized column. The interests are classified once (see
+    volunteers.interests); later calls for the same text are a set lookup.
+    """
+    if not interests_lower:
+        return 0.0
     
-    # Keyword matching for common categories
-    category_keywords = {
-        'education': ['education', 'teaching', 'learning', 'tutoring'],
-        'healthcare': ['health', 'medical', 'care', 'wellness'],
-        'environment': ['environment', 'green', 'sustainability', 'climate'],
-        'community': ['community', 'social', 'service', 'help'],
-        'animals': ['animal', 'pet', 'wildlife', 'veterinary'],
-        'arts': ['art', 'culture', 'creative', 'music', 'theater'],
-        'sports': ['sport', 'fitness', 'exercise', 'athletic'],
-        'technology': ['tech', 'computer', 'programming', 'digital'],
-    }
+    return 1.0 if opportunity_category in classify_interests(interests_lower) else 0.0
+
+
+def get_schedule_overlap(volunteer_slots, session_slots):
+    """
+    Share of an opportunity's weekly session hours a volunteer is available
+    for: popcount(volunteer & sessions) / popcount(sessions), per day.
     
-    keywords = category_keywords.get(category_lower, [])
-    for keyword in keywords:
-        if keyword in interests_lower:
-            return 1.0
+    Args:
+        volunteer_slots: Volunteer's day bitmasks (availability_slots)
+        session_slots: Opportunity's day bitmasks (session_slots)
     
-    return 0.0
+    Returns:
+        Overlap (0-1), or None if the opportunity has no sessions
+    """
+    session_hours = sum(day.bit_count() for day in session_slots)
+    if not session_hours:
+        return None
+    covered = sum(
+        (available & session).bit_count()
+        for available, session in zip(volunteer_slots, session_slots)
+    )
+    return covered / session_hours
 
 
-def check_availability_overlap(volunteer_availability, opportunity):
+def check_availability_overlap(volunteer_availability, opportunity, volunteer_slots=None):
     """
-    Check if volunteer availability overlaps with opportunity dates.
-    Returns 1.0 if compatible, 0.0 otherwise.
-    Simple date range check for now.
+    Check if volunteer availability overlaps with the opportunity.
+    Returns 0.0 once the opportunity has ended. Otherwise, for an opportunity
+    with weekly sessions, the share of session hours the volunteer is
+    available for (0-1); without sessions, 1.0.
+    
+    Args:
+        volunteer_availability: Volunteer's availability dict
+        opportunity: Opportunity instance or row with SCORING_FIELDS
+        volunteer_slots: Optional encoded availability (availability_slots);
+            encoded from volunteer_availability when needed if omitted
     """
     if not volunteer_availability:
         return 0.5  # Neutral score if no availability specified
@@ -86,15 +172,18 @@ def check_availability_overlap(volunteer_availability, opportunity):
     from django.utils import timezone
     today = timezone.now().date()
     
-    if opportunity.start_date > today:
-        # Opportunity is in the future, assume compatible if volunteer has availability set
-        return 1.0
+    if opportunity.start_date <= today and opportunity.end_date < today:
+        # Opportunity has already ended
+        return 0.0
     
-    # If opportunity has already started, check if it's still active
-    if opportunity.end_date >= today:
+    session_slots = opportunity.session_slots
+    if not any(session_slots):
+        # No fixed sessions, assume compatible if volunteer has availability set
         return 1.0
     
-    return 0.0
+    if volunteer_slots is None:
+        volunteer_slots = encode_weekly_slots(volunteer_availability)
+    return get_schedule_overlap(volunteer_slots, session_slots)
 
 
 def check_location_preference(volunteer_profile, opportunity):
@@ -115,69 +204,189 @@ def check_location_preference(volunteer_profile, opportunity):
     return 0.5
 
 
-def get_recommended_opportunities(volunteer_profile, limit=10):
+def get_interest_categories(volunteer_interests):
+    """Return the opportunity category codes matched by a volunteer's interests."""
+    categories = classify_interests((volunteer_interests or '').lower())
+    return [code for code, _ in Opportunity.CATEGORY_CHOICES if code in categories]
+
+
+def get_matched_skill_tokens(volunteer_tokens, volunteer_text, vocabulary):
+    """
+    Return the index tokens a volunteer's normalized skills would match.
+    Uses the same exact-or-substring test as calculate_token_overlap.
+    """
+    if not volunteer_text:
+        return []
+    return [
+        token for token in vocabulary
+        if token in volunteer_tokens or token in volunteer_text
+    ]
+
+
+def get_matching_terms(volunteer_profile):
+    """
+    Get the index tokens and interest categories a volunteer profile matches.
+    Skill tokens matched fuzzily are included.
+    
+    Returns:
+        Tuple: (matched_tokens: list, categories: list)
+    """
+    vocabulary = list(OpportunitySkillToken.objects.values_list('token', flat=True).distinct())
+    matched_tokens = get_matched_skill_tokens(
+        volunteer_profile.skill_tokens,
+        volunteer_profile.skills_normalized,
+        vocabulary
+    )
+    fuzzy_matches = get_fuzzy_skill_matches(volunteer_profile.skill_tokens, vocabulary)
+    matched_tokens.extend(fuzzy_matches.difference(matched_tokens))
+    categories = get_interest_categories(volunteer_profile.interests_normalized)
+    return matched_tokens, categories
+
+
+def get_candidate_opportunities(volunteer_profile, terms=None):
+    """
+    Get open opportunities sharing at least one skill token, or an interest
+    category, with the volunteer's profile, using the skill inverted index.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        terms: Optional precomputed result of get_matching_terms
+    """
+    matched_tokens, categories = terms or get_matching_terms(volunteer_profile)
+    
+    if not matched_tokens and not categories:
+        return Opportunity.objects.none()
+    
+    indexed_ids = OpportunitySkillToken.objects.filter(
+        token__in=matched_tokens
+    ).values('opportunity_id')
+    
+    return Opportunity.objects.filter(status='OPEN').filter(
+        Q(id__in=indexed_ids) | Q(category__in=categories)
+    )
+
+
+def score_opportunity(volunteer_profile, opp, calendar, matched_tokens=()):
+    """
+    Score one opportunity (instance or row with SCORING_FIELDS) for a volunteer.
+    Skills and interests are compared using the stored normalized columns.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        opp: Opportunity instance or row
+        calendar: Volunteer's CommitmentCalendar of accepted commitments
+        matched_tokens: Optional set of skill tokens the volunteer matches,
+            including fuzzy matches (from get_matching_terms)
+    
+    Returns:
+        Match score, or None if the opportunity would exceed the hours limit
+    """
+    score = 0.0
+    
+    # Skills match (0-40 points)
+    skills_match = calculate_token_overlap(
+        volunteer_profile.skill_tokens,
+        volunteer_profile.skills_normalized,
+        opp.skill_tokens,
+        matched_tokens
+    )
+    score += skills_match * 40
+    
+    # Interests match (0-20 points)
+    interests_match = check_normalized_interests_match(
+        volunteer_profile.interests_normalized,
+        opp.category
+    )
+    score += interests_match * 20
+    
+    # Availability compatibility (0-20 points)
+    avail_match = check_availability_overlap(
+        volunteer_profile.availability,
+        opp,
+        volunteer_profile.availability_slots
+    )
+    score += avail_match * 20
+    
+    # Location/remote preference (0-10 points)
+    location_match = check_location_preference(volunteer_profile, opp)
+    score += location_match * 10
+    
+    # Workload check - disqualify if would exceed limit
+    can_apply, current_hours, would_be_hours = check_hours_limit_committed(
+        volunteer_profile,
+        opp,
+        calendar.peak_load(opp.start_date, opp.end_date)
+    )
+    if not can_apply:
+        return None
+    
+    # Workload bonus (0-10 points) - prefer opportunities that fit well
+    if current_hours + opp.min_hours_per_week <= volunteer_profile.max_hours_per_week:
+        workload_score = 10.0
+    else:
+        workload_score = 5.0  # Partial fit
+    score += workload_score
+    
+    return score
+
+
+def get_recommendation_mode():
+    """Return the configured recommender, one of RECOMMENDATION_MODES."""
+    return getattr(settings, 'RECOMMENDATION_MODE', 'keywords')
+
+
+def get_recommended_opportunities(volunteer_profile, limit=10, terms=None, calendar=None,
+                                  mode=None):
     """
     Get ranked list of recommended opportunities for a volunteer.
     
+    Candidates are streamed as lightweight rows through a bounded heap of
+    size limit; full Opportunity objects are only loaded for the winners.
+    
     Args:
         volunteer_profile: VolunteerProfile instance
         limit: Maximum number of opportunities to return
+        terms: Optional precomputed result of get_matching_terms
+        calendar: Optional precomputed CommitmentCalendar
+        mode: 'keywords' or 'tfidf' (default: RECOMMENDATION_MODE); 'tfidf'
+            ranks by text similarity instead (see volunteers.similarity)
     
     Returns:
         List of tuples (Opportunity, match_score)
     """
-    # Get all open opportunities
-    opportunities = Opportunity.objects.filter(status='OPEN')
-    
-    scored_opportunities = []
-    
-    for opp in opportunities:
-        score = 0.0
-        
-        # Skills match (0-40 points)
-        skills_match = calculate_skills_overlap(
-            volunteer_profile.skills,
-            opp.required_skills
-        )
-        score += skills_match * 40
-        
-        # Interests match (0-20 points)
-        interests_match = check_interests_match(
-            volunteer_profile.interests,
-            opp.category
-        )
-        score += interests_match * 20
-        
-        # Availability compatibility (0-20 points)
-        avail_match = check_availability_overlap(
-            volunteer_profile.availability,
-            opp
-        )
-        score += avail_match * 20
-        
-        # Location/remote preference (0-10 points)
-        location_match = check_location_preference(volunteer_profile, opp)
-        score += location_match * 10
-        
-        # Workload check - disqualify if would exceed limit
-        can_apply, current_hours, would_be_hours = check_hours_limit(
-            volunteer_profile.user,
-            opp
-        )
-        if not can_apply:
-            continue  # Skip if would exceed limit
-        
-        # Workload bonus (0-10 points) - prefer opportunities that fit well
-        if current_hours + opp.min_hours_per_week <= volunteer_profile.max_hours_per_week:
-            workload_score = 10.0
-        else:
-            workload_score = 5.0  # Partial fit
-        score += workload_score
-        
-        scored_opportunities.append((opp, score))
-    
-    # Sort by score (descending) and return top results
-    scored_opportunities.sort(key=lambda x: x[1], reverse=True)
-    
-    return scored_opportunities[:limit]
-
+    # Commitments are loaded once and checked against every candidate's dates
+    if calendar is None:
+        calendar = get_commitment_calendar(volunteer_profile.user_id)
+    
+    mode = mode or get_recommendation_mode()
+    if mode not in RECOMMENDATION_MODES:
+        raise ValueError(f'Unknown recommendation mode: {mode!r}')
+    if mode == 'tfidf':
+        from .similarity import get_similar_opportunities
+        return get_similar_opportunities(volunteer_profile, limit, calendar)
+    
+    terms = terms or get_matching_terms(volunteer_profile)
+    matched_tokens = set(terms[0])
+    
+    # Only score open opportunities sharing a skill token or interest category
+    rows = get_candidate_opportunities(volunteer_profile, terms).values_list(
+        *SCORING_FIELDS, named=True
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    
+    def scored_rows():
+        for row in rows:
+            score = score_opportunity(volunteer_profile, row, calendar, matched_tokens)
+            if score is not None:
+                yield (row.id, score)
+    
+    # nlargest is stable, matching a full sort by score (descending)
+    top = heapq.nlargest(limit, scored_rows(), key=itemgetter(1))
+    
+    opportunities = Opportunity.objects.select_related('organisation').in_bulk(
+        [opportunity_id for opportunity_id, _ in top]
+    )
+    return [
+        (opportunities[opportunity_id], score)
+        for opportunity_id, score in top
+        if opportunity_id in opportunities
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_skill_index(apps, schema_editor):
+    Opportunity = apps.get_model('opportunities', 'Opportunity')
+    OpportunitySkillToken = apps.get_model('volunteers', 'OpportunitySkillToken')
+    
+    entries = []
+    for opportunity in Opportunity.objects.filter(status='OPEN').only('id', 'required_skills'):
+        tokens = {
+            s.strip().lower()[:255]
+            for s in (opportunity.required_skills or '').split(',')
+            if s.strip()
+        }
+        entries.extend(
+            OpportunitySkillToken(token=token, opportunity_id=opportunity.id)
+            for token in tokens
+        )
+    OpportunitySkillToken.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0001_initial'),
+        ('volunteers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='volunteerprofile',
+            name='interests',
+            field=models.TextField(help_text='Interests, course, and department (comma-separated or free text)'),
+        ),
+        migrations.CreateModel(
+            name='OpportunitySkillToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(help_text='Normalized (lowercased, stripped) required skill token', max_length=255)),
+                ('opportunity', models.ForeignKey(help_text='Open opportunity requiring this skill', on_delete=django.db.models.deletion.CASCADE, related_name='skill_index_entries', to='opportunities.opportunity')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token'], name='volunteers__token_4031fb_idx')],
+                'unique_together': {('token', 'opportunity')},
+            },
+        ),
+        migrations.RunPython(build_skill_index, migrations.RunPython.noop),
+    ]
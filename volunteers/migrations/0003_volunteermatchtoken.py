@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:22
+
+import re
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of the tokenizing in volunteers.matching and volunteers.interests
+# as of this migration, so later changes to them cannot alter it. Keywords a
+# deployment adds in INTEREST_CATEGORY_KEYWORDS are left to rebuild_skill_index.
+WORD_PATTERN = re.compile(r'\w+')
+
+CATEGORY_KEYWORDS = {
+    'education': ['education', 'teaching', 'learning', 'tutoring'],
+    'healthcare': ['health', 'medical', 'care', 'wellness'],
+    'environment': ['environment', 'green', 'sustainability', 'climate'],
+    'community': ['community', 'social', 'service', 'help'],
+    'animals': ['animal', 'pet', 'wildlife', 'veterinary'],
+    'arts': ['art', 'culture', 'creative', 'music', 'theater'],
+    'sports': ['sport', 'fitness', 'exercise', 'athletic'],
+    'technology': ['tech', 'computer', 'programming', 'digital'],
+}
+
+
+def get_volunteer_skill_tokens(skills_text, max_words=3):
+    tokens = set()
+    for token in (s.strip().lower() for s in (skills_text or '').split(',')):
+        if not token:
+            continue
+        tokens.add(token)
+        words = WORD_PATTERN.findall(token)
+        for size in range(1, max_words + 1):
+            for start in range(len(words) - size + 1):
+                tokens.add(' '.join(words[start:start + size]))
+    return {token[:255] for token in tokens}
+
+
+def get_interest_categories(interests, category_codes):
+    interests = (interests or '').lower()
+    if not interests:
+        return []
+    categories = []
+    for code in category_codes:
+        category = code.lower()
+        words = [category, *CATEGORY_KEYWORDS.get(category, [])]
+        if any(word.strip().lower() in interests for word in words if word.strip()):
+            categories.append(code)
+    return categories
+
+
+def build_volunteer_index(apps, schema_editor):
+    Opportunity = apps.get_model('opportunities', 'Opportunity')
+    VolunteerProfile = apps.get_model('volunteers', 'VolunteerProfile')
+    VolunteerMatchToken = apps.get_model('volunteers', 'VolunteerMatchToken')
+    
+    category_codes = [code for code, _ in Opportunity._meta.get_field('category').choices]
+    entries = []
+    for profile in VolunteerProfile.objects.only('id', 'skills', 'interests').iterator():
+        entries.extend(
+            VolunteerMatchToken(profile_id=profile.id, kind='SKILL', token=token)
+            for token in get_volunteer_skill_tokens(profile.skills)
+        )
+        entries.extend(
+            VolunteerMatchToken(profile_id=profile.id, kind='CATEGORY', token=category)
+            for category in get_interest_categories(profile.interests, category_codes)
+        )
+    VolunteerMatchToken.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0002_opportunityskilltoken'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='VolunteerMatchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SKILL', 'Skill'), ('CATEGORY', 'Interest category')], help_text='Whether the token is a skill or an opportunity category code', max_length=10)),
+                ('token', models.CharField(help_text='Normalized skill token or word sequence, or matched category code', max_length=255)),
+                ('profile', models.ForeignKey(help_text='Volunteer profile with this skill or interest', on_delete=django.db.models.deletion.CASCADE, related_name='match_tokens', to='volunteers.volunteerprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'token'], name='volunteers__kind_2f6330_idx')],
+                'unique_together': {('kind', 'token', 'profile')},
+            },
+        ),
+        migrations.RunPython(build_volunteer_index, migrations.RunPython.noop),
+    ]
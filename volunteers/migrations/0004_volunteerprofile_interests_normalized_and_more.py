@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:38
+
+import opportunities.models
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+
+def normalize_skill_list(text):
+    # Frozen copy of opportunities.models.normalize_skill_list as of this migration
+    if not text:
+        return []
+    return [s.strip().lower() for s in text.split(',')]
+
+
+def backfill_normalized_fields(apps, schema_editor):
+    VolunteerProfile = apps.get_model('volunteers', 'VolunteerProfile')
+    
+    last_id = 0
+    while True:
+        batch = list(
+            VolunteerProfile.objects.filter(id__gt=last_id).order_by('id').only('id', 'skills', 'interests')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for profile in batch:
+            profile.skill_tokens = normalize_skill_list(profile.skills)
+            profile.skills_normalized = (profile.skills or '').lower()
+            profile.interests_normalized = (profile.interests or '').lower()
+        VolunteerProfile.objects.bulk_update(
+            batch, ['skill_tokens', 'skills_normalized', 'interests_normalized']
+        )
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0003_volunteermatchtoken'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='interests_normalized',
+            field=opportunities.models.NormalizedTextField(blank=True, default='', editable=False, help_text='Lowercased interests text (maintained on save)', source='interests'),
+        ),
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='skill_tokens',
+            field=opportunities.models.NormalizedTokensField(blank=True, default=list, editable=False, help_text='Normalized skill tokens (maintained on save)', source='skills'),
+        ),
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='skills_normalized',
+            field=opportunities.models.NormalizedTextField(blank=True, default='', editable=False, help_text='Lowercased skills text (maintained on save)', source='skills'),
+        ),
+        migrations.RunPython(backfill_normalized_fields, migrations.RunPython.noop),
+    ]
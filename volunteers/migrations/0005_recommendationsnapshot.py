@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0004_volunteerprofile_interests_normalized_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.JSONField(default=list, help_text='Ranked [opportunity id, match score] pairs')),
+                ('size', models.PositiveIntegerField(help_text='Number of recommendations requested when the ranking was computed')),
+                ('computed_at', models.DateTimeField(help_text='Start of the refresh run that computed the ranking')),
+                ('invalidated_at', models.DateTimeField(blank=True, help_text='Last time the profile or commitments changed; stale if not before computed_at', null=True)),
+                ('profile', models.OneToOneField(help_text='Volunteer profile the ranking was computed for', on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_snapshot', to='volunteers.volunteerprofile')),
+            ],
+        ),
+    ]
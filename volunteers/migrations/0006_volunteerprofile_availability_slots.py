@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:50
+
+import re
+import opportunities.models
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+# Frozen copy of the schedule encoding in opportunities.models as of this
+# migration, so later changes to it cannot alter it
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+SLOTS_PER_DAY = 24
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+DAY_PERIODS = {
+    'morning': (8, 12),
+    'afternoon': (12, 17),
+    'evening': (17, 21),
+    'night': (21, 24),
+}
+TIME_RANGE_PATTERN = re.compile(
+    r'(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\s*(?:-|–|to)\s*(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?'
+)
+
+
+def _to_hour(hour, minutes, meridiem, round_up):
+    hour = int(hour)
+    if meridiem == 'pm' and hour < 12:
+        hour += 12
+    elif meridiem == 'am' and hour == 12:
+        hour = 0
+    if round_up and minutes and int(minutes):
+        hour += 1
+    return min(hour, SLOTS_PER_DAY)
+
+
+def _range_hours(match):
+    start_hour, start_minutes, start_meridiem, end_hour, end_minutes, end_meridiem = match.groups()
+    start = _to_hour(start_hour, start_minutes, start_meridiem, round_up=False)
+    end = _to_hour(end_hour, end_minutes, end_meridiem, round_up=True)
+    if end_meridiem and not start_meridiem:
+        shared = _to_hour(start_hour, start_minutes, end_meridiem, round_up=False)
+        if shared <= end:
+            start = shared
+    elif not end_meridiem and int(end_hour) < start <= 12:
+        end = _to_hour(end_hour, end_minutes, 'pm', round_up=True)
+    return start, end
+
+
+def get_hour_range_mask(start, end):
+    if end < start:
+        return get_hour_range_mask(start, SLOTS_PER_DAY) | get_hour_range_mask(0, end)
+    return ((1 << end) - 1) & ~((1 << start) - 1)
+
+
+def parse_day_slots(text):
+    if isinstance(text, (list, tuple)):
+        text = ', '.join(map(str, text))
+    text = str(text or '').lower()
+    mask = 0
+    for period, (start, end) in DAY_PERIODS.items():
+        if period in text:
+            mask |= get_hour_range_mask(start, end)
+    for match in TIME_RANGE_PATTERN.finditer(text):
+        mask |= get_hour_range_mask(*_range_hours(match))
+    return mask or FULL_DAY
+
+
+def encode_weekly_slots(schedule):
+    slots = [0] * len(WEEKDAYS)
+    if not isinstance(schedule, dict):
+        return slots
+    for day, text in schedule.items():
+        prefix = str(day).strip().lower()[:3]
+        for k, weekday in enumerate(WEEKDAYS):
+            if len(prefix) == 3 and weekday.startswith(prefix):
+                slots[k] |= parse_day_slots(text)
+    return slots
+
+
+def backfill_availability_slots(apps, schema_editor):
+    VolunteerProfile = apps.get_model('volunteers', 'VolunteerProfile')
+    
+    last_id = 0
+    while True:
+        batch = list(
+            VolunteerProfile.objects.filter(id__gt=last_id).order_by('id').only('id', 'availability')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for profile in batch:
+            profile.availability_slots = encode_weekly_slots(profile.availability)
+        VolunteerProfile.objects.bulk_update(batch, ['availability_slots'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0005_recommendationsnapshot'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='availability_slots',
+            field=opportunities.models.WeeklySlotsField(blank=True, default=opportunities.models.empty_weekly_slots, editable=False, help_text='Weekly available hours bitmask (maintained on save)', source='availability'),
+        ),
+        migrations.RunPython(backfill_availability_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:54
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_committed_hours(apps, schema_editor):
+    Application = apps.get_model('opportunities', 'Application')
+    VolunteerProfile = apps.get_model('volunteers', 'VolunteerProfile')
+    
+    accepted_hours = Application.objects.filter(
+        volunteer_id=OuterRef('user_id'),
+        status='ACCEPTED'
+    ).order_by().values('volunteer_id').annotate(
+        total=Sum('opportunity__min_hours_per_week')
+    ).values('total')
+    VolunteerProfile.objects.update(
+        committed_hours_per_week=Coalesce(Subquery(accepted_hours), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opportunities', '0005_opportunity_session_slots_opportunity_sessions'),
+        ('volunteers', '0006_volunteerprofile_availability_slots'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='volunteerprofile',
+            name='committed_hours_per_week',
+            field=models.IntegerField(default=0, editable=False, help_text='Weekly hours of accepted applications (maintained by signals, see volunteers.scheduling)'),
+        ),
+        migrations.RunPython(backfill_committed_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0007_volunteerprofile_committed_hours_per_week'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Version key', max_length=255, unique=True)),
+                ('stamp', models.CharField(help_text='Current stamp, never reused', max_length=32)),
+            ],
+        ),
+    ]
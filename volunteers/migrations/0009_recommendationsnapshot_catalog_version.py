@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0008_versionstamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendationsnapshot',
+            name='catalog_version',
+            field=models.CharField(blank=True, help_text='Catalog stamp when the ranking was computed; stale once the stamp changes', max_length=32),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0009_recommendationsnapshot_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recommendationsnapshot',
+            name='catalog_version',
+        ),
+        migrations.AddField(
+            model_name='recommendationsnapshot',
+            name='versions',
+            field=models.JSONField(default=dict, help_text='Version stamps the ranking depended on when computed; stale once any changes'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('volunteers', '0010_recommendationsnapshot_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='versionstamp',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='When the stamp last changed'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
-from opportunities.models import Opportunity
+from opportunities.models import NormalizedTextField, NormalizedTokensField, Opportunity, WeeklySlotsField
 
 
 class VolunteerProfile(models.Model):
@@ -20,14 +20,35 @@ class VolunteerProfile(models.Model):
         default=dict,
         help_text='Availability schedule (JSON format: days/times)'
     )
+    availability_slots = WeeklySlotsField(
+        source='availability',
+        help_text='Weekly available hours bitmask (maintained on save)'
+    )
     interests = models.TextField(
         help_text='Interests, course, and department (comma-separated or free text)'
     )
+    skill_tokens = NormalizedTokensField(
+        source='skills',
+        help_text='Normalized skill tokens (maintained on save)'
+    )
+    skills_normalized = NormalizedTextField(
+        source='skills',
+        help_text='Lowercased skills text (maintained on save)'
+    )
+    interests_normalized = NormalizedTextField(
+        source='interests',
+        help_text='Lowercased interests text (maintained on save)'
+    )
     max_hours_per_week = models.IntegerField(
         default=10,
         validators=[MinValueValidator(0)],
         help_text='Maximum hours per week the volunteer can commit'
     )
+    committed_hours_per_week = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text='Weekly hours of accepted applications (maintained by signals, see volunteers.scheduling)'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -78,3 +99,109 @@ class ParticipationRecord(models.Model):
     def __str__(self):
         return f"{self.volunteer.username} - {self.opportunity.title} - {self.hours_logged}h on {self.date}"
 
+
+
+class OpportunitySkillToken(models.Model):
+    """Inverted index entry mapping a normalized skill token to an open opportunity."""
+    
+    token = models.CharField(
+        max_length=255,
+        help_text='Normalized (lowercased, stripped) required skill token'
+    )
+    opportunity = models.ForeignKey(
+        Opportunity,
+        on_delete=models.CASCADE,
+        related_name='skill_index_entries',
+        help_text='Open opportunity requiring this skill'
+    )
+    
+    class Meta:
+        unique_together = ['token', 'opportunity']
+        indexes = [
+            models.Index(fields=['token']),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.opportunity_id}"
+
+
+class VolunteerMatchToken(models.Model):
+    """Reverse index entry mapping a skill token or interest category to a volunteer."""
+    
+    KIND_CHOICES = [
+        ('SKILL', 'Skill'),
+        ('CATEGORY', 'Interest category'),
+    ]
+    
+    profile = models.ForeignKey(
+        VolunteerProfile,
+        on_delete=models.CASCADE,
+        related_name='match_tokens',
+        help_text='Volunteer profile with this skill or interest'
+    )
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        help_text='Whether the token is a skill or an opportunity category code'
+    )
+    token = models.CharField(
+        max_length=255,
+        help_text='Normalized skill token or word sequence, or matched category code'
+    )
+    
+    class Meta:
+        unique_together = ['kind', 'token', 'profile']
+        indexes = [
+            models.Index(fields=['kind', 'token']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind}:{self.token} -> {self.profile_id}"
+
+
+class RecommendationSnapshot(models.Model):
+    """Precomputed top-N recommendations for a volunteer (see volunteers.snapshots)."""
+    
+    profile = models.OneToOneField(
+        VolunteerProfile,
+        on_delete=models.CASCADE,
+        related_name='recommendation_snapshot',
+        help_text='Volunteer profile the ranking was computed for'
+    )
+    ranking = models.JSONField(
+        default=list,
+        help_text='Ranked [opportunity id, match score] pairs'
+    )
+    size = models.PositiveIntegerField(
+        help_text='Number of recommendations requested when the ranking was computed'
+    )
+    computed_at = models.DateTimeField(
+        help_text='Start of the refresh run that computed the ranking'
+    )
+    invalidated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Last time the profile or commitments changed; stale if not before computed_at'
+    )
+    versions = models.JSONField(
+        default=dict,
+        help_text='Version stamps the ranking depended on when computed; stale once any changes'
+    )
+    
+    def __str__(self):
+        return f"Recommendations for profile {self.profile_id}"
+
+
+class VersionStamp(models.Model):
+    """
+    Version stamp of something cached recommendations depend on (see
+    volunteers.caching). Kept in the database so every worker process sees
+    the same stamps.
+    """
+    
+    key = models.CharField(max_length=255, unique=True, help_text='Version key')
+    stamp = models.CharField(max_length=32, help_text='Current stamp, never reused')
+    updated_at = models.DateTimeField(auto_now=True, help_text='When the stamp last changed')
+    
+    def __str__(self):
+        return f"{self.key} = {self.stamp}"
@@ -0,0 +1,117 @@
+"""
+Cursor pagination of recommendations.
+
+The first page freezes the volunteer's ranking (opportunity ids and scores,
+RECOMMENDATION_CACHE_SIZE deep). Each page links to the next with an opaque
+signed cursor carrying the rest of the frozen ranking and its offset, so a
+later page is a slice of it plus one query loading its opportunities, any
+process can serve it, and the order can't shift under a volunteer who is
+scrolling. A cursor older than RECOMMENDATION_CURSOR_TIMEOUT seconds is
+reported as expired alongside a fresh first page; an invalid one starts
+again from the first page.
+"""
+from django.conf import settings
+from django.core import signing
+from .caching import get_cached_ranking, hydrate_ranking
+from .snapshots import get_snapshot_ranking
+
+
+DEFAULT_PAGE_SIZE = 20
+
+CURSOR_SALT = 'volunteers.recommendations.cursor'
+
+
+def get_cursor_timeout():
+    return getattr(settings, 'RECOMMENDATION_CURSOR_TIMEOUT', 15 * 60)
+
+
+def make_cursor(ranking, offset, user_id):
+    """Return an opaque cursor for the rest of a frozen ranking, starting at offset."""
+    return signing.dumps(
+        {
+            'ranking': [[int(opportunity_id), float(score)] for opportunity_id, score in ranking],
+            'offset': offset,
+            'user': user_id,
+        },
+        salt=CURSOR_SALT,
+        compress=True
+    )
+
+
+def read_cursor(cursor, user_id):
+    """
+    Decode a cursor issued to a volunteer.
+    
+    Returns:
+        Tuple (ranking, offset), or None if the cursor is invalid or was
+        issued to someone else
+    
+    Raises:
+        signing.SignatureExpired: if the cursor is older than the cursor timeout
+    """
+    try:
+        position = signing.loads(cursor, salt=CURSOR_SALT, max_age=get_cursor_timeout())
+    except signing.SignatureExpired:
+        raise
+    except signing.BadSignature:
+        return None
+    if not isinstance(position, dict) or position.get('user') != user_id:
+        return None
+    ranking, offset = position.get('ranking'), position.get('offset')
+    if not isinstance(offset, int) or offset < 0 or not isinstance(ranking, list):
+        return None
+    if not all(
+        isinstance(entry, list) and len(entry) == 2
+        and isinstance(entry[0], int) and isinstance(entry[1], (int, float))
+        for entry in ranking
+    ):
+        return None
+    return [tuple(entry) for entry in ranking], offset
+
+
+def get_current_ranking(volunteer_profile, limit):
+    """A volunteer's ranking from their snapshot, or else the recommendation cache."""
+    ranking = get_snapshot_ranking(volunteer_profile, limit)
+    if ranking is None:
+        ranking = get_cached_ranking(volunteer_profile, limit)
+    return ranking
+
+
+def get_recommendation_page(volunteer_profile, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Get one page of a volunteer's recommendations.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        cursor: Cursor from the previous page (None for the first page)
+        page_size: Recommendations per page
+    
+    Returns:
+        Tuple: (recommendations: list of (Opportunity, match_score),
+        offset: rank of the first one (0-based), next_cursor: str or None,
+        expired: True if the cursor had expired and the first page of a
+        fresh ranking was returned instead)
+    """
+    user_id = volunteer_profile.user_id
+    
+    position, expired = None, False
+    if cursor:
+        try:
+            position = read_cursor(cursor, user_id)
+        except signing.SignatureExpired:
+            expired = True
+    if position is None:
+        ranking, offset = get_current_ranking(volunteer_profile, settings.RECOMMENDATION_CACHE_SIZE), 0
+    else:
+        ranking, offset = position
+    
+    next_cursor = None
+    if len(ranking) > page_size:
+        next_cursor = make_cursor(ranking[page_size:], offset + page_size, user_id)
+    # Opportunities closed since the ranking was frozen are skipped
+    recommendations = [
+        (opp, score)
+        for opp, score in hydrate_ranking(ranking[:page_size])
+        if opp.status == 'OPEN'
+    ]
+    return recommendations, offset, next_cursor, expired
@@ -1,42 +1,358 @@
 """
 Scheduling and availability logic for volunteers.
 Handles hours limit checking and schedule calculation.
+
+A volunteer's committed weekly hours (the min_hours_per_week of their
+ACCEPTED applications) are kept in VolunteerProfile.committed_hours_per_week,
+adjusted with F() updates by the signal handlers whenever an application
+enters or leaves ACCEPTED or an accepted opportunity's hours change. Raw
+saves (loaddata) recount the affected counters instead. Queryset update()
+and bulk_update() on Application or Opportunity bypass the signals: code
+using them must adjust the counters itself (as triage_applications does) or
+run reconcile_committed_hours (the repair_committed_hours command) after.
+
+Hours limits are checked against the commitments that overlap in time: a
+CommitmentCalendar buckets accepted opportunities by week and answers the
+peak weekly load over an opportunity's dates, so one that ended last month
+doesn't count against one starting next term.
+
+Applying and accepting lock the volunteer's profile row while checking the
+limit, so concurrent requests for one volunteer are serialized and can't
+both fit into the same spare hours. Bulk triage locks every affected profile
+at once and keeps the counters and recommendation caches in step itself,
+since bulk_update bypasses the signals.
 """
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import cached_property
+from itertools import accumulate
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from opportunities.models import Application
 
 
-def check_hours_limit(volunteer, new_opportunity):
+def get_week(day):
+    """Index of the Monday to Sunday week containing a date."""
+    # date(1, 1, 1) is a Monday
+    return (day.toordinal() - 1) // 7
+
+
+class CommitmentCalendar:
+    """
+    Weekly load of a volunteer's accepted commitments over time.
+    
+    Each commitment adds its weekly hours to every week its dates touch. The
+    weeks where the load changes split time into segments of constant load,
+    and a sparse table of segment load maxima answers the peak over any range
+    of weeks with two binary searches and one max: O(log n) per query for n
+    commitments, after an O(n log n) build.
+    """
+    
+    def __init__(self, commitments=()):
+        """
+        Args:
+            commitments: Iterable of (start_date, end_date, hours_per_week)
+        """
+        self.commitments = list(commitments)
+        changes = Counter()
+        self.total_hours = 0
+        for start_date, end_date, hours in self.commitments:
+            changes[get_week(start_date)] += hours
+            changes[get_week(max(start_date, end_date)) + 1] -= hours
+            self.total_hours += hours
+        
+        # Segment k covers the weeks from boundaries[k] until the next boundary
+        self.boundaries = sorted(changes)
+        self.levels = [list(accumulate(changes[week] for week in self.boundaries))]
+        span = 1
+        while 2 * span <= len(self.boundaries):
+            previous = self.levels[-1]
+            self.levels.append([
+                max(previous[k], previous[k + span])
+                for k in range(len(previous) - span)
+            ])
+            span *= 2
+    
+    def add(self, start_date, end_date, hours):
+        """Return a new calendar with one more commitment."""
+        return CommitmentCalendar([*self.commitments, (start_date, end_date, hours)])
+    
+    def peak_load_weeks(self, first_week, last_week):
+        """Peak weekly hours committed in any week from first_week to last_week."""
+        last = bisect_right(self.boundaries, last_week) - 1
+        if last < 0:
+            return 0
+        first = max(bisect_right(self.boundaries, first_week) - 1, 0)
+        last = max(last, first)
+        level = (last - first + 1).bit_length() - 1
+        loads = self.levels[level]
+        return max(loads[first], loads[last - (1 << level) + 1])
+    
+    def peak_load(self, start_date, end_date):
+        """Peak weekly hours committed in any week from start_date to end_date."""
+        return self.peak_load_weeks(get_week(start_date), get_week(end_date))
+    
+    @cached_property
+    def _table(self):
+        """The sparse table as a zero-padded 2D array, for peak_loads."""
+        table = np.zeros((len(self.levels), len(self.boundaries)), dtype=np.int64)
+        for level, loads in enumerate(self.levels):
+            table[level, :len(loads)] = loads
+        return table
+    
+    def peak_loads(self, first_weeks, last_weeks):
+        """
+        Vectorized peak_load_weeks.
+        
+        Args:
+            first_weeks: Integer array of first weeks
+            last_weeks: Integer array of last weeks, same shape
+        
+        Returns:
+            Integer array of peak weekly loads
+        """
+        first_weeks = np.asarray(first_weeks, dtype=np.int64)
+        if not self.boundaries:
+            return np.zeros(first_weeks.shape, dtype=np.int64)
+        boundaries = np.array(self.boundaries, dtype=np.int64)
+        last = np.searchsorted(boundaries, last_weeks, side='right') - 1
+        before = last < 0
+        first = np.maximum(np.searchsorted(boundaries, first_weeks, side='right') - 1, 0)
+        last = np.maximum(last, first)
+        level = np.frexp((last - first + 1).astype(np.float64))[1] - 1
+        peaks = np.maximum(
+            self._table[level, first],
+            self._table[level, last - (1 << level) + 1]
+        )
+        peaks[before] = 0
+        return peaks
+
+
+def get_commitment_calendars(user_ids, start_date=None, end_date=None):
     """
-    Check if adding a new opportunity would exceed volunteer's max hours per week.
+    Build the commitment calendars of many volunteers from one query.
     
     Args:
-        volunteer: User instance (volunteer)
-        new_opportunity: Opportunity instance
+        user_ids: Iterable of volunteer user ids
+        start_date, end_date: Optional date range; only commitments in weeks
+            overlapping it are loaded (enough to check opportunities inside it)
     
     Returns:
-        Tuple: (can_apply: bool, current_hours: int, would_be_hours: int)
+        Dict mapping each user id to a CommitmentCalendar
     """
-    from .models import VolunteerProfile
+    accepted = Application.objects.filter(volunteer_id__in=set(user_ids), status='ACCEPTED').order_by()
+    if start_date is not None:
+        accepted = accepted.filter(
+            opportunity__end_date__gte=start_date - timedelta(days=start_date.weekday())
+        )
+    if end_date is not None:
+        accepted = accepted.filter(
+            opportunity__start_date__lte=end_date + timedelta(days=6 - end_date.weekday())
+        )
     
-    try:
-        profile = volunteer.volunteer_profile
-    except VolunteerProfile.DoesNotExist:
-        # No profile yet, allow application
-        return (True, 0, new_opportunity.min_hours_per_week)
+    commitments = defaultdict(list)
+    for user_id, *commitment in accepted.values_list(
+        'volunteer_id', 'opportunity__start_date', 'opportunity__end_date',
+        'opportunity__min_hours_per_week'
+    ):
+        commitments[user_id].append(commitment)
+    return {user_id: CommitmentCalendar(commitments[user_id]) for user_id in user_ids}
+
+
+def get_commitment_calendar(volunteer, start_date=None, end_date=None):
+    """Build one volunteer's CommitmentCalendar (see get_commitment_calendars)."""
+    user_id = getattr(volunteer, 'pk', volunteer)
+    return get_commitment_calendars([user_id], start_date, end_date)[user_id]
+
+
+def get_committed_hours(volunteer):
+    """
+    Get the weekly hours a volunteer has committed to through ACCEPTED applications.
+    Reads the profile's counter (0 without a profile).
     
-    max_hours = profile.max_hours_per_week
+    Args:
+        volunteer: User instance (volunteer) or user id
     
-    # Get all accepted applications
-    accepted_applications = Application.objects.filter(
+    Returns:
+        int: Total min_hours_per_week of accepted opportunities
+    """
+    from .models import VolunteerProfile
+    
+    return VolunteerProfile.objects.filter(
+        user=volunteer
+    ).values_list('committed_hours_per_week', flat=True).first() or 0
+
+
+def count_committed_hours(volunteer):
+    """
+    Get a volunteer's committed weekly hours from their ACCEPTED applications,
+    bypassing the counter. Computed with a single aggregate query.
+    """
+    return Application.objects.filter(
         volunteer=volunteer,
         status='ACCEPTED'
+    ).aggregate(total=Sum('opportunity__min_hours_per_week'))['total'] or 0
+
+
+def get_committed_hours_by_volunteer(user_ids):
+    """
+    Get current accepted weekly hours for many volunteers in one grouped query.
+    
+    Returns:
+        Dict mapping user id to committed hours (missing ids have 0)
+    """
+    rows = Application.objects.filter(
+        volunteer_id__in=user_ids,
+        status='ACCEPTED'
+    ).values('volunteer_id').annotate(
+        total=Sum('opportunity__min_hours_per_week')
     )
+    return {row['volunteer_id']: row['total'] or 0 for row in rows}
+
+
+def add_committed_hours(user_ids, hours):
+    """Add hours (possibly negative) to the committed hours counters of volunteers."""
+    from .models import VolunteerProfile
+    
+    if hours:
+        VolunteerProfile.objects.filter(user_id__in=user_ids).update(
+            committed_hours_per_week=F('committed_hours_per_week') + hours
+        )
+
+
+def recount_committed_hours(user_ids):
+    """
+    Set the committed hours counters of some volunteers from their ACCEPTED
+    applications, in one UPDATE.
     
-    # Calculate current total hours
-    current_hours = sum(
-        app.opportunity.min_hours_per_week
-        for app in accepted_applications
+    Args:
+        user_ids: Iterable or queryset of volunteer user ids
+    """
+    from .models import VolunteerProfile
+    
+    totals = Application.objects.filter(
+        volunteer_id=OuterRef('user_id'),
+        status='ACCEPTED'
+    ).order_by().values('volunteer_id').annotate(
+        total=Sum('opportunity__min_hours_per_week')
+    ).values('total')
+    VolunteerProfile.objects.filter(user_id__in=user_ids).update(
+        committed_hours_per_week=Coalesce(Subquery(totals), 0)
     )
+
+
+def reconcile_committed_hours(batch_size=1000):
+    """
+    Recompute every committed hours counter from the ACCEPTED applications
+    and fix those that drifted. Each batch of profiles is locked while it is
+    checked, so concurrent signal updates wait and apply on top.
+    
+    Returns:
+        List of (user_id, stored_hours, actual_hours) for the repaired profiles
+    """
+    from .models import VolunteerProfile
+    
+    repaired = []
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                VolunteerProfile.objects.filter(id__gt=last_id).order_by('id').select_for_update().only(
+                    'id', 'user_id', 'committed_hours_per_week'
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            actual = get_committed_hours_by_volunteer([profile.user_id for profile in batch])
+            drifted = []
+            for profile in batch:
+                hours = actual.get(profile.user_id, 0)
+                if profile.committed_hours_per_week != hours:
+                    repaired.append((profile.user_id, profile.committed_hours_per_week, hours))
+                    profile.committed_hours_per_week = hours
+                    drifted.append(profile)
+            VolunteerProfile.objects.bulk_update(drifted, ['committed_hours_per_week'])
+        last_id = batch[-1].id
+    return repaired
+
+
+def check_hours_limit_bulk(volunteer_profile, opportunities, calendar=None):
+    """
+    Check the hours limit for many opportunities at once.
+    Same results as check_hours_limit, without any per-opportunity queries.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        opportunities: Iterable of Opportunity instances (or rows with id,
+            min_hours_per_week, start_date and end_date)
+        calendar: Precomputed CommitmentCalendar, queried once if omitted
+    
+    Returns:
+        Dict mapping opportunity id to (can_apply, current_hours, would_be_hours)
+    """
+    if calendar is None:
+        calendar = get_commitment_calendar(volunteer_profile.user_id)
+    
+    return {
+        opportunity.id: check_hours_limit_committed(
+            volunteer_profile,
+            opportunity,
+            calendar.peak_load(opportunity.start_date, opportunity.end_date)
+        )
+        for opportunity in opportunities
+    }
+
+
+def check_hours_limit_committed(volunteer_profile, new_opportunity, committed_hours):
+    """
+    Check the hours limit for one opportunity against precomputed committed hours
+    (the peak weekly load during the opportunity, see CommitmentCalendar).
+    
+    Returns:
+        Tuple: (can_apply: bool, current_hours: int, would_be_hours: int)
+    """
+    would_be_hours = committed_hours + new_opportunity.min_hours_per_week
+    can_apply = would_be_hours <= volunteer_profile.max_hours_per_week
+    return (can_apply, committed_hours, would_be_hours)
+
+
+def check_hours_limit(volunteer, new_opportunity, lock=False):
+    """
+    Check if adding a new opportunity would exceed volunteer's max hours per
+    week in any week of the opportunity's dates.
+    
+    Args:
+        volunteer: User instance (volunteer)
+        new_opportunity: Opportunity instance
+        lock: Lock the volunteer's profile row until the end of the transaction,
+            so no concurrent apply or acceptance can change their commitments
+            between this check and the caller's write. Must be called inside
+            transaction.atomic()
+    
+    Returns:
+        Tuple: (can_apply: bool, current_hours: int, would_be_hours: int),
+        current_hours being the peak weekly load committed during the opportunity
+    """
+    from .models import VolunteerProfile
+    
+    # The profile is not taken from the user's cache, which may be stale
+    profiles = VolunteerProfile.objects.filter(user=volunteer)
+    if lock:
+        profiles = profiles.select_for_update()
+    max_hours = profiles.values_list('max_hours_per_week', flat=True).first()
+    if max_hours is None:
+        # No profile yet, allow application
+        return (True, 0, new_opportunity.min_hours_per_week)
+    
+    # Peak load over the opportunity's weeks, from the applications themselves:
+    # the committed hours counter may have drifted (bulk writes, raw loads)
+    current_hours = get_commitment_calendar(
+        volunteer, new_opportunity.start_date, new_opportunity.end_date
+    ).peak_load(new_opportunity.start_date, new_opportunity.end_date)
     
     # Calculate would-be hours
     would_be_hours = current_hours + new_opportunity.min_hours_per_week
@@ -47,6 +363,137 @@ def check_hours_limit(volunteer, new_opportunity):
     return (can_apply, current_hours, would_be_hours)
 
 
+def submit_application(volunteer, opportunity):
+    """
+    Apply a volunteer to an opportunity in one transaction: lock the
+    volunteer's profile row, check the hours limit, create the PENDING
+    application and notify the organisation admin.
+    
+    Nothing is checked ahead of the insert: a second application by the same
+    volunteer (a double submit, say) fails on the unique constraint and
+    rolls the whole transaction back.
+    
+    Args:
+        volunteer: User instance (volunteer)
+        opportunity: Opportunity instance, with its organisation loaded
+    
+    Returns:
+        Tuple: (outcome: 'SUBMITTED', 'DUPLICATE' or 'OVER_LIMIT', hours),
+        hours being check_hours_limit's (can_apply, current_hours,
+        would_be_hours), or None for a duplicate
+    """
+    from notifications.models import Notification
+    
+    try:
+        with transaction.atomic():
+            hours = check_hours_limit(volunteer, opportunity, lock=True)
+            if not hours[0]:
+                return 'OVER_LIMIT', hours
+            Application.objects.create(volunteer=volunteer, opportunity=opportunity, status='PENDING')
+            Notification.objects.create(
+                user_id=opportunity.organisation.admin_id,
+                message=f'New application from {volunteer.username} for "{opportunity.title}"',
+                type='OPPORTUNITY_UPDATE'
+            )
+    except IntegrityError:
+        return 'DUPLICATE', None
+    return 'SUBMITTED', hours
+
+
+def triage_applications(admin, application_ids, new_status):
+    """
+    Move many applications to a status in one transaction, for an
+    organisation admin reviewing applicants in bulk.
+    
+    Ownership is checked in the same query that loads the applications, and
+    the status changes are written with one bulk_update and the volunteers'
+    notifications with one bulk_create. Accepting locks every affected
+    profile and checks all their hours limits against commitment calendars
+    loaded in one query; applications accepted earlier in the batch count
+    against later ones for the same volunteer. Applications already in the
+    status are left alone.
+    
+    Args:
+        admin: User instance (organisation admin)
+        application_ids: Iterable of application ids
+        new_status: One of Application.STATUS_CHOICES
+    
+    Returns:
+        Tuple: (updated: list of Applications, refused: list of
+        (Application, (can_apply, current_hours, would_be_hours)) that would
+        exceed the volunteer's limit, unknown_ids: ids not found among the
+        admin's applications)
+    """
+    from notifications.models import Notification
+    from .caching import bump_versions, volunteer_version_key
+    from .models import VolunteerProfile
+    from .snapshots import invalidate_snapshots
+    
+    application_ids = set(application_ids)
+    with transaction.atomic():
+        applications = list(Application.objects.filter(
+            pk__in=application_ids,
+            opportunity__organisation__admin=admin
+        ).select_related('opportunity', 'volunteer').order_by('id'))
+        unknown_ids = sorted(application_ids - {application.pk for application in applications})
+        changing = [application for application in applications if application.status != new_status]
+        
+        updated, refused = [], []
+        if new_status == 'ACCEPTED':
+            user_ids = sorted({application.volunteer_id for application in changing})
+            # Locked in user order, so overlapping batches can't deadlock
+            max_hours = dict(VolunteerProfile.objects.filter(
+                user_id__in=user_ids
+            ).order_by('user_id').select_for_update().values_list('user_id', 'max_hours_per_week'))
+            calendars = get_commitment_calendars(list(max_hours))
+            for application in changing:
+                opportunity = application.opportunity
+                calendar = calendars.get(application.volunteer_id)
+                if calendar is not None:
+                    current_hours = calendar.peak_load(opportunity.start_date, opportunity.end_date)
+                    would_be_hours = current_hours + opportunity.min_hours_per_week
+                    if would_be_hours > max_hours[application.volunteer_id]:
+                        refused.append((application, (False, current_hours, would_be_hours)))
+                        continue
+                    calendars[application.volunteer_id] = calendar.add(
+                        opportunity.start_date, opportunity.end_date, opportunity.min_hours_per_week
+                    )
+                updated.append(application)
+        else:
+            updated = changing
+        
+        # bulk_update skips auto_now and the signal handlers, so do their work here
+        now = timezone.now()
+        hours_changes = Counter()
+        for application in updated:
+            if new_status == 'ACCEPTED':
+                hours_changes[application.volunteer_id] += application.opportunity.min_hours_per_week
+            elif application.status == 'ACCEPTED':
+                hours_changes[application.volunteer_id] -= application.opportunity.min_hours_per_week
+            application.status = new_status
+            application.updated_at = now
+        Application.objects.bulk_update(updated, ['status', 'updated_at'])
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=application.volunteer_id,
+                message=f'Your application for "{application.opportunity.title}" has been {new_status.lower()}.',
+                type='OPPORTUNITY_UPDATE'
+            )
+            for application in updated
+        ])
+        
+        # One counter update per distinct change in hours
+        users_by_hours = defaultdict(list)
+        for user_id, hours in hours_changes.items():
+            users_by_hours[hours].append(user_id)
+        for hours, user_ids in users_by_hours.items():
+            add_committed_hours(user_ids, hours)
+        if hours_changes:
+            bump_versions(volunteer_version_key(user_id) for user_id in hours_changes)
+            invalidate_snapshots(list(hours_changes))
+    return updated, refused, unknown_ids
+
+
 def get_volunteer_schedule(volunteer):
     """
     Get volunteer's current schedule with active opportunities and estimated hours.
@@ -97,3 +544,62 @@ def get_volunteer_schedule(volunteer):
         'remaining_capacity': profile.max_hours_per_week - total_hours,
     }
 
+
+def get_volunteer_schedules(user_ids, opportunity=None):
+    """
+    Get the schedule totals of many volunteers, as in get_volunteer_schedule
+    but without the opportunity lists: one grouped aggregate over their
+    ACCEPTED applications plus one profile fetch, whatever the number of
+    volunteers. Given an opportunity, their commitment calendars over its
+    dates are loaded too (one more query) for the peak weekly load that
+    check_hours_limit compares.
+    
+    Args:
+        user_ids: Iterable of volunteer user ids
+        opportunity: Opportunity instance to add peak_hours for (optional)
+    
+    Returns:
+        Dict mapping each user id to a dict with total_hours, accepted_count,
+        max_hours and remaining_capacity, and peak_hours if an opportunity was
+        given (all 0 for volunteers without a profile)
+    """
+    from .models import VolunteerProfile
+    
+    user_ids = set(user_ids)
+    max_hours = dict(
+        VolunteerProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'max_hours_per_week')
+    )
+    totals = {
+        row['volunteer_id']: row
+        for row in Application.objects.filter(
+            volunteer_id__in=max_hours,
+            status='ACCEPTED'
+        ).values('volunteer_id').annotate(
+            total_hours=Sum('opportunity__min_hours_per_week'),
+            accepted_count=Count('id')
+        )
+    }
+    calendars = {}
+    if opportunity is not None:
+        calendars = get_commitment_calendars(max_hours, opportunity.start_date, opportunity.end_date)
+    
+    schedules = {}
+    for user_id in user_ids:
+        if user_id not in max_hours:
+            schedules[user_id] = {'total_hours': 0, 'accepted_count': 0, 'max_hours': 0, 'remaining_capacity': 0}
+            if opportunity is not None:
+                schedules[user_id]['peak_hours'] = 0
+            continue
+        row = totals.get(user_id, {})
+        total_hours = row.get('total_hours') or 0
+        schedules[user_id] = {
+            'total_hours': total_hours,
+            'accepted_count': row.get('accepted_count', 0),
+            'max_hours': max_hours[user_id],
+            'remaining_capacity': max_hours[user_id] - total_hours,
+        }
+        if opportunity is not None:
+            schedules[user_id]['peak_hours'] = calendars[user_id].peak_load(
+                opportunity.start_date, opportunity.end_date
+            )
+    return schedules
@@ -0,0 +1,196 @@
+"""
+Signal handlers keeping volunteer matching data in sync with the models it reads.
+"""
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from opportunities.models import Application, Opportunity, get_loaded_value
+from . import caching, fuzzy, interests
+from .indexing import get_skill_tokens, index_opportunity, index_volunteer, reset_volunteer_vocabulary
+from .models import OpportunitySkillToken, VolunteerProfile
+from .scheduling import add_committed_hours, count_committed_hours, recount_committed_hours
+from .snapshots import invalidate_snapshots
+
+
+# Opportunity fields that feed into a match score
+RANKING_FIELDS = (
+    'required_skills', 'category', 'status', 'min_hours_per_week',
+    'start_date', 'end_date', 'is_remote', 'session_slots',
+)
+
+# Opportunity fields that make up an accepted volunteer's commitment
+COMMITMENT_FIELDS = ('min_hours_per_week', 'start_date', 'end_date')
+
+# Opportunity fields read by the text similarity index
+TEXT_FIELDS = (
+    'title', 'description', 'required_skills', 'status', 'min_hours_per_week',
+    'start_date', 'end_date',
+)
+
+
+def _ranking_fields_changed(opportunity, created):
+    if created:
+        return True
+    return any(
+        get_loaded_value(opportunity, name) != getattr(opportunity, name)
+        for name in RANKING_FIELDS
+    )
+
+
+@receiver(post_save, sender=Opportunity)
+def update_opportunity_skill_index(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Re-index an opportunity whenever it is created, edited, opened or closed,
+    and invalidate cached recommendations that could include it.
+    """
+    if raw:
+        return
+    added_tokens = index_opportunity(instance)
+    
+    if created or any(
+        get_loaded_value(instance, name) != getattr(instance, name) for name in TEXT_FIELDS
+    ):
+        caching.invalidate_opportunity_text()
+    
+    if not _ranking_fields_changed(instance, created):
+        return
+    
+    old_tokens = get_loaded_value(instance, 'skill_tokens', [])
+    tokens = get_skill_tokens(old_tokens) | get_skill_tokens(instance.skill_tokens)
+    categories = {get_loaded_value(instance, 'category'), instance.category} - {None}
+    
+    # A token no other opportunity uses is new to the vocabulary
+    vocabulary_changed = False
+    if added_tokens:
+        shared = set(
+            OpportunitySkillToken.objects.filter(
+                token__in=added_tokens
+            ).exclude(opportunity=instance).values_list('token', flat=True)
+        )
+        vocabulary_changed = bool(added_tokens - shared)
+    caching.invalidate_opportunity_terms(tokens, categories, vocabulary_changed)
+    
+    # Changed hours or dates alter the commitments of volunteers already accepted
+    if not created and any(
+        get_loaded_value(instance, name) != getattr(instance, name) for name in COMMITMENT_FIELDS
+    ):
+        accepted_volunteer_ids = list(Application.objects.filter(
+            opportunity=instance,
+            status='ACCEPTED'
+        ).values_list('volunteer_id', flat=True))
+        old_hours = get_loaded_value(instance, 'min_hours_per_week')
+        if old_hours is not None:
+            add_committed_hours(accepted_volunteer_ids, instance.min_hours_per_week - old_hours)
+        for user_id in accepted_volunteer_ids:
+            caching.invalidate_volunteer(user_id)
+        invalidate_snapshots(accepted_volunteer_ids)
+
+
+@receiver(post_save, sender=Opportunity)
+def recount_committed_hours_on_raw_save(sender, instance, raw=False, **kwargs):
+    """Recount the counters of volunteers accepted to an opportunity loaded raw (loaddata)."""
+    if raw:
+        recount_committed_hours(Application.objects.filter(
+            opportunity=instance,
+            status='ACCEPTED'
+        ).values('volunteer_id'))
+
+
+@receiver(post_delete, sender=Opportunity)
+def invalidate_deleted_opportunity(sender, instance, **kwargs):
+    """Index rows cascade with the opportunity; cached rankings must be dropped."""
+    caching.invalidate_opportunity_terms(
+        get_skill_tokens(instance.skill_tokens),
+        [instance.category]
+    )
+    caching.invalidate_opportunity_text()
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def invalidate_on_commitment_change(sender, instance, **kwargs):
+    """Invalidate a volunteer's recommendations when their ACCEPTED set changes."""
+    if 'ACCEPTED' in (instance.status, get_loaded_value(instance, 'status')):
+        caching.invalidate_volunteer(instance.volunteer_id)
+        invalidate_snapshots([instance.volunteer_id])
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def update_committed_hours(sender, instance, signal, raw=False, **kwargs):
+    """
+    Keep the volunteer's committed hours counter in step when an application
+    enters or leaves ACCEPTED (deletion included) or moves to another opportunity.
+    A raw save (loaddata) may overwrite any earlier state, so the counter is
+    recounted instead.
+    """
+    if raw:
+        recount_committed_hours([instance.volunteer_id])
+        return
+    was_accepted = get_loaded_value(instance, 'status') == 'ACCEPTED'
+    is_accepted = signal is post_save and instance.status == 'ACCEPTED'
+    old_opportunity_id = get_loaded_value(instance, 'opportunity_id')
+    if not (was_accepted or is_accepted):
+        return
+    if was_accepted and is_accepted and old_opportunity_id == instance.opportunity_id:
+        return
+    
+    hours = 0
+    if is_accepted:
+        hours += instance.opportunity.min_hours_per_week
+    if was_accepted:
+        hours -= Opportunity.objects.filter(
+            pk=old_opportunity_id
+        ).values_list('min_hours_per_week', flat=True).first() or 0
+    add_committed_hours([instance.volunteer_id], hours)
+
+
+@receiver(post_save, sender=VolunteerProfile)
+def initialize_committed_hours(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Start a new profile's counter from applications accepted before it
+    existed. A raw save (loaddata) carries the counter from elsewhere, so it
+    is recounted too.
+    """
+    if raw:
+        recount_committed_hours([instance.user_id])
+        return
+    if not created:
+        return
+    hours = count_committed_hours(instance.user_id)
+    if hours != instance.committed_hours_per_week:
+        VolunteerProfile.objects.filter(pk=instance.pk).update(committed_hours_per_week=hours)
+        instance.committed_hours_per_week = hours
+
+
+@receiver(post_save, sender=VolunteerProfile)
+def update_volunteer_index(sender, instance, raw=False, **kwargs):
+    """Re-index a volunteer's skills and interest categories when the profile is saved."""
+    if raw:
+        return
+    index_volunteer(instance)
+
+
+@receiver(post_save, sender=VolunteerProfile)
+@receiver(post_delete, sender=VolunteerProfile)
+def invalidate_on_profile_change(sender, instance, raw=False, **kwargs):
+    """Invalidate a volunteer's recommendations when their profile changes."""
+    if raw:
+        return
+    caching.invalidate_volunteer(instance.user_id)
+    invalidate_snapshots([instance.user_id])
+
+
+@receiver(setting_changed)
+def reset_fuzzy_matching(sender, setting, **kwargs):
+    """Drop cached aliases, trigram indexes and vocabulary lookups when a fuzzy matching setting changes."""
+    if setting in fuzzy.FUZZY_SETTINGS:
+        fuzzy.clear_caches()
+        reset_volunteer_vocabulary()
+
+
+@receiver(setting_changed)
+def reset_interest_classifier(sender, setting, **kwargs):
+    """Recompile the interest classifier when its keyword setting changes."""
+    if setting in interests.INTEREST_SETTINGS:
+        interests.clear_caches()
@@ -0,0 +1,320 @@
+"""
+Text similarity recommender - TF-IDF cosine between a volunteer's skills and
+interests and each open opportunity's title, description and required skills.
+
+Runs fully in process: words are extracted with a regex, no model or service
+is involved. Vectors follow the SMART lnc.ltc scheme:
+- Opportunities: log term frequency, cosine normalized (no idf), so a vector
+  depends on its own text only and can be replaced without touching others
+- Volunteers: log term frequency times idf over the open catalog, normalized
+The catalog is held as a sparse term x opportunity matrix (CSC: one postings
+array per term), and scoring a volunteer is one sparse matrix-vector product.
+
+The index is built once per process and kept current incrementally: edits
+bump a version stamp shared by every process, and the next lookup re-reads
+only the opportunities updated since the last sync, then compares the open
+opportunity ids with the indexed ones to drop deleted rows. Edited rows are
+masked out of the base matrix and re-added to a small delta segment, which is
+merged back with a rebuild once it grows.
+"""
+import copy
+import math
+import re
+import threading
+from collections import Counter
+import numpy as np
+from opportunities.models import Opportunity
+from .caching import TEXT_VERSION_KEY, get_versions
+from .scheduling import get_commitment_calendar, get_week
+
+
+WORD_PATTERN = re.compile(r'[^\W\d_]{2,}')
+
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have in is it its of on or our
+    that the their they this to we will with you your who all any can help
+    us if not no so than then there these those into about also more
+""".split())
+
+# Columns read from an opportunity to index it
+TEXT_FIELDS = (
+    'id', 'status', 'title', 'description', 'required_skills', 'min_hours_per_week',
+    'start_date', 'end_date', 'updated_at',
+)
+
+# Rebuild once the delta segment holds this share of the base rows (at least 1000 rows)
+DELTA_REBUILD_RATIO = 0.1
+
+
+def tokenize_text(text):
+    """Return the lowercased words of a text, without stop words."""
+    return [word for word in WORD_PATTERN.findall((text or '').lower()) if word not in STOP_WORDS]
+
+
+def get_term_weights(words):
+    """
+    Log term frequency weights of a word list.
+    
+    Returns:
+        Dict mapping each distinct word to 1 + log(count)
+    """
+    return {word: 1.0 + math.log(count) for word, count in Counter(words).items()}
+
+
+def get_document_vector(opportunity_row):
+    """Return the cosine-normalized (terms, weights) vector of an opportunity row."""
+    weights = get_term_weights(tokenize_text(' '.join((
+        opportunity_row.title, opportunity_row.description, opportunity_row.required_skills
+    ))))
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return list(weights), np.array(list(weights.values())) / (norm or 1.0)
+
+
+class OpportunityTextIndex:
+    """
+    TF-IDF index of the open opportunities.
+    
+    The base segment is a CSC matrix over the rows present at build time; rows
+    edited later are masked out of it and re-added to the delta segment,
+    whose postings are plain lists.
+    """
+    
+    def __init__(self, rows=()):
+        self.df = Counter()
+        self.synced_to = None
+        self.version = None
+        
+        vectors = [(row, *get_document_vector(row)) for row in rows]
+        self.vocabulary = {}
+        row_columns, row_weights, row_lengths = [], [], []
+        for row, terms, weights in vectors:
+            self.df.update(terms)
+            row_columns.extend(self.vocabulary.setdefault(term, len(self.vocabulary)) for term in terms)
+            row_weights.append(weights)
+            row_lengths.append(len(terms))
+            self._track(row)
+        self.terms = list(self.vocabulary)
+        
+        # CSR (per opportunity) term columns, kept to update document frequencies
+        self.row_columns = np.array(row_columns, dtype=np.int64)
+        self.row_indptr = np.concatenate(([0], np.cumsum(row_lengths, dtype=np.int64)))
+        
+        # CSC (per term) postings used for scoring
+        weights = np.concatenate(row_weights) if row_weights else np.zeros(0)
+        order = np.argsort(self.row_columns, kind='stable')
+        self.posting_rows = np.repeat(np.arange(len(vectors)), row_lengths)[order]
+        self.posting_weights = weights[order]
+        self.col_indptr = np.concatenate((
+            [0], np.cumsum(np.bincount(self.row_columns, minlength=len(self.vocabulary)))
+        ))
+        
+        self.base_size = len(vectors)
+        self.alive = np.ones(self.base_size, dtype=bool)
+        self.opportunity_ids = [row.id for row in rows]
+        self.row_of = {opportunity_id: row for row, opportunity_id in enumerate(self.opportunity_ids)}
+        self.hours = np.array([row.min_hours_per_week for row in rows], dtype=np.int64)
+        self.first_weeks = np.array([get_week(row.start_date) for row in rows], dtype=np.int64)
+        self.last_weeks = np.array([get_week(row.end_date) for row in rows], dtype=np.int64)
+        self.delta_terms = {}
+        self.delta_postings = {}
+    
+    def copy(self):
+        """
+        Return a copy that can be updated without affecting this index. The
+        base matrix is never modified, so it is shared.
+        """
+        index = copy.copy(self)
+        index.df = self.df.copy()
+        index.alive = self.alive.copy()
+        index.opportunity_ids = list(self.opportunity_ids)
+        index.row_of = dict(self.row_of)
+        index.delta_terms = dict(self.delta_terms)
+        index.delta_postings = {
+            term: (list(rows), list(weights)) for term, (rows, weights) in self.delta_postings.items()
+        }
+        return index
+    
+    def _track(self, row):
+        if self.synced_to is None or row.updated_at > self.synced_to:
+            self.synced_to = row.updated_at
+    
+    @property
+    def size(self):
+        """Number of opportunities in the index."""
+        return len(self.row_of)
+    
+    def remove(self, opportunity_id):
+        """Drop an opportunity's row, if it is indexed."""
+        row = self.row_of.pop(opportunity_id, None)
+        if row is None:
+            return
+        if row < self.base_size:
+            self.alive[row] = False
+            columns = self.row_columns[self.row_indptr[row]:self.row_indptr[row + 1]]
+            self.df.subtract(self.terms[column] for column in columns)
+        else:
+            terms = self.delta_terms.pop(row)
+            self.df.subtract(terms)
+            for term in terms:
+                rows, weights = self.delta_postings[term]
+                k = rows.index(row)
+                del rows[k], weights[k]
+    
+    def add(self, opportunity_row):
+        """Index an open opportunity row in the delta segment."""
+        terms, weights = get_document_vector(opportunity_row)
+        row = len(self.opportunity_ids)
+        self.opportunity_ids.append(opportunity_row.id)
+        self.row_of[opportunity_row.id] = row
+        self.hours = np.append(self.hours, opportunity_row.min_hours_per_week)
+        self.first_weeks = np.append(self.first_weeks, get_week(opportunity_row.start_date))
+        self.last_weeks = np.append(self.last_weeks, get_week(opportunity_row.end_date))
+        self.delta_terms[row] = terms
+        self.df.update(terms)
+        for term, weight in zip(terms, weights.tolist()):
+            rows, term_weights = self.delta_postings.setdefault(term, ([], []))
+            rows.append(row)
+            term_weights.append(weight)
+    
+    def apply(self, opportunity_row):
+        """Bring an opportunity's row in line with the database row."""
+        self.remove(opportunity_row.id)
+        if opportunity_row.status == 'OPEN':
+            self.add(opportunity_row)
+        self._track(opportunity_row)
+    
+    def needs_rebuild(self):
+        """Whether the delta segment has grown enough to merge into a rebuild."""
+        return len(self.opportunity_ids) - self.base_size > max(1000, DELTA_REBUILD_RATIO * self.base_size)
+    
+    def get_query_vector(self, text):
+        """Return the idf-weighted, normalized {term: weight} query for a text."""
+        documents = self.size
+        weights = {
+            term: weight * (math.log((1 + documents) / (1 + self.df[term])) + 1)
+            for term, weight in get_term_weights(tokenize_text(text)).items()
+            if self.df[term] > 0
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+    
+    def score(self, text):
+        """
+        Cosine similarity of a text with every indexed row: one sparse
+        matrix-vector product over the postings of the query's terms.
+        
+        Returns:
+            Array of scores (0-1) per row; removed rows score 0
+        """
+        rows, values = [], []
+        for term, query_weight in self.get_query_vector(text).items():
+            column = self.vocabulary.get(term)
+            if column is not None:
+                start, end = self.col_indptr[column], self.col_indptr[column + 1]
+                rows.append(self.posting_rows[start:end])
+                values.append(self.posting_weights[start:end] * query_weight)
+            if term in self.delta_postings:
+                delta_rows, delta_weights = self.delta_postings[term]
+                rows.append(np.array(delta_rows, dtype=np.int64))
+                values.append(np.array(delta_weights) * query_weight)
+        
+        total_rows = len(self.opportunity_ids)
+        if not rows:
+            return np.zeros(total_rows)
+        scores = np.bincount(np.concatenate(rows), weights=np.concatenate(values), minlength=total_rows)
+        scores[:self.base_size][~self.alive] = 0.0
+        return scores
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_text_rows(**filters):
+    """Opportunity rows with TEXT_FIELDS, in id order."""
+    return Opportunity.objects.filter(**filters).order_by('id').values_list(*TEXT_FIELDS, named=True)
+
+
+def build_text_index():
+    """Build a fresh index of the open opportunities."""
+    return OpportunityTextIndex(list(get_text_rows(status='OPEN').iterator()))
+
+
+def get_text_index():
+    """
+    Return this process's text index, synced with the database.
+    
+    The version stamp is read first, so an edit made during the sync bumps it
+    again and is picked up on the next call. Without a stamp change this costs
+    one query.
+    
+    A sync updates a copy of the index and then replaces it, so an index
+    returned earlier never changes while a caller is scoring with it.
+    """
+    global _index
+    version = get_versions([TEXT_VERSION_KEY])[TEXT_VERSION_KEY]
+    with _index_lock:
+        if _index is not None and _index.version == version:
+            return _index
+        if _index is None or _index.needs_rebuild():
+            index = build_text_index()
+        else:
+            index = _index.copy()
+            changed = get_text_rows(updated_at__gte=index.synced_to) if index.synced_to else get_text_rows()
+            for row in changed:
+                index.apply(row)
+            # Deleted opportunities leave no row behind, so diff the open ids; rows
+            # opened by a bulk update, which leaves updated_at alone, are added
+            open_ids = set(Opportunity.objects.filter(status='OPEN').values_list('id', flat=True))
+            for opportunity_id in set(index.row_of) - open_ids:
+                index.remove(opportunity_id)
+            missing_ids = open_ids.difference(index.row_of)
+            if missing_ids:
+                for row in get_text_rows(id__in=missing_ids):
+                    index.apply(row)
+        index.version = version
+        _index = index
+        return index
+
+
+def reset_text_index():
+    """Drop this process's index; the next lookup rebuilds it."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def get_similar_opportunities(volunteer_profile, limit=10, calendar=None):
+    """
+    Get the open opportunities whose text is most similar to a volunteer's
+    skills and interests, skipping those that would exceed the hours limit.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        limit: Maximum number of opportunities to return
+        calendar: Optional precomputed CommitmentCalendar
+    
+    Returns:
+        List of tuples (Opportunity, match_score), score being the cosine
+        similarity scaled to 0-100
+    """
+    if calendar is None:
+        calendar = get_commitment_calendar(volunteer_profile.user_id)
+    
+    index = get_text_index()
+    scores = index.score(f'{volunteer_profile.skills_normalized} {volunteer_profile.interests_normalized}')
+    committed = calendar.peak_loads(index.first_weeks, index.last_weeks)
+    fits = index.hours + committed <= volunteer_profile.max_hours_per_week
+    candidates = np.flatnonzero((scores > 0) & fits)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    # Best first, equal scores by opportunity id
+    ids = [index.opportunity_ids[row] for row in candidates]
+    ranked = sorted(zip(ids, scores[candidates].tolist()), key=lambda pair: (-pair[1], pair[0]))
+    
+    opportunities = Opportunity.objects.select_related('organisation').in_bulk(ids)
+    return [
+        (opportunities[opportunity_id], score * 100)
+        for opportunity_id, score in ranked
+        if opportunity_id in opportunities
+    ]
@@ -0,0 +1,224 @@
+"""
+Recommendation snapshots - every active volunteer's top-N, precomputed offline.
+
+The refresh_recommendation_snapshots command ranks volunteers with
+get_recommended_opportunities across a process pool, in chunks, and writes the
+rankings with bulk_create/bulk_update. Runs are incremental: a volunteer is
+only recomputed when they have no snapshot yet or it was invalidated (profile
+saved, ACCEPTED applications changed) after the run that computed it started.
+Like recommendation cache entries, each snapshot also records the version
+stamps of the skill tokens and interest categories the volunteer matched (or
+of the text index, in the text similarity mode), so an opportunity created,
+deleted or edited in a way that could change a ranking invalidates just the
+snapshots of volunteers who could have ranked it.
+The recommended page reads a valid snapshot and falls back to the
+recommendation cache without one.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+import django
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+from .caching import get_dependency_keys, get_versions, hydrate_ranking, read_versions
+from .matching import get_recommendation_mode, get_recommended_opportunities
+from .models import RecommendationSnapshot, VolunteerProfile
+from .scheduling import get_commitment_calendars
+
+
+# Volunteers ranked per worker task
+DEFAULT_CHUNK_SIZE = 200
+
+WRITE_BATCH_SIZE = 1000
+
+
+def valid_snapshot_q(prefix=''):
+    """Q matching snapshots not invalidated since they were computed."""
+    return (
+        Q(**{f'{prefix}invalidated_at__isnull': True})
+        | Q(**{f'{prefix}invalidated_at__lt': F(f'{prefix}computed_at')})
+    )
+
+
+def has_current_versions(versions, current):
+    """Whether a snapshot's recorded stamps are all still current (none recorded: stale)."""
+    return bool(versions) and all(current.get(key) == stamp for key, stamp in versions.items())
+
+
+def get_outdated_profile_ids(full=False):
+    """
+    Get the ids of active volunteers' profiles whose snapshot is missing,
+    invalidated or computed under stamps that have changed since.
+    
+    Args:
+        full: Return every active volunteer's profile instead
+    
+    Returns:
+        List of profile ids, in id order
+    """
+    profiles = VolunteerProfile.objects.filter(user__is_active=True, user__role='VOLUNTEER')
+    if full:
+        return list(profiles.order_by('id').values_list('id', flat=True))
+    
+    outdated = set(
+        (profiles.filter(recommendation_snapshot__isnull=True) | profiles.exclude(
+            valid_snapshot_q('recommendation_snapshot__')
+        )).values_list('id', flat=True)
+    )
+    # Stamps are compared in batches, one query per batch
+    snapshots = RecommendationSnapshot.objects.filter(
+        valid_snapshot_q(),
+        profile__in=profiles
+    ).values_list('profile_id', 'versions').iterator(chunk_size=WRITE_BATCH_SIZE)
+    while True:
+        batch = list(islice(snapshots, WRITE_BATCH_SIZE))
+        if not batch:
+            break
+        current = read_versions({key for _, versions in batch for key in versions})
+        outdated.update(
+            profile_id for profile_id, versions in batch
+            if not has_current_versions(versions, current)
+        )
+    return sorted(outdated)
+
+
+def compute_rankings(profile_ids, limit):
+    """
+    Rank opportunities for a chunk of volunteer profiles. Runs in pool workers,
+    so it takes and returns plain data.
+    
+    Returns:
+        List of (profile id, {version key: stamp}, [(opportunity id, score), ...])
+        triples
+    """
+    profiles = list(VolunteerProfile.objects.filter(id__in=profile_ids))
+    calendars = get_commitment_calendars([p.user_id for p in profiles])
+    mode = get_recommendation_mode()
+    dependencies = [get_dependency_keys(profile, mode) for profile in profiles]
+    # Read the stamps before ranking so a concurrent edit invalidates the snapshot
+    stamps = get_versions(list({key for keys, _ in dependencies for key in keys}))
+    return [
+        (
+            profile.id,
+            {key: stamps[key] for key in keys},
+            [
+                (opp.id, score)
+                for opp, score in get_recommended_opportunities(
+                    profile,
+                    limit=limit,
+                    calendar=calendars[profile.user_id],
+                    terms=terms,
+                    mode=mode
+                )
+            ],
+        )
+        for profile, (keys, terms) in zip(profiles, dependencies)
+    ]
+
+
+def save_snapshots(rankings, limit, computed_at):
+    """Create or update the snapshots for computed rankings in bulk."""
+    existing = RecommendationSnapshot.objects.in_bulk(
+        [profile_id for profile_id, _, _ in rankings],
+        field_name='profile_id'
+    )
+    created, updated = [], []
+    for profile_id, versions, ranking in rankings:
+        snapshot = existing.get(profile_id)
+        if snapshot is None:
+            created.append(RecommendationSnapshot(
+                profile_id=profile_id,
+                ranking=ranking,
+                size=limit,
+                computed_at=computed_at,
+                versions=versions
+            ))
+        else:
+            snapshot.ranking = ranking
+            snapshot.size = limit
+            snapshot.computed_at = computed_at
+            snapshot.versions = versions
+            updated.append(snapshot)
+    RecommendationSnapshot.objects.bulk_create(created, batch_size=WRITE_BATCH_SIZE)
+    RecommendationSnapshot.objects.bulk_update(
+        updated, ['ranking', 'size', 'computed_at', 'versions'], batch_size=WRITE_BATCH_SIZE
+    )
+
+
+def refresh_snapshots(workers=None, chunk_size=DEFAULT_CHUNK_SIZE, limit=None, full=False):
+    """
+    Recompute the snapshots of volunteers whose snapshot is missing or invalidated.
+    
+    Args:
+        workers: Worker processes (None: one per CPU, 0: rank in this process)
+        chunk_size: Volunteers ranked per worker task
+        limit: Recommendations kept per volunteer (default: RECOMMENDATION_CACHE_SIZE)
+        full: Recompute every active volunteer
+    
+    Returns:
+        Number of volunteers recomputed
+    """
+    limit = limit or settings.RECOMMENDATION_CACHE_SIZE
+    # Changes made while the run is in progress invalidate its snapshots
+    computed_at = timezone.now()
+    profile_ids = get_outdated_profile_ids(full)
+    chunks = [profile_ids[k:k + chunk_size] for k in range(0, len(profile_ids), chunk_size)]
+    
+    if workers == 0:
+        for chunk in chunks:
+            save_snapshots(compute_rankings(chunk, limit), limit, computed_at)
+        return len(profile_ids)
+    
+    # Workers open their own connections rather than sharing inherited ones
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        for rankings in pool.map(compute_rankings, chunks, repeat(limit)):
+            save_snapshots(rankings, limit, computed_at)
+    return len(profile_ids)
+
+
+def invalidate_snapshots(user_ids):
+    """Mark volunteers' snapshots as out of date."""
+    RecommendationSnapshot.objects.filter(
+        profile__user_id__in=user_ids
+    ).update(invalidated_at=timezone.now())
+
+
+def get_snapshot_ranking(volunteer_profile, limit=10):
+    """
+    Read a volunteer's ranking from their snapshot.
+    
+    Returns:
+        List of tuples (opportunity_id, match_score), or None when the
+        volunteer has no valid snapshot of at least limit recommendations
+    """
+    snapshot = RecommendationSnapshot.objects.filter(
+        valid_snapshot_q(),
+        profile=volunteer_profile,
+        size__gte=limit
+    ).only('ranking', 'versions').first()
+    if snapshot is None or not has_current_versions(
+        snapshot.versions, read_versions(list(snapshot.versions))
+    ):
+        return None
+    return [tuple(pair) for pair in snapshot.ranking[:limit]]
+
+
+def get_snapshot_recommendations(volunteer_profile, limit=10):
+    """
+    Read a volunteer's recommendations from their snapshot.
+    
+    Args:
+        volunteer_profile: VolunteerProfile instance
+        limit: Maximum number of opportunities to return
+    
+    Returns:
+        List of tuples (Opportunity, match_score), or None when the volunteer
+        has no valid snapshot of at least limit recommendations
+    """
+    ranking = get_snapshot_ranking(volunteer_profile, limit)
+    if ranking is None:
+        return None
+    # Opportunities closed since the snapshot was computed are dropped
+    return [(opp, score) for opp, score in hydrate_ranking(ranking) if opp.status == 'OPEN']
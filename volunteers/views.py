@@ -5,7 +5,7 @@ from django.contrib import messages
 from django.db.models import Sum, Count
 from django import forms
 from .models import VolunteerProfile, ParticipationRecord
-from .matching import get_recommended_opportunities
+from .pagination import get_recommendation_page
 from .scheduling import get_volunteer_schedule
 from opportunities.models import Opportunity, Application
 
@@ -66,8 +66,12 @@ def recommended(request):
     # Get or create volunteer profile
     profile, created = VolunteerProfile.objects.get_or_create(user=volunteer)
     
-    # Get recommended opportunities
-    recommendations = get_recommended_opportunities(profile, limit=20)
+    # Get a page of recommended opportunities; the cursor walks a ranking frozen on page 1
+    recommendations, offset, next_cursor, expired = get_recommendation_page(
+        profile, cursor=request.GET.get('cursor')
+    )
+    if expired:
+        messages.info(request, 'Your recommendations have been refreshed, so you are back on the first page.')
     
     # Check which opportunities user has already applied to
     applied_opportunity_ids = set(
@@ -77,6 +81,8 @@ def recommended(request):
     context = {
         'recommendations': recommendations,
         'applied_opportunity_ids': applied_opportunity_ids,
+        'offset': offset,
+        'next_cursor': next_cursor,
     }
     return render(request, 'volunteers/recommended.html', context)
 
@@ -183,13 +189,12 @@ def edit_profile(request):
         profile.interests = request.POST.get('interests', '')
         profile.max_hours_per_week = int(request.POST.get('max_hours_per_week', 10))
         
-        # Handle availability (simplified - can be enhanced)
-        # For now, just store as JSON
+        # Ticked days with optional time text; encoded into availability_slots on save
         availability = {}
         days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
         for day in days:
             if request.POST.get(f'availability_{day}'):
-                availability[day] = request.POST.get(f'time_{day}', '')
+                availability[day] = request.POST.get(f'time_{day}', '').strip()
         profile.availability = availability
         
         profile.save()